@@ -0,0 +1,109 @@
+"""Micro-benchmark da serialização do prompt: stdlib x orjson (`pip install automgr[fast]`).
+
+Gera um `etp_conteudo`/`tr_conteudo` sintético grande, confere que os dois backends
+produzem exatamente os mesmos bytes e mostra o tempo de cada um.
+
+    python scripts/bench_json.py            # ~5 MB
+    python scripts/bench_json.py --mb 20 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+
+def _bootstrap_src_on_path() -> None:
+    project_root = Path(__file__).resolve().parents[1]
+    src_dir = project_root / "src"
+    if src_dir.exists():
+        sys.path.insert(0, str(src_dir))
+
+
+PARAGRAPH = (
+    "A contratação visa à prestação de serviços contínuos de manutenção predial, com dedicação "
+    "exclusiva de mão de obra, conforme especificações e quantitativos do Termo de Referência. "
+)
+
+
+def synthetic_dados(target_mb: float) -> dict[str, Any]:
+    secoes: list[dict[str, Any]] = []
+    size = 0
+    i = 0
+    while size < target_mb * 1_000_000:
+        i += 1
+        secao = {
+            "id": i,
+            "titulo": f"{i}. Seção {i} — Justificativa da contratação",
+            "conteudo": PARAGRAPH * 6,
+            "itens": [
+                {"ordem": j, "descricao": PARAGRAPH, "quantidade": j * 3, "valor": j * 10.5} for j in range(4)
+            ],
+            "updated_at": "2024-05-01T12:00:00Z",
+        }
+        secoes.append(secao)
+        size += len(PARAGRAPH) * 10 + 200
+    half = len(secoes) // 2
+    return {
+        "metadados": {"MAX_RISCOS": 10},
+        "etp_conteudo": {"secoes": secoes[:half]},
+        "tr_conteudo": secoes[half:],
+    }
+
+
+def best_of(repeat: int, fn: Callable[[], Any]) -> tuple[float, Any]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> int:
+    _bootstrap_src_on_path()
+    from automgr import prompt
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=5.0, help="Tamanho aproximado do JSON de entrada (MB)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições (vale a melhor)")
+    args = parser.parse_args()
+
+    dados = synthetic_dados(args.mb)
+    template = "Sistema" + prompt.DEFAULT_SEPARATOR + "ETP: {{ETP_CONTEUDO}}\nTR: {{TR_CONTEUDO}}"
+    print(f"📦 Entrada sintética: {len(json.dumps(dados, ensure_ascii=False)) / 1_000_000:.1f} MB")
+
+    results: dict[str, tuple[float, float, str]] = {}
+    for backend in ("stdlib", "orjson"):
+        try:
+            prompt.set_json_backend(backend)
+        except ImportError:
+            print("⚠️ orjson não instalado (pip install automgr[fast]); só o stdlib foi medido.")
+            break
+        dump_s, text = best_of(
+            args.repeat,
+            lambda: prompt.json_to_string(dados["etp_conteudo"]) + prompt.json_to_string(dados["tr_conteudo"]),
+        )
+        build_s, _ = best_of(args.repeat, lambda: prompt.build_prompts(dados, template))
+        results[backend] = (dump_s, build_s, text)
+        print(f"   {backend:<7} json_to_string {dump_s * 1000:8.1f} ms | build_prompts {build_s * 1000:8.1f} ms")
+    prompt.set_json_backend("auto")
+
+    if "orjson" in results:
+        base, fast = results["stdlib"], results["orjson"]
+        if base[2] != fast[2]:
+            print("❌ As saídas diferem entre os backends!")
+            return 1
+        print(
+            f"✅ Saída idêntica; ganho: json_to_string {base[0] / fast[0]:.1f}x, "
+            f"build_prompts {base[1] / fast[1]:.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
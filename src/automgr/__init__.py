@@ -1,6 +1,19 @@
 """AutoMGR - geração de Mapa de Gerenciamento de Riscos (MGR) a partir de ETP/TR."""
 
-__all__ = ["__version__"]
+from __future__ import annotations
+
+from typing import Any
+
+
+__all__ = ["__version__", "Generation", "GenerationResult", "build_prompts", "generate", "generate_from_prompts"]
 
 __version__ = "0.1.0"
 
+
+def __getattr__(name: str) -> Any:
+    # A API (e os providers) só são importados no primeiro uso: `import automgr` fica leve.
+    if name in __all__:
+        from automgr import api
+
+        return getattr(api, name)
+    raise AttributeError(f"module 'automgr' has no attribute '{name}'")
@@ -0,0 +1,241 @@
+"""API em processo para embutir o AutoMGR em outros serviços (sem prints e sem arquivos obrigatórios).
+
+    from automgr import generate
+
+    generation = generate(dados, template_text, provider="groq")
+    for chunk in generation:          # ou: async for chunk in generation
+        enviar(chunk.text)
+    print(generation.result.usage)
+
+Várias gerações podem rodar em paralelo no mesmo processo (threads ou asyncio).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from automgr import cassette, continuation, events, streaming
+from automgr.prompt import build_prompts as _build_prompts
+from automgr.prompt import load_json, load_text
+from automgr.providers import gemini, groq, local, openai_provider, openrouter
+from automgr.streaming import StreamChunk
+
+
+DEFAULT_MODELS: dict[str, str] = {
+    "gemini": "models/gemini-2.0-flash",
+    "groq": "llama-3.3-70b-versatile",
+    "openai": "gpt-4o",
+    "openrouter": "deepseek/deepseek-chat",
+    "local": local.DEFAULT_MODEL,
+}
+
+_STREAMERS: dict[str, Callable[..., Iterator[StreamChunk]]] = {
+    "gemini": gemini.stream,
+    "groq": groq.stream,
+    "openai": openai_provider.stream,
+    "openrouter": openrouter.stream,
+    "local": local.stream,
+}
+
+_DONE = object()
+
+
+def default_model(provider: str) -> str:
+    """Modelo padrão do provider (no `local`, o configurado em AUTOMGR_LOCAL_MODEL/--local-model)."""
+    return local.default_model() if provider == "local" else DEFAULT_MODELS[provider]
+
+
+@dataclass
+class GenerationResult:
+    provider: str
+    model: str
+    text: str
+    finish_reason: str | None
+    usage: dict[str, int] | None
+    seconds: float
+    first_byte_seconds: float | None
+
+
+def build_prompts(
+    dados: dict[str, Any] | Path,
+    template: str | Path,
+    *,
+    json_indent: int | None = 2,
+) -> tuple[str, str]:
+    """`dados` e `template` podem ser objetos em memória (dict / texto) ou caminhos de arquivo."""
+    if isinstance(dados, Path):
+        dados = load_json(dados)
+    if isinstance(template, Path):
+        template = load_text(template)
+    return _build_prompts(dados, template, json_indent=json_indent)
+
+
+class Generation:
+    """
+    Stream de uma geração: iterável (`for`) ou assíncrono (`async for`) de `StreamChunk`.
+    Pode ser consumido uma única vez; `result` fica disponível ao fim do stream.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        open_stream: Callable[[], Iterator[StreamChunk]],
+        *,
+        idle_timeout: float | None = None,
+    ) -> None:
+        self.provider = provider
+        self.model = model
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self._open_stream = open_stream
+        self._idle_timeout = idle_timeout
+        self._started = False
+        self._result: GenerationResult | None = None
+        self._closers = streaming.Closers()
+
+    @property
+    def result(self) -> GenerationResult:
+        if self._result is None:
+            raise RuntimeError("A geração ainda não terminou (consuma o stream primeiro).")
+        return self._result
+
+    def close(self) -> None:
+        """Cancela a geração (de qualquer thread): fecha o stream do SDK e encerra a iteração."""
+        self._closers.close_all()
+
+    def __iter__(self) -> Iterator[StreamChunk]:
+        if self._started:
+            raise RuntimeError("Esta geração já foi consumida.")
+        self._started = True
+        return self._run()
+
+    def _run(self) -> Iterator[StreamChunk]:
+        started = time.perf_counter()
+        first_byte: float | None = None
+        parts: list[str] = []
+        finish_reason: str | None = None
+        usage: dict[str, int] | None = None
+
+        chunks = cassette.wrap(self.provider, self.model, self.system_prompt, self.user_prompt, self._open_stream)
+        try:
+            for chunk in streaming.guard(chunks, idle_timeout=self._idle_timeout, closers=self._closers):
+                if chunk.text:
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    parts.append(chunk.text)
+                    events.chunk(self.provider, self.model, chunk.text)
+                finish_reason = chunk.finish_reason or finish_reason
+                usage = chunk.usage or usage
+                yield chunk
+        except streaming.StreamCancelledError:
+            raise
+        except Exception as exc:
+            events.error(str(exc), provider=self.provider, model=self.model)
+            raise
+
+        self._result = GenerationResult(
+            provider=self.provider,
+            model=self.model,
+            text="".join(parts),
+            finish_reason=finish_reason,
+            usage=usage,
+            seconds=time.perf_counter() - started,
+            first_byte_seconds=first_byte,
+        )
+        events.provider_done(
+            self.provider,
+            self.model,
+            seconds=self._result.seconds,
+            first_byte_seconds=first_byte,
+            output_chars=len(self._result.text),
+            usage=usage,
+            finish_reason=finish_reason,
+        )
+
+    async def __aiter__(self) -> AsyncIterator[StreamChunk]:
+        # Cada chunk é lido numa thread do executor padrão, sem bloquear o event loop.
+        iterator = iter(self)
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, _DONE)
+            if chunk is _DONE:
+                return
+            yield chunk
+
+    def text(self) -> str:
+        """Consome o stream inteiro (se ainda não foi consumido) e retorna o texto final."""
+        if self._result is None:
+            for _ in self:
+                pass
+        return self.result.text
+
+
+def generate(
+    dados: dict[str, Any] | Path,
+    template: str | Path,
+    *,
+    provider: str = "groq",
+    model: str | None = None,
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+    api_key: str | None = None,
+    json_indent: int | None = 2,
+    idle_timeout: float | None = None,
+) -> Generation:
+    """
+    Prepara uma geração do MGR; a requisição só é feita quando o stream começa a ser consumido.
+    Sem `api_key`, usa a variável de ambiente do provider (como a CLI).
+    """
+    if provider not in _STREAMERS:
+        raise ValueError(f"Provider inválido: {provider} (use {', '.join(_STREAMERS)})")
+    system_prompt, user_prompt = build_prompts(dados, template, json_indent=json_indent)
+    return generate_from_prompts(
+        system_prompt,
+        user_prompt,
+        provider=provider,
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        api_key=api_key,
+        idle_timeout=idle_timeout,
+    )
+
+
+def generate_from_prompts(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    provider: str = "groq",
+    model: str | None = None,
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+    api_key: str | None = None,
+    idle_timeout: float | None = None,
+) -> Generation:
+    """Como `generate`, mas com o prompt já montado."""
+    if provider not in _STREAMERS:
+        raise ValueError(f"Provider inválido: {provider} (use {', '.join(_STREAMERS)})")
+    model = model or default_model(provider)
+    streamer = _STREAMERS[provider]
+
+    def open_part(prompt: str) -> Iterator[StreamChunk]:
+        return streamer(
+            system_prompt,
+            prompt,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            api_key=api_key,
+        )
+
+    def open_stream() -> Iterator[StreamChunk]:
+        # Respostas cortadas pelo max_tokens continuam automaticamente (continuation.extend).
+        return continuation.extend(open_part, user_prompt)
+
+    return Generation(provider, model, system_prompt, user_prompt, open_stream, idle_timeout=idle_timeout)
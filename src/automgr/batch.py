@@ -0,0 +1,237 @@
+"""Geração offline em lote via Batch API (formato OpenAI: OpenAI e Groq).
+
+`submit` empacota vários prompts num único arquivo JSONL, cria o job e grava um
+manifesto (`lote_<id>.json`) no diretório de saída. `collect` consulta o job com
+intervalo crescente e, quando concluído, grava cada resposta no caminho previsto
+no manifesto (o mesmo layout `resultado_*.md` da execução normal).
+
+O modo batch do Gemini não é suportado: o SDK usado aqui (google-generativeai) não
+expõe esse endpoint. Para várias versões com o Gemini, use `automgr gemini-batch`.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+from automgr import keypool, ledger, ratelimit, streaming
+from automgr.paths import ensure_dir
+
+
+PROVIDERS: dict[str, dict[str, str | None]] = {
+    "openai": {"env": "OPENAI_API_KEY", "base_url": None, "model": "gpt-4o"},
+    "groq": {
+        "env": "GROQ_API_KEY",
+        "base_url": "https://api.groq.com/openai/v1",
+        "model": "llama-3.3-70b-versatile",
+    },
+}
+
+ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+PENDING_STATUSES = {"validating", "in_progress", "finalizing", "cancelling"}
+
+
+@dataclass
+class BatchJob:
+    custom_id: str
+    output_path: str
+    system_prompt: str
+    user_prompt: str
+
+
+def _client(provider: str, base_url: str | None, key_bucket: str | None = None) -> tuple[Any, str]:
+    """
+    Cliente da Batch API e o bucket (hash) da chave usada. Com `key_bucket`, usa a mesma
+    chave do envio: jobs e arquivos só são visíveis para a conta que os criou.
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"Provider sem Batch API suportada: {provider} (use {', '.join(PROVIDERS)})")
+
+    load_dotenv()
+    env = str(PROVIDERS[provider]["env"])
+    api_key = keypool.choose(provider)
+    if key_bucket is not None:
+        api_key = next((k for k in keypool.keys(provider) if ratelimit.bucket_for(provider, k) == key_bucket), None)
+    if not api_key:
+        raise RuntimeError(f"[Batch] {env} não encontrada (ou a chave usada no envio não está mais no pool).")
+
+    from openai import OpenAI
+
+    client = OpenAI(api_key=api_key, base_url=base_url or PROVIDERS[provider]["base_url"])
+    return client, ratelimit.bucket_for(provider, api_key)
+
+
+def build_requests(
+    jobs: list[BatchJob],
+    *,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+) -> bytes:
+    lines = []
+    for job in jobs:
+        body = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": job.system_prompt},
+                {"role": "user", "content": job.user_prompt},
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        lines.append(json.dumps({"custom_id": job.custom_id, "method": "POST", "url": ENDPOINT, "body": body}))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def submit(
+    jobs: list[BatchJob],
+    *,
+    provider: str,
+    model: str,
+    outdir: Path,
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+    base_url: str | None = None,
+) -> Path:
+    for field_name in ("custom_id", "output_path"):
+        values = [getattr(job, field_name) for job in jobs]
+        repeated = sorted({value for value in values if values.count(value) > 1})
+        if repeated:
+            # A Batch API recusa custom_id repetido, e saídas iguais se sobrescreveriam na coleta.
+            raise ValueError(f"{field_name} repetido no lote: {', '.join(repeated)}")
+
+    client, key_bucket = _client(provider, base_url)
+    payload = build_requests(jobs, model=model, temperature=temperature, max_tokens=max_tokens)
+
+    uploaded = client.files.create(file=("automgr_batch.jsonl", payload), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=ENDPOINT,
+        completion_window=COMPLETION_WINDOW,
+        metadata={"source": "automgr"},
+    )
+
+    ensure_dir(outdir)
+    manifest_path = outdir / f"lote_{batch.id}.json"
+    manifest = {
+        "provider": provider,
+        "model": model,
+        "base_url": base_url,
+        "key_bucket": key_bucket,
+        "batch_id": batch.id,
+        "input_file_id": uploaded.id,
+        "submitted_at": time.time(),
+        "status": batch.status,
+        "collected": False,
+        "jobs": [{"custom_id": job.custom_id, "output_path": job.output_path} for job in jobs],
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    return manifest_path
+
+
+def _extract_text(line: dict[str, Any]) -> tuple[str | None, str | None]:
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code", 200) >= 400:
+        return None, json.dumps(line.get("error") or response.get("body"), ensure_ascii=False)
+    choices = (response.get("body") or {}).get("choices") or []
+    if not choices:
+        return None, "resposta sem choices"
+    message = choices[0].get("message") or {}
+    return message.get("content") or "", None
+
+
+def _extract_usage(line: dict[str, Any]) -> dict[str, int] | None:
+    usage = ((line.get("response") or {}).get("body") or {}).get("usage") or {}
+    if not usage:
+        return None
+    return {
+        "input_tokens": int(usage.get("prompt_tokens", 0) or 0),
+        "output_tokens": int(usage.get("completion_tokens", 0) or 0),
+    }
+
+
+def collect(
+    manifest_path: Path,
+    *,
+    wait: bool = True,
+    poll_interval: float = 5.0,
+    max_poll_interval: float = 60.0,
+) -> list[Path]:
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("collected"):
+        print(f"ℹ️ [Batch] {manifest['batch_id']} já coletado.")
+        return []
+
+    client, _ = _client(manifest["provider"], manifest.get("base_url"), manifest.get("key_bucket"))
+    interval = poll_interval
+    while True:
+        batch = client.batches.retrieve(manifest["batch_id"])
+        counts = getattr(batch, "request_counts", None)
+        progress = f" ({counts.completed}/{counts.total})" if counts and counts.total else ""
+        print(f"   ⏳ [Batch] {batch.id}: {batch.status}{progress}")
+
+        if batch.status not in PENDING_STATUSES:
+            break
+        if not wait:
+            manifest["status"] = batch.status
+            manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+            return []
+
+        left = streaming.remaining()
+        if left is not None and left < interval:
+            print("⏰ [Batch] Prazo global esgotado; rode batch-collect novamente mais tarde.")
+            return []
+        time.sleep(interval)
+        interval = min(max_poll_interval, interval * 1.5)
+
+    manifest["status"] = batch.status
+    outputs: list[Path] = []
+    # Expirado/cancelado também traz no output_file_id as respostas já prontas (e cobradas).
+    if getattr(batch, "output_file_id", None):
+        if batch.status != "completed":
+            print(f"⚠️ [Batch] Job terminou com status '{batch.status}'; coletando as respostas já prontas.")
+        by_id = {job["custom_id"]: Path(job["output_path"]) for job in manifest["jobs"]}
+        answered: set[str] = set()
+        content = client.files.content(batch.output_file_id).text
+        for raw in content.splitlines():
+            if not raw.strip():
+                continue
+            line = json.loads(raw)
+            output_path = by_id.get(line.get("custom_id", ""))
+            if output_path is None:
+                continue
+            answered.add(line["custom_id"])
+            text, error = _extract_text(line)
+            if error is not None:
+                print(f"❌ [Batch] {line['custom_id']}: {error}")
+                continue
+            ensure_dir(output_path.parent)
+            output_path.write_text(text or "", encoding="utf-8")
+            outputs.append(output_path)
+            ledger.record(
+                manifest["provider"],
+                manifest["model"],
+                usage=_extract_usage(line),
+                system_prompt="",
+                user_prompt="",
+                output_text=text or "",
+                output=str(output_path),
+                price_factor=ledger.BATCH_PRICE_FACTOR,
+            )
+        manifest["collected"] = True
+        missing = [custom_id for custom_id in by_id if custom_id not in answered]
+        if missing:
+            print(f"❌ [Batch] Sem resposta ({len(missing)}): {', '.join(missing)}")
+        if getattr(batch, "error_file_id", None):
+            print(f"⚠️ [Batch] Algumas requisições falharam; detalhes no arquivo {batch.error_file_id}.")
+    else:
+        print(f"❌ [Batch] Job terminou com status '{batch.status}'.")
+
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    return outputs
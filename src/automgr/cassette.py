@@ -0,0 +1,151 @@
+"""Gravação e reprodução ("cassetes") dos streams dos providers.
+
+- "record": cada stream é repassado normalmente e gravado (chunks com o instante
+  relativo ao início da requisição, finish_reason e uso de tokens).
+- "replay": nenhuma chamada de rede é feita; o stream é lido do cassete e
+  reproduzido em tempo real (`speed=1`), acelerado (`speed>1`) ou instantâneo (`speed=0`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from automgr.paths import default_state_dir, ensure_dir
+from automgr.streaming import StreamChunk, StreamStalledError
+
+
+MODES = ("off", "record", "replay")
+CASSETTE_VERSION = 1
+CASSETTES_DIRNAME = "cassettes"
+
+_mode = "off"
+_directory: Path | None = None
+_speed = 1.0
+
+
+class CassetteNotFoundError(LookupError):
+    pass
+
+
+def configure(mode: str = "off", *, directory: Path | None = None, speed: float = 1.0) -> None:
+    global _mode, _directory, _speed
+    if mode not in MODES:
+        raise ValueError(f"Modo inválido: {mode} (use {', '.join(MODES)})")
+    _mode = mode
+    _directory = directory
+    _speed = max(0.0, speed)
+
+
+def replaying() -> bool:
+    return _mode == "replay"
+
+
+def _cassettes_dir() -> Path:
+    return _directory or default_state_dir(Path.cwd()) / CASSETTES_DIRNAME
+
+
+def request_key(provider: str, model: str, system_prompt: str, user_prompt: str, variant: int = 0) -> str:
+    digest = hashlib.sha256()
+    for part in (provider, model, system_prompt, user_prompt, str(variant)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cassette_path(provider: str, model: str, key: str) -> Path:
+    safe_model = model.split("/")[-1].replace(":", "_")
+    return _cassettes_dir() / f"{provider}_{safe_model}_{key[:12]}.json"
+
+
+def load(path: Path) -> dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _record(
+    path: Path,
+    provider: str,
+    model: str,
+    key: str,
+    chunks: Iterator[StreamChunk],
+) -> Iterator[StreamChunk]:
+    started = time.perf_counter()
+    recorded: list[dict[str, Any]] = []
+    usage: dict[str, int] | None = None
+    finish_reason: str | None = None
+    complete = False
+
+    try:
+        for chunk in chunks:
+            entry = {"t": round(time.perf_counter() - started, 4), **asdict(chunk)}
+            recorded.append(entry)
+            usage = chunk.usage or usage
+            finish_reason = chunk.finish_reason or finish_reason
+            yield chunk
+        complete = True
+    finally:
+        ensure_dir(path.parent)
+        payload = {
+            "version": CASSETTE_VERSION,
+            "provider": provider,
+            "model": model,
+            "request_key": key,
+            "recorded_at": time.time(),
+            "complete": complete,
+            "finish_reason": finish_reason,
+            "usage": usage,
+            "chunks": recorded,
+        }
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def replay(data: dict[str, Any], *, speed: float | None = None) -> Iterator[StreamChunk]:
+    speed = _speed if speed is None else speed
+    started = time.perf_counter()
+    for entry in data.get("chunks", []):
+        if speed > 0:
+            delay = entry.get("t", 0.0) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        yield StreamChunk(
+            text=entry.get("text", ""),
+            finish_reason=entry.get("finish_reason"),
+            usage=entry.get("usage"),
+        )
+    if not data.get("complete", True):
+        # Gravado de um stream parado/interrompido: reproduz a mesma falha, não um resultado completo.
+        raise StreamStalledError("Cassete gravado de um stream interrompido.")
+
+
+def wrap(
+    provider: str,
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    open_stream: Callable[[], Iterator[StreamChunk]],
+    *,
+    variant: int = 0,
+) -> Iterator[StreamChunk]:
+    """
+    Aplica o modo atual a um stream: `open_stream` só é chamado fora do modo replay.
+    """
+    if _mode == "off":
+        return open_stream()
+
+    key = request_key(provider, model, system_prompt, user_prompt, variant)
+    path = cassette_path(provider, model, key)
+
+    if _mode == "replay":
+        if not path.exists():
+            raise CassetteNotFoundError(f"Cassete ausente para {provider}/{model}: {path}")
+        return replay(load(path))
+
+    return _record(path, provider, model, key, open_stream())
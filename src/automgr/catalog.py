@@ -0,0 +1,112 @@
+"""Catálogo de modelos com janela de contexto e preço (quando o provider expõe)."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from automgr.paths import default_state_dir, ensure_dir
+
+
+CATALOG_FILENAME = "catalog_cache.json"
+CATALOG_TTL_SECONDS = 24 * 60 * 60
+
+# Valores de referência (USD por 1M tokens) para providers cuja API não expõe preço.
+# (context_length, prompt_price, completion_price)
+KNOWN_MODELS: dict[str, dict[str, tuple[int, float, float]]] = {
+    "gemini": {
+        "models/gemini-2.5-pro": (1_048_576, 1.25, 10.0),
+        "models/gemini-1.5-pro": (2_097_152, 1.25, 5.0),
+        "models/gemini-2.0-flash": (1_048_576, 0.10, 0.40),
+    },
+    "groq": {
+        "llama-3.3-70b-versatile": (131_072, 0.59, 0.79),
+        "llama-3.1-8b-instant": (131_072, 0.05, 0.08),
+        "mixtral-8x7b-32768": (32_768, 0.24, 0.24),
+    },
+    "openai": {
+        "gpt-4o": (128_000, 2.50, 10.0),
+        "gpt-4o-mini": (128_000, 0.15, 0.60),
+    },
+}
+
+
+@dataclass(frozen=True)
+class ModelInfo:
+    provider: str
+    model: str
+    context_length: int | None = None
+    prompt_price: float | None = None
+    completion_price: float | None = None
+
+    def estimate_cost(self, input_tokens: int, output_tokens: int) -> float | None:
+        if self.prompt_price is None or self.completion_price is None:
+            return None
+        return (input_tokens * self.prompt_price + output_tokens * self.completion_price) / 1_000_000
+
+
+def _known_models(provider: str) -> list[ModelInfo]:
+    return [
+        ModelInfo(provider, model, context, prompt_price, completion_price)
+        for model, (context, prompt_price, completion_price) in KNOWN_MODELS.get(provider, {}).items()
+    ]
+
+
+def _load_cache(path: Path, ttl_seconds: float) -> list[ModelInfo] | None:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if time.time() - float(data.get("fetched_at", 0)) > ttl_seconds:
+        return None
+    return [ModelInfo(**item) for item in data.get("models", [])]
+
+
+def _save_cache(path: Path, models: list[ModelInfo]) -> None:
+    ensure_dir(path.parent)
+    payload = {"fetched_at": time.time(), "models": [asdict(m) for m in models]}
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _fetch_openrouter() -> list[ModelInfo]:
+    from automgr.providers import openrouter
+
+    return [
+        ModelInfo(
+            "openrouter",
+            item["id"],
+            item.get("context_length"),
+            item.get("prompt_price"),
+            item.get("completion_price"),
+        )
+        for item in openrouter.list_models_detailed()
+    ]
+
+
+def load_catalog(
+    providers: list[str],
+    *,
+    state_dir: Path | None = None,
+    refresh: bool = False,
+    ttl_seconds: float = CATALOG_TTL_SECONDS,
+) -> list[ModelInfo]:
+    models: list[ModelInfo] = []
+    for provider in providers:
+        if provider != "openrouter":
+            models.extend(_known_models(provider))
+            continue
+
+        cache_path = (state_dir or default_state_dir(Path.cwd())) / CATALOG_FILENAME
+        cached = None if refresh else _load_cache(cache_path, ttl_seconds)
+        if cached is None:
+            cached = _fetch_openrouter()
+            if cached:
+                _save_cache(cache_path, cached)
+        models.extend(cached)
+    return models
@@ -1,13 +1,27 @@
 from __future__ import annotations
 
 import argparse
+import cProfile
+import contextlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
 from pathlib import Path
+from typing import Any, Callable
 
 from dotenv import load_dotenv
 
+from automgr import batch, cassette, catalog, condense, console, history, incremental, profiling, ratelimit, router
+from automgr import api, continuation, discovery, events, jobqueue, keypool, ledger, loadtest, scoring, similar
+from automgr import streaming, watch
 from automgr import prompt as prompt_lib
 from automgr.paths import default_dados_path, default_outdir, default_template_path, ensure_dir
-from automgr.providers import gemini, groq, openai_provider, openrouter
+from automgr.providers import gemini, groq, local, openai_provider, openrouter
 
 
 def _parse_indexes(value: str, *, max_value: int) -> list[int] | None:
@@ -123,45 +137,385 @@ def _select_models_interactively(
 
 
 def _write_debug_prompt(outdir: Path, system_prompt: str, user_prompt: str) -> Path:
-    ensure_dir(outdir)
-    debug_path = outdir / "prompt_montado_debug.txt"
-    debug_path.write_text(
-        f"=== SYSTEM ===\n{system_prompt}\n\n=== USER ===\n{user_prompt}\n",
-        encoding="utf-8",
-    )
+    with profiling.phase("debug_write"):
+        ensure_dir(outdir)
+        debug_path = outdir / "prompt_montado_debug.txt"
+        debug_path.write_text(
+            f"=== SYSTEM ===\n{system_prompt}\n\n=== USER ===\n{user_prompt}\n",
+            encoding="utf-8",
+        )
     return debug_path
 
 
-def _load_and_build_prompts(args: argparse.Namespace) -> tuple[str, str]:
-    dados_path = Path(args.dados) if args.dados else default_dados_path(Path.cwd())
-    template_path = Path(args.template) if args.template else default_template_path(Path.cwd())
+def _dedup_dados(dados: dict, log: Callable[[str], None] = print) -> dict:
+    deduped, report = prompt_lib.dedup_sections(dados)
+    saved = report.tokens_before - report.tokens_after
+    log(f"🔁 Deduplicação ETP/TR: {len(report.spans)} trecho(s) repetido(s), ~{saved} tokens economizados")
+    for location, source, words in report.spans:
+        log(f"   - {location} → ETP › {source} ({words} palavras)")
+    return deduped
+
+
+def _prune_dados(args: argparse.Namespace, dados: dict, log: Callable[[str], None] = print) -> dict:
+    pruned, report = prompt_lib.prune_sections(
+        dados,
+        top_k=args.prune_top_k or None,
+        token_budget=args.prune_token_budget or None,
+    )
+    total = len(report.kept) + len(report.dropped)
+    log(
+        f"✂️  Poda BM25: {len(report.kept)}/{total} seções mantidas, "
+        f"~{report.tokens_before} → ~{report.tokens_after} tokens de ETP/TR"
+    )
+    for section, score in report.dropped:
+        tokens = prompt_lib.estimate_tokens(section.text)
+        log(f"   - removida [{section.document}] {section.title} (relevância {score:.2f}, ~{tokens} tokens)")
+    return pruned
+
+
+def _condense_dados(args: argparse.Namespace, dados: dict, log: Callable[[str], None] = print) -> dict:
+    if args.condense_provider == "local":
+        model = args.condense_model or local.default_model()
+    else:
+        model = args.condense_model or condense.DEFAULT_MODELS[args.condense_provider]
+    log(f"🗜️  Condensando ETP/TR com {args.condense_provider}/{model}...")
+    try:
+        condensed, report = condense.condense_dados(
+            dados,
+            condense.make_summarizer(args.condense_provider, model),
+            namespace=f"{args.condense_provider}:{model}",
+            max_workers=args.condense_workers,
+        )
+    except Exception as exc:  # noqa: BLE001 (CLI tool)
+        log(f"⚠️ [Condensação] Falhou, usando o conteúdo integral: {exc}")
+        return dados
+
+    log(
+        f"   {report.condensed}/{report.sections} seções condensadas "
+        f"({report.cache_hits} do cache), {report.chars_before} → {report.chars_after} caracteres"
+    )
+    if report.reduced_documents:
+        log(f"   Resumo final aplicado em: {', '.join(report.reduced_documents)}")
+    return condensed
+
+
+def _dados_path(args: argparse.Namespace) -> Path:
+    return Path(args.dados) if args.dados else default_dados_path(Path.cwd())
+
+
+def _template_path(args: argparse.Namespace) -> Path:
+    return Path(args.template) if args.template else default_template_path(Path.cwd())
 
-    dados = prompt_lib.load_json(dados_path)
-    template_text = prompt_lib.load_text(template_path)
 
+def _max_riscos(args: argparse.Namespace, dados: dict | None = None) -> int:
+    """MAX_RISCOS dos metadados (do dict já carregado ou do dados.json); o padrão se ausente/inválido."""
+    try:
+        if dados is None:
+            dados = prompt_lib.load_json(_dados_path(args))
+        return int(dados.get("metadados", {}).get("MAX_RISCOS", scoring.DEFAULT_MAX_RISKS))
+    except (OSError, ValueError, TypeError, AttributeError):
+        return scoring.DEFAULT_MAX_RISKS
+
+
+def _max_tokens(
+    args: argparse.Namespace,
+    provider: str | None = None,
+    model: str | None = None,
+    *,
+    dados: dict | None = None,
+) -> int:
+    """--max-tokens, ou (sem a flag) o tamanho previsto pelo MAX_RISCOS e pelas saídas anteriores do modelo."""
+    if args.max_tokens:
+        return int(args.max_tokens)
+    return continuation.suggest_max_tokens(
+        history.load_history(),
+        provider or "",
+        model,
+        _max_riscos(args, dados),
+    )
+
+
+def _load_inputs(
+    args: argparse.Namespace,
+    dados_path: Path | None = None,
+    *,
+    log: Callable[[str], None] = print,
+) -> tuple[dict[str, Any], str]:
+    """Lê dados.json e template e aplica as reduções pedidas (--dedup, --prune-*, --condense)."""
+    if dados_path is None:
+        dados_path = _dados_path(args)
+    template_path = _template_path(args)
+
+    with profiling.phase("json_load"):
+        dados = prompt_lib.load_json(dados_path)
+        template_text = prompt_lib.load_text(template_path)
+
+    if args.dedup:
+        dados = _dedup_dados(dados, log)
+
+    if args.prune_top_k or args.prune_token_budget:
+        dados = _prune_dados(args, dados, log)
+
+    if args.condense:
+        dados = _condense_dados(args, dados, log)
+    return dados, template_text
+
+
+def _load_and_build_prompts(
+    args: argparse.Namespace,
+    dados_path: Path | None = None,
+    *,
+    log: Callable[[str], None] = print,
+) -> tuple[str, str]:
+    started = time.perf_counter()
+    dados, template_text = _load_inputs(args, dados_path, log=log)
     json_indent = None if args.json_indent <= 0 else args.json_indent
     system_prompt, user_prompt = prompt_lib.build_prompts(
         dados,
         template_text,
         json_indent=json_indent,
     )
+    _emit_prompt_built(
+        system_prompt,
+        user_prompt,
+        dados=dados_path or _dados_path(args),
+        seconds=time.perf_counter() - started,
+    )
     return system_prompt, user_prompt
 
 
-def cmd_run(args: argparse.Namespace) -> int:
-    load_dotenv()
+def _emit_prompt_built(system_prompt: str, user_prompt: str, *, dados: Path, seconds: float, **extra: Any) -> None:
+    events.emit(
+        "prompt_built",
+        dados=str(dados),
+        system_chars=len(system_prompt),
+        user_chars=len(user_prompt),
+        estimated_tokens=prompt_lib.estimate_tokens(system_prompt + user_prompt),
+        seconds=round(seconds, 4),
+        **extra,
+    )
 
-    outdir = Path(args.outdir) if args.outdir else default_outdir(Path.cwd())
-    system_prompt, user_prompt = _load_and_build_prompts(args)
 
-    debug_path = _write_debug_prompt(outdir, system_prompt, user_prompt)
-    print(f"📝 Prompt montado. Debug em: {debug_path}")
+def _prepare_prompts(
+    args: argparse.Namespace,
+    outdir: Path,
+    *,
+    background: bool = False,
+) -> Callable[[], tuple[str, str]]:
+    """
+    Monta o prompt e grava o arquivo de debug. Com `background=True`, a montagem roda numa
+    thread enquanto o usuário está num menu; o resultado (e os logs) vêm na primeira chamada.
+    """
+    if not background:
+        prompts = _load_and_build_prompts(args)
+        debug_path = _write_debug_prompt(outdir, *prompts)
+        print(f"📝 Prompt montado. Debug em: {debug_path}")
+        return lambda: prompts
+
+    logs: list[str] = []
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="automgr-prompt")
+    future = executor.submit(_load_and_build_prompts, args, log=logs.append)
+    executor.shutdown(wait=False)
+    ready: list[tuple[str, str]] = []
+
+    def result() -> tuple[str, str]:
+        if not ready:
+            try:
+                prompts = future.result()
+            finally:
+                for line in logs:
+                    print(line)
+            debug_path = _write_debug_prompt(outdir, *prompts)
+            print(f"📝 Prompt montado. Debug em: {debug_path}")
+            ready.append(prompts)
+        return ready[0]
+
+    return result
+
+
+def _auto_select_model(
+    args: argparse.Namespace,
+    providers: list[str],
+    system_prompt: str,
+    user_prompt: str,
+) -> router.RouteChoice | None:
+    prompt_tokens = prompt_lib.estimate_tokens(system_prompt) + prompt_lib.estimate_tokens(user_prompt)
+    # Só providers que vão rodar de fato: sem chave, o escolhido seria pulado e a execução não geraria nada.
+    usable = [p for p in providers if p == "local" or keypool.keys(p) or cassette.replaying()]
+    if not usable:
+        envs = ", ".join(keypool.ENV_VARS[p] for p in providers)
+        print(f"❌ [Auto] Nenhum provider com chave configurada ({envs}).")
+        return None
+    choice = router.choose_model(
+        catalog.load_catalog(usable),
+        history.load_history(),
+        prompt_tokens=prompt_tokens,
+        output_tokens=_max_tokens(args),
+        strategy=args.auto_model,
+        max_seconds=args.max_seconds,
+        max_cost=args.max_cost,
+    )
+    if choice is None:
+        print(f"❌ [Auto] Nenhum modelo atende aos limites (prompt ~{prompt_tokens} tokens).")
+        return None
+
+    cost = "?" if choice.est_cost is None else f"US$ {choice.est_cost:.4f}"
+    origin = "histórico" if choice.from_history else "estimativa padrão"
+    print(
+        f"🧭 [Auto] {args.auto_model}: {choice.info.provider}/{choice.info.model} "
+        f"(~{choice.est_seconds:.0f}s, {cost}, {origin})"
+    )
+    return choice
+
+
+def _run_incremental(
+    args: argparse.Namespace,
+    provider: str,
+    model: str,
+    output_path: Path,
+    system_prompt: str,
+    user_prompt: str,
+    complete: Callable[..., str],
+    run: Callable[[], Path | None],
+) -> Path | None:
+    dados = prompt_lib.load_json(_dados_path(args))
+    template_text = prompt_lib.load_text(_template_path(args))
+    plan = incremental.plan_update(
+        incremental.load_snapshot(output_path),
+        dados,
+        template_text=template_text,
+        model=model,
+    )
+    print(f"\n♻️  [Incremental] {provider}: {plan.reason}")
+
+    document = plan.document if plan.action == "reuse" else None
+    stop = ledger.exhausted() if plan.action == "patch" else None
+    if stop:
+        print(f"💸 [Incremental] Pulei a revisão parcial: {stop}.")
+    elif plan.action == "patch" and plan.document is not None:
+        patch_system, patch_user = incremental.build_patch_prompts(system_prompt, user_prompt, plan)
+        try:
+            response = complete(
+                patch_system,
+                patch_user,
+                model=model,
+                temperature=args.temperature,
+                max_tokens=_max_tokens(args, provider, model),
+            )
+            ledger.record(
+                provider,
+                model,
+                usage=None,
+                system_prompt=patch_system,
+                user_prompt=patch_user,
+                output_text=response,
+                output=str(output_path),
+            )
+            document = incremental.merge_patch(plan.document, response, plan.risk_ids)
+        except Exception as exc:  # noqa: BLE001 (CLI tool)
+            print(f"⚠️ [Incremental] Revisão parcial falhou: {exc}")
+        if document is None:
+            print("⚠️ [Incremental] Resposta sem todos os riscos revisados; regenerando o documento inteiro.")
+
+    if document is not None:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(document, encoding="utf-8")
+        print(f"✅ [Incremental] Documento atualizado: {output_path}")
+    else:
+        result = run()
+        if result is None:
+            return None
+        document = result.read_text(encoding="utf-8")
+
+    incremental.save_snapshot(
+        output_path,
+        dados,
+        fingerprint=incremental.fingerprint(template_text, model),
+        document=document,
+    )
+    return output_path
+
+
+def _reuse_similar(
+    args: argparse.Namespace,
+    provider: str,
+    model: str,
+    output_path: Path,
+    dados: dict[str, Any],
+    template_text: str,
+    signature: list[int],
+) -> bool:
+    """Salva o MGR de um processo parecido (rascunho ou resultado). False se não houver reaproveitável."""
+    match = similar.find(
+        signature,
+        fingerprint=incremental.fingerprint(template_text, model),
+        threshold=args.similar_threshold,
+    )
+    if match is None:
+        return False
+    document = similar.adapt(match, dados, template_text)
+    if document is None:
+        print(
+            f"\n🔎 [Similar] {provider}: processo {match.similarity:.0%} parecido, mas um metadado alterado não "
+            "foi localizado no documento ou também aparece no corpo do texto; gerando do zero."
+        )
+        return False
+
+    target = output_path if args.similar == "reuse" else output_path.with_suffix(".rascunho.md")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(document, encoding="utf-8")
+    events.emit(
+        "similar_reuse",
+        provider=provider,
+        model=model,
+        similarity=round(match.similarity, 3),
+        mode=args.similar,
+        output=str(target),
+    )
+    found = f"\n🔎 [Similar] {provider}: processo {match.similarity:.0%} parecido"
+    if args.similar == "reuse":
+        print(f"{found}; MGR reaproveitado em '{target}'.")
+    else:
+        print(f"{found}; rascunho salvo em '{target}' (revise-o ou rode sem --similar draft para gerar do zero).")
+    return True
+
+
+def _print_session_usage() -> None:
+    cost, tokens = ledger.session_totals()
+    if tokens:
+        print(f"💰 Uso nesta execução: ~{tokens} tokens, US$ {cost:.4f} (estimado; detalhes: automgr usage)")
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    with profiling.phase("env_load"):
+        load_dotenv()
 
+    outdir = Path(args.outdir) if args.outdir else default_outdir(Path.cwd())
     providers = list(args.provider or ["gemini", "groq", "openai"])
 
-    if args.select_models:
+    interactive = bool(args.select_models and not args.auto_model)
+    prompts = _prepare_prompts(args, outdir, background=interactive)
+    if interactive:
+        # Listar os modelos já abre as conexões com os providers (substitui o pré-aquecimento).
+        found = discovery.ModelDiscovery(_model_listers(providers))
+    else:
+        system_prompt, user_prompt = prompts()
+
+    if args.auto_model:
+        choice = _auto_select_model(args, providers, system_prompt, user_prompt)
+        if choice is None:
+            return 2
+        providers = [choice.info.provider]
+        if choice.info.provider == "gemini":
+            args.gemini_model = [choice.info.model]
+        elif choice.info.provider == "groq":
+            args.groq_model = choice.info.model
+        elif choice.info.provider == "openai":
+            args.openai_model = choice.info.model
+
+    elif interactive:
         if "gemini" in providers:
-            available = gemini.list_models()
+            available = _discovered_models(found, "gemini")
             selected = _select_models_interactively(
                 "Gemini",
                 available,
@@ -174,7 +528,7 @@ def cmd_run(args: argparse.Namespace) -> int:
                 args.gemini_model = selected
 
         if "groq" in providers:
-            available = groq.list_models()
+            available = _discovered_models(found, "groq")
             selected = _select_models_interactively(
                 "Groq",
                 available,
@@ -187,7 +541,7 @@ def cmd_run(args: argparse.Namespace) -> int:
                 args.groq_model = selected[0]
 
         if "openai" in providers:
-            available = openai_provider.list_models()
+            available = _discovered_models(found, "openai")
             selected = _select_models_interactively(
                 "OpenAI",
                 available,
@@ -199,48 +553,143 @@ def cmd_run(args: argparse.Namespace) -> int:
             elif selected is not None:
                 args.openai_model = selected[0]
 
+        if "local" in providers:
+            available = _discovered_models(found, "local")
+            selected = _select_models_interactively(
+                "Local",
+                available,
+                default=[args.local_model or local.default_model()],
+                allow_multiple=False,
+            )
+            if selected == []:
+                providers.remove("local")
+            elif selected is not None:
+                args.local_model = selected[0]
+
+        system_prompt, user_prompt = prompts()
+
+    runs: list[tuple[str, str, Callable[..., str], Callable[[], Path | None]]] = []
     if "gemini" in providers:
-        gemini.run(
-            system_prompt,
-            user_prompt,
-            outdir=outdir,
-            models_to_try=args.gemini_model or None,
-            temperature=args.temperature,
+        gemini_models = args.gemini_model or gemini.DEFAULT_MODELS_TO_TRY
+        runs.append(
+            (
+                "gemini",
+                gemini_models[0],
+                gemini.complete,
+                lambda: gemini.run(
+                    system_prompt,
+                    user_prompt,
+                    outdir=outdir,
+                    models_to_try=gemini_models,
+                    temperature=args.temperature,
+                ),
+            )
         )
 
     if "groq" in providers:
-        groq.run(
-            system_prompt,
-            user_prompt,
-            outdir=outdir,
-            model=args.groq_model,
-            temperature=args.temperature,
-            max_tokens=args.max_tokens,
-            attempts=args.attempts,
+        runs.append(
+            (
+                "groq",
+                args.groq_model,
+                groq.complete,
+                lambda: groq.run(
+                    system_prompt,
+                    user_prompt,
+                    outdir=outdir,
+                    model=args.groq_model,
+                    temperature=args.temperature,
+                    max_tokens=_max_tokens(args, "groq", args.groq_model),
+                    attempts=args.attempts,
+                ),
+            )
         )
 
     if "openai" in providers:
-        openai_provider.run(
-            system_prompt,
-            user_prompt,
-            outdir=outdir,
-            model=args.openai_model,
-            temperature=args.temperature,
-            attempts=args.attempts,
+        runs.append(
+            (
+                "openai",
+                args.openai_model,
+                openai_provider.complete,
+                lambda: openai_provider.run(
+                    system_prompt,
+                    user_prompt,
+                    outdir=outdir,
+                    model=args.openai_model,
+                    temperature=args.temperature,
+                    max_tokens=_max_tokens(args, "openai", args.openai_model),
+                    attempts=args.attempts,
+                ),
+            )
         )
 
+    if "local" in providers:
+        local_model = args.local_model or local.default_model()
+        runs.append(
+            (
+                "local",
+                local_model,
+                local.complete,
+                lambda: local.run(
+                    system_prompt,
+                    user_prompt,
+                    outdir=outdir,
+                    model=local_model,
+                    temperature=args.temperature,
+                    max_tokens=_max_tokens(args, "local", local_model),
+                    attempts=args.attempts,
+                ),
+            )
+        )
+
+    if args.similar != "off":
+        with profiling.phase("similar.signature"):
+            dados = prompt_lib.load_json(_dados_path(args))
+            template_text = prompt_lib.load_text(_template_path(args))
+            signature = similar.signature(similar.content_terms(dados))
+
+    for provider, model, complete, run in runs:
+        output_path = outdir / f"resultado_{provider}.md"
+        if args.similar in ("draft", "reuse") and _reuse_similar(
+            args, provider, model, output_path, dados, template_text, signature
+        ):
+            continue
+        if args.incremental:
+            result = _run_incremental(args, provider, model, output_path, system_prompt, user_prompt, complete, run)
+        else:
+            result = run()
+        if args.similar != "off" and result is not None:
+            similar.record(
+                provider,
+                model,
+                dados,
+                signature,
+                fingerprint=incremental.fingerprint(template_text, model),
+                document=result.read_text(encoding="utf-8"),
+            )
+
     print("\n🏁 Fim das execuções.")
+    _print_session_usage()
     return 0
 
 
 def cmd_openrouter(args: argparse.Namespace) -> int:
-    load_dotenv()
+    with profiling.phase("env_load"):
+        load_dotenv()
 
     outdir = Path(args.outdir) if args.outdir else default_outdir(Path.cwd())
-    system_prompt, user_prompt = _load_and_build_prompts(args)
 
-    debug_path = _write_debug_prompt(outdir, system_prompt, user_prompt)
-    print(f"📝 Prompt montado. Debug em: {debug_path}")
+    interactive = bool(args.select_model and not args.model and not args.auto_model)
+    prompts = _prepare_prompts(args, outdir, background=interactive)
+    if interactive:
+        # A listagem (que já abre a conexão) corre junto com a montagem do prompt.
+        found = discovery.ModelDiscovery(_model_listers(["openrouter"]))
+    system_prompt, user_prompt = ("", "") if interactive else prompts()
+
+    if args.auto_model and not args.model:
+        choice = _auto_select_model(args, ["openrouter"], system_prompt, user_prompt)
+        if choice is None:
+            return 2
+        args.model = choice.info.model
 
     if args.model:
         openrouter.run_one(
@@ -249,13 +698,14 @@ def cmd_openrouter(args: argparse.Namespace) -> int:
             user_prompt,
             outdir=outdir,
             temperature=args.temperature,
-            max_tokens=args.max_tokens,
+            max_tokens=_max_tokens(args, "openrouter", args.model),
             timeout=args.timeout,
         )
+        _print_session_usage()
         return 0
 
     if args.select_model:
-        available = openrouter.list_models()
+        available = _discovered_models(found, "openrouter")
         selected = _select_models_interactively(
             "OpenRouter",
             available,
@@ -264,6 +714,7 @@ def cmd_openrouter(args: argparse.Namespace) -> int:
         )
         if selected == []:
             return 0
+        system_prompt, user_prompt = prompts()
         if selected is not None:
             openrouter.run_one(
                 selected[0],
@@ -271,9 +722,10 @@ def cmd_openrouter(args: argparse.Namespace) -> int:
                 user_prompt,
                 outdir=outdir,
                 temperature=args.temperature,
-                max_tokens=args.max_tokens,
+                max_tokens=_max_tokens(args, "openrouter", selected[0]),
                 timeout=args.timeout,
             )
+            _print_session_usage()
             return 0
 
     openrouter.run_menu(
@@ -281,14 +733,16 @@ def cmd_openrouter(args: argparse.Namespace) -> int:
         user_prompt,
         outdir=outdir,
         temperature=args.temperature,
-        max_tokens=args.max_tokens,
+        max_tokens=_max_tokens(args, "openrouter"),
         timeout=args.timeout,
     )
+    _print_session_usage()
     return 0
 
 
 def cmd_gemini_batch(args: argparse.Namespace) -> int:
-    load_dotenv()
+    with profiling.phase("env_load"):
+        load_dotenv()
 
     outdir = Path(args.outdir) if args.outdir else default_outdir(Path.cwd())
     system_prompt, user_prompt = _load_and_build_prompts(args)
@@ -305,6 +759,448 @@ def cmd_gemini_batch(args: argparse.Namespace) -> int:
         temperature=args.temperature,
         sleep_seconds=args.sleep,
     )
+    _print_session_usage()
+    return 0
+
+
+def _input_names(dados_paths: list[Path]) -> list[str]:
+    """
+    Nome de cada entrada de um envio em massa (subpasta de saída e custom_id): o nome do arquivo ou,
+    se ele se repete (ex.: `*/dados.json`), o caminho a partir da pasta comum, com `_` no lugar de `/`.
+    """
+    stems = [path.stem for path in dados_paths]
+    if len(set(stems)) == len(stems):
+        return stems
+    resolved = [path.resolve() for path in dados_paths]
+    root = Path(os.path.commonpath([path.parent for path in resolved]))
+    names: list[str] = []
+    for path in resolved:
+        relative = path.with_suffix("").relative_to(root)
+        if len(set(stems)) == 1 and len(relative.parts) > 1:
+            # Todos com o mesmo nome: a pasta já identifica a entrada.
+            relative = relative.parent
+        names.append(re.sub(r"[^\w.-]+", "_", relative.as_posix()))
+    return names
+
+
+def _bulk_prompts(args: argparse.Namespace, label: str) -> list[tuple[str, int, Path, str, str]] | None:
+    """
+    Prompts de um envio em massa (--dados-glob/--count): (nome da entrada, nº da versão, saída
+    relativa ao diretório de resultados, system, user). None se o glob não achar arquivos ou se
+    duas entradas ficarem com o mesmo nome.
+    """
+    if args.dados_glob:
+        dados_paths = sorted(Path.cwd().glob(args.dados_glob))
+        if not dados_paths:
+            print(f"⚠️ [{label}] Nenhum arquivo corresponde a '{args.dados_glob}'.")
+            return None
+    else:
+        dados_paths = [Path(args.dados) if args.dados else default_dados_path(Path.cwd())]
+
+    names = _input_names(dados_paths)
+    repeated = sorted({name for name in names if names.count(name) > 1})
+    if repeated:
+        print(f"❌ [{label}] Entradas com o mesmo nome ({', '.join(repeated)}); os resultados se sobrescreveriam.")
+        return None
+
+    prompts: list[tuple[str, int, Path, str, str]] = []
+    for dados_path, name in zip(dados_paths, names):
+        system_prompt, user_prompt = _load_and_build_prompts(args, dados_path)
+        target_dir = Path(name) if len(dados_paths) > 1 else Path()
+        for i in range(1, args.count + 1):
+            suffix = f"_{i:02d}" if args.count > 1 else ""
+            output = target_dir / f"resultado_{args.provider}{suffix}.md"
+            prompts.append((name, i, output, system_prompt, user_prompt))
+    return prompts
+
+
+def cmd_batch_submit(args: argparse.Namespace) -> int:
+    with profiling.phase("env_load"):
+        load_dotenv()
+
+    outdir = Path(args.outdir) if args.outdir else default_outdir(Path.cwd())
+    model = args.model or str(batch.PROVIDERS[args.provider]["model"])
+
+    prompts = _bulk_prompts(args, "Batch")
+    if prompts is None:
+        return 2
+    max_tokens = _max_tokens(args, args.provider, model)
+    jobs = [
+        batch.BatchJob(
+            custom_id=f"{stem}-{index:02d}",
+            output_path=str(outdir / relative_output),
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+        )
+        for stem, index, relative_output, system_prompt, user_prompt in prompts
+    ]
+
+    fits = ledger.affordable(
+        args.provider,
+        model,
+        input_tokens=max(prompt_lib.estimate_tokens(p[3] + p[4]) for p in prompts),
+        output_tokens=max_tokens,
+        count=len(jobs),
+        price_factor=ledger.BATCH_PRICE_FACTOR,
+    )
+    if fits < len(jobs):
+        if fits <= 0:
+            print("💸 [Batch] Nenhuma requisição cabe nos tetos (--max-spend/--max-tokens-total).")
+            return 2
+        print(f"💸 [Batch] Só {fits} de {len(jobs)} requisições cabem nos tetos (pior caso: --max-tokens).")
+        jobs = jobs[:fits]
+
+    print(f"📦 [Batch] Enviando {len(jobs)} requisição(ões) para {args.provider}/{model}...")
+    try:
+        manifest_path = batch.submit(
+            jobs,
+            provider=args.provider,
+            model=model,
+            outdir=outdir,
+            temperature=args.temperature,
+            max_tokens=max_tokens,
+            base_url=args.base_url,
+        )
+    except Exception as exc:  # noqa: BLE001 (CLI tool)
+        print(f"❌ [Batch] Falha ao enviar o lote: {exc}")
+        return 1
+
+    print(f"✅ [Batch] Lote enviado. Manifesto: {manifest_path}")
+    print("   Colete depois com: automgr batch-collect")
+    return 0
+
+
+def cmd_batch_collect(args: argparse.Namespace) -> int:
+    with profiling.phase("env_load"):
+        load_dotenv()
+
+    outdir = Path(args.outdir) if args.outdir else default_outdir(Path.cwd())
+    manifests = [Path(m) for m in args.manifest] if args.manifest else sorted(outdir.glob("lote_*.json"))
+    if not manifests:
+        print(f"⚠️ [Batch] Nenhum manifesto encontrado em {outdir}.")
+        return 2
+
+    status = 0
+    for manifest_path in manifests:
+        print(f"\n📥 [Batch] {manifest_path.name}")
+        try:
+            outputs = batch.collect(
+                manifest_path,
+                wait=not args.no_wait,
+                poll_interval=args.poll_interval,
+            )
+        except Exception as exc:  # noqa: BLE001 (CLI tool)
+            print(f"❌ [Batch] Falha ao coletar: {exc}")
+            status = 1
+            continue
+        for output_path in outputs:
+            print(f"✅ {output_path}")
+    return status
+
+
+def _queue_dir(args: argparse.Namespace) -> Path:
+    return Path(args.queue_dir) if args.queue_dir else jobqueue.default_queue_dir(Path.cwd())
+
+
+def cmd_queue_submit(args: argparse.Namespace) -> int:
+    with profiling.phase("env_load"):
+        load_dotenv()
+
+    root = _queue_dir(args)
+    model = args.model or api.default_model(args.provider)
+    prompts = _bulk_prompts(args, "Fila")
+    if prompts is None:
+        return 2
+    max_tokens = _max_tokens(args, args.provider, model)
+    jobs = [
+        jobqueue.QueueJob(
+            id=jobqueue.new_job_id(stem, index),
+            provider=args.provider,
+            model=model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            output=relative_output.as_posix(),
+            temperature=args.temperature,
+            max_tokens=max_tokens,
+        )
+        for stem, index, relative_output, system_prompt, user_prompt in prompts
+    ]
+    jobqueue.submit(root, jobs)
+    print(f"📬 [Fila] {len(jobs)} job(s) enfileirado(s) em {root} ({args.provider}/{model}).")
+    print(f"   Processe com: automgr worker --queue-dir {root}")
+    return 0
+
+
+def _execute_job(job: jobqueue.QueueJob) -> str:
+    generation = api.generate_from_prompts(
+        job.system_prompt,
+        job.user_prompt,
+        provider=job.provider,
+        model=job.model,
+        temperature=job.temperature,
+        max_tokens=job.max_tokens,
+    )
+    text = generation.text()
+    ledger.record(
+        job.provider,
+        job.model,
+        usage=generation.result.usage,
+        system_prompt=job.system_prompt,
+        user_prompt=job.user_prompt,
+        output_text=text,
+        output=job.output,
+    )
+    return text
+
+
+def cmd_worker(args: argparse.Namespace) -> int:
+    load_dotenv()
+    root = _queue_dir(args)
+    if not (root / "jobs").is_dir():
+        print(f"⚠️ [Worker] Fila não encontrada em {root} (crie com `automgr queue-submit`).")
+        return 2
+
+    worker = args.worker_id or jobqueue.worker_name()
+    print(f"👷 [Worker] {worker} com {args.concurrency} slot(s) na fila {root}. Ctrl+C para sair.")
+    try:
+        completed = jobqueue.run_worker(
+            root,
+            _execute_job,
+            worker=worker,
+            concurrency=args.concurrency,
+            lease_seconds=args.lease_seconds,
+            poll_seconds=args.poll,
+            max_attempts=args.max_attempts,
+            exit_when_done=args.exit_when_done,
+            should_stop=ledger.exhausted,
+        )
+    except KeyboardInterrupt:
+        # Os leases deste worker vencem sozinhos e os jobs voltam para a fila.
+        print("\n👋 [Worker] Encerrado; jobs em andamento voltam para a fila quando o lease vencer.")
+        return 0
+    print(f"🏁 [Worker] {completed} job(s) processado(s) por este worker.")
+    _print_session_usage()
+    return 0
+
+
+def cmd_queue_status(args: argparse.Namespace) -> int:
+    root = _queue_dir(args)
+    if not (root / "jobs").is_dir():
+        print(f"⚠️ [Fila] Nenhuma fila em {root}.")
+        return 2
+    current = jobqueue.status(root)
+    print(f"📊 [Fila] {root}")
+    print(f"   total: {current.total} | ok: {current.ok} | falhas: {current.failed}")
+    print(f"   em andamento: {current.running} | lease vencido: {current.stale} | pendentes: {current.pending}")
+    if current.workers:
+        print(f"   workers ativos: {', '.join(current.workers)}")
+    print(f"   resultados em: {root / 'results'}")
+    return 0 if current.failed == 0 else 1
+
+
+def cmd_score(args: argparse.Namespace) -> int:
+    outdir = Path(args.outdir) if args.outdir else default_outdir(Path.cwd())
+    paths = scoring.find_outputs(outdir, args.pattern)
+    if not paths:
+        print(f"⚠️ [Score] Nenhum arquivo '{args.pattern}' encontrado em {outdir}.")
+        return 2
+
+    max_risks = args.max_riscos if args.max_riscos is not None else _max_riscos(args)
+
+    print(f"🧮 [Score] Avaliando {len(paths)} arquivo(s) (max_riscos={max_risks})...")
+    scores = scoring.score_files(paths, max_risks=max_risks, workers=args.workers)
+    providers = sorted({s.label.partition("_")[0] for s in scores} & {"gemini", "groq", "openai", "openrouter"})
+    board = scoring.leaderboard(scores, history.load_history(), catalog.load_catalog(providers))
+
+    print("\n🏆 Ranking por modelo")
+    print(f"{'#':>3}  {'modelo':<45} {'arqs':>5} {'nota':>6} {'100%':>6} {'tempo':>8} {'custo':>10}")
+    for position, entry in enumerate(board, start=1):
+        seconds = "—" if entry.seconds is None else f"{entry.seconds:.1f}s"
+        cost = "—" if entry.cost is None else f"US$ {entry.cost:.4f}"
+        print(
+            f"{position:>3}  {entry.label[:45]:<45} {entry.files:>5} {entry.mean_score:>6.2f} "
+            f"{entry.pass_rate:>6.0%} {seconds:>8} {cost:>10}"
+        )
+
+    if args.details:
+        for item in sorted(scores, key=lambda s: s.score):
+            if item.problems:
+                print(f"\n📄 {item.path} (nota {item.score:.2f})")
+                for problem in item.problems:
+                    print(f"   - {problem}")
+
+    if args.json:
+        payload = {"leaderboard": [asdict(e) for e in board], "files": [asdict(s) for s in scores]}
+        Path(args.json).write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Detalhes salvos em {args.json}")
+    return 0
+
+
+def _format_seconds(summary: dict[str, float]) -> str:
+    return " | ".join(f"{key} {value:.2f}s" for key, value in summary.items()) or "-"
+
+
+def cmd_loadtest(args: argparse.Namespace) -> int:
+    load_dotenv()
+    if args.processos < 1 or args.rate <= 0 or args.workers < 1:
+        print("❌ [Carga] --processos, --rate e --workers precisam ser positivos.")
+        return 2
+    dados = prompt_lib.load_json(_dados_path(args))
+    template_text = prompt_lib.load_text(_template_path(args))
+    mock = loadtest.MockConfig(
+        first_token_seconds=args.mock_first_token,
+        tokens_per_second=args.mock_tokens_per_second,
+        output_tokens=args.mock_output_tokens,
+    )
+
+    with contextlib.ExitStack() as stack:
+        server: loadtest.MockServer | None = None
+        if args.local_url:
+            url, model = args.local_url, args.local_model or local.default_model()
+        else:
+            server = stack.enter_context(loadtest.MockServer(mock))
+            url, model = server.url, loadtest.MOCK_MODEL
+        local.configure(
+            base_url=url,
+            model=model,
+            context_size=args.local_context,
+            concurrency=args.local_concurrency or args.workers,
+        )
+        if args.workdir:
+            workdir = Path(args.workdir)
+            workdir.mkdir(parents=True, exist_ok=True)
+        else:
+            workdir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="automgr-carga-")))
+        # O ledger desta carga fica no diretório de trabalho, fora do histórico de uso real.
+        ledger.configure(command="loadtest", state_dir=workdir)
+
+        print(
+            f"🏋️ [Carga] {args.processos} processo(s) a {args.rate:g}/s ({args.arrival}) com {args.workers} "
+            f"worker(s) contra {'o servidor simulado' if server else url} ({model})..."
+        )
+        report = loadtest.run(
+            dados,
+            template_text,
+            _execute_job,
+            # Fila nova a cada execução: um --workdir reaproveitado não mistura jobs de cargas anteriores.
+            root=Path(tempfile.mkdtemp(prefix="queue-", dir=workdir)),
+            processos=args.processos,
+            rate=args.rate,
+            workers=args.workers,
+            model=model,
+            arrival=args.arrival,
+            json_indent=None if args.json_indent <= 0 else args.json_indent,
+            poll_seconds=args.poll,
+            seed=args.seed,
+        )
+        if server is not None:
+            report.max_inflight = server.max_inflight
+
+    print(
+        f"\n📈 [Carga] {report.completed}/{report.processos} processo(s) em {report.seconds:.1f}s "
+        f"({report.throughput_per_minute:.1f}/min); falhas: {report.failed}"
+    )
+    print(f"   Latência (chegada → resultado): {_format_seconds(report.latency)}")
+    print(f"   Espera na fila:                 {_format_seconds(report.queue_wait)}")
+    inflight = "" if report.max_inflight is None else f" | pedidos simultâneos no servidor: {report.max_inflight}"
+    print(f"   Fila: profundidade máxima {report.max_queue_depth}{inflight}")
+    if report.peak_rss_mb is not None:
+        print(f"   Memória: pico de RSS {report.peak_rss_mb:.1f} MB ({report.baseline_rss_mb:.1f} MB antes)")
+    events.emit("loadtest", **asdict(report))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(asdict(report), indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Relatório salvo em {args.json}")
+    return 0 if report.completed == report.processos else 1
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    load_dotenv()
+    outdir = Path(args.outdir) if args.outdir else default_outdir(Path.cwd())
+    ensure_dir(outdir)
+    watched = [_dados_path(args), _template_path(args)]
+    model = args.model or api.default_model(args.provider)
+    builder = watch.PromptBuilder(json_indent=None if args.json_indent <= 0 else args.json_indent)
+    runner = watch.GenerationRunner(outdir / f"resultado_{args.provider}.md")
+
+    print(f"👀 Observando {', '.join(str(p) for p in watched)} ({args.provider}:{model}). Ctrl+C para sair.")
+    stamp = watch.snapshot(watched)
+    try:
+        while True:
+            try:
+                started = time.perf_counter()
+                dados, template_text = _load_inputs(args)
+                prompts = builder.build(dados, template_text)
+            except (OSError, ValueError) as exc:
+                # JSON salvo pela metade ou arquivo temporariamente ausente: espera a próxima edição.
+                print(f"⚠️ Entradas inválidas, aguardando correção: {exc}")
+                events.error(f"entradas inválidas: {exc}")
+            else:
+                if runner.is_current(prompts):
+                    print("💤 Prompt inalterado; nada a regenerar.")
+                elif ledger.exhausted():
+                    print(f"💸 Regeneração suspensa: {ledger.exhausted()}.")
+                else:
+                    debug_path = _write_debug_prompt(outdir, *prompts)
+                    print(f"📝 Prompt montado (remontado: {', '.join(builder.rebuilt)}). Debug em: {debug_path}")
+                    _emit_prompt_built(
+                        *prompts,
+                        dados=watched[0],
+                        seconds=time.perf_counter() - started,
+                        rebuilt=builder.rebuilt,
+                    )
+                    # O prazo global (--deadline) vale para cada geração, não para a sessão inteira.
+                    streaming.configure(idle_timeout=args.idle_timeout, deadline_seconds=args.deadline)
+                    runner.start(
+                        api.generate_from_prompts(
+                            *prompts,
+                            provider=args.provider,
+                            model=model,
+                            temperature=args.temperature,
+                            max_tokens=_max_tokens(args, args.provider, model, dados=dados),
+                        )
+                    )
+            stamp = watch.wait_for_change(watched, stamp, poll=args.poll, debounce=args.debounce)
+            print("\n🔄 Alteração detectada.")
+    except KeyboardInterrupt:
+        runner.cancel()
+        print("\n👋 Watch encerrado.")
+    return 0
+
+
+def cmd_usage(args: argparse.Namespace) -> int:
+    since = time.time() - args.days * 86400 if args.days else None
+    entries = ledger.load_entries(since=since)
+    if args.provider:
+        entries = [e for e in entries if e.provider in args.provider]
+    if not entries:
+        print("⚠️ [Uso] Nenhuma geração registrada ainda (o registro começa na próxima execução).")
+        return 2
+
+    summary = ledger.summarize(entries)
+
+    def money(value: float | None) -> str:
+        return "-" if value is None else f"{value:.4f}"
+
+    print(f"{'provider/modelo':<48} {'MGRs':>5} {'entrada':>10} {'saída':>9} {'US$ total':>10} {'US$/MGR':>9}")
+    print("-" * 96)
+    for item in summary:
+        label = f"{item.provider}/{item.model}"
+        estimated = "*" if item.estimated_calls else ""
+        print(
+            f"{label[:48]:<48} {item.calls:>5} {item.input_tokens:>10} {item.output_tokens:>9}{estimated:1}"
+            f"{money(item.cost):>10} {money(item.cost_per_call):>9}"
+        )
+    known = [i.cost for i in summary if i.cost is not None]
+    print("-" * 96)
+    print(f"Total: {sum(i.calls for i in summary)} geração(ões), US$ {sum(known):.4f} estimado")
+    if any(i.estimated_calls for i in summary):
+        print("* inclui tokens estimados localmente (o provider não informou o uso no stream)")
+
+    if args.json:
+        payload = {"models": [asdict(i) for i in summary], "entries": [asdict(e) for e in entries]}
+        Path(args.json).write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Detalhes salvos em {args.json}")
     return 0
 
 
@@ -321,8 +1217,33 @@ def cmd_list_gemini_models(_: argparse.Namespace) -> int:
     return 0
 
 
+def _model_listers(
+    providers: list[str],
+    *,
+    only_gemini: bool = True,
+    only_chat: bool = True,
+) -> dict[str, Callable[[], list[str]]]:
+    listers: dict[str, Callable[[], list[str]]] = {
+        "gemini": lambda: gemini.list_models(only_gemini=only_gemini),
+        "groq": groq.list_models,
+        "openai": lambda: openai_provider.list_models(only_chat=only_chat),
+        "openrouter": openrouter.list_models,
+        "local": local.list_models,
+    }
+    return {provider: listers[provider] for provider in providers if provider in listers}
+
+
+def _discovered_models(found: discovery.ModelDiscovery, provider: str) -> list[str]:
+    result = found.get(provider)
+    for note in result.notes:
+        print(note)
+    if result.error:
+        print(f"⚠️ [{provider}] Não foi possível listar os modelos: {result.error}")
+    return result.models
+
+
 def cmd_models(args: argparse.Namespace) -> int:
-    selected_providers = args.provider or ["gemini", "groq", "openai", "openrouter"]
+    selected_providers = list(dict.fromkeys(args.provider or ["gemini", "groq", "openai", "openrouter"]))
     text_filter = (args.filter or "").strip().lower()
 
     def apply_filter(items: list[str]) -> list[str]:
@@ -330,23 +1251,22 @@ def cmd_models(args: argparse.Namespace) -> int:
             return items
         return [item for item in items if text_filter in item.lower()]
 
-    for provider in selected_providers:
+    found = discovery.ModelDiscovery(
+        _model_listers(selected_providers, only_gemini=args.only_gemini, only_chat=not args.all_openai_models),
+        timeout=args.timeout,
+    )
+    for result in found.as_completed():
         print("\n" + "=" * 60)
-        print(f"📦 Provider: {provider}")
+        print(f"📦 Provider: {result.provider} ({result.seconds:.1f}s)")
         print("-" * 60)
+        for note in result.notes:
+            print(note)
 
-        if provider == "gemini":
-            models = apply_filter(gemini.list_models(only_gemini=args.only_gemini))
-        elif provider == "groq":
-            models = apply_filter(groq.list_models())
-        elif provider == "openai":
-            models = apply_filter(openai_provider.list_models(only_chat=not args.all_openai_models))
-        elif provider == "openrouter":
-            models = apply_filter(openrouter.list_models())
-        else:
-            print("⚠️ Provider inválido.")
+        if result.error:
+            print(f"❌ Falha ao listar: {result.error}")
             continue
 
+        models = apply_filter(result.models)
         if not models:
             print("⚠️ Nenhum modelo encontrado.")
             continue
@@ -365,6 +1285,23 @@ def cmd_models(args: argparse.Namespace) -> int:
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(prog="automgr", description="AutoMGR - geração de MGR via IA")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Mostra ao final o tempo gasto em cada fase (leitura, montagem do prompt, rede, escrita)",
+    )
+    parser.add_argument(
+        "--profile-out",
+        help="Grava também as estatísticas do cProfile neste arquivo (abrir com pstats/snakeviz)",
+    )
+    parser.add_argument(
+        "--events",
+        choices=events.FORMATS,
+        default="off",
+        help="Emite eventos estruturados (ndjson: um JSON por linha) para outras ferramentas; "
+        "sem --events-out, vão para o stdout e a saída normal passa para o stderr",
+    )
+    parser.add_argument("--events-out", help="Grava os eventos neste arquivo (append) em vez do stdout")
     sub = parser.add_subparsers(dest="command", required=True)
 
     def add_common_io_flags(p: argparse.ArgumentParser) -> None:
@@ -378,16 +1315,171 @@ def build_parser() -> argparse.ArgumentParser:
             help="Indentação do JSON no prompt (default: 2; use 0 para compacto/1 linha)",
         )
 
+        p.add_argument(
+            "--dedup",
+            action="store_true",
+            help="Troca trechos do TR copiados do ETP por uma referência curta (economiza tokens)",
+        )
+        p.add_argument(
+            "--prune-top-k",
+            type=int,
+            default=0,
+            help="Mantém só as K seções do ETP/TR mais relevantes para riscos (BM25 local; 0=desligado)",
+        )
+        p.add_argument(
+            "--prune-token-budget",
+            type=int,
+            default=0,
+            help="Limite (estimado) de tokens para as seções do ETP/TR mantidas (BM25 local; 0=desligado)",
+        )
+        p.add_argument(
+            "--condense",
+            action="store_true",
+            help="Condensa seções grandes do ETP/TR antes de montar o prompt (map-reduce, com cache)",
+        )
+        p.add_argument(
+            "--condense-provider",
+            choices=sorted(condense.DEFAULT_MODELS),
+            default="gemini",
+            help="(--condense) provider usado na condensação (default: gemini)",
+        )
+        p.add_argument(
+            "--condense-model",
+            help="(--condense) modelo usado na condensação (default: modelo rápido do provider)",
+        )
+        p.add_argument(
+            "--condense-workers",
+            type=int,
+            default=condense.DEFAULT_MAX_WORKERS,
+            help="(--condense) seções condensadas em paralelo",
+        )
+
+        p.add_argument(
+            "--deadline",
+            type=float,
+            default=0,
+            help="Prazo global da execução em segundos (0=sem prazo); ao esgotar, o stream é cancelado",
+        )
+        p.add_argument(
+            "--idle-timeout",
+            type=float,
+            default=120,
+            help="Cancela um stream que fique N segundos sem enviar chunks (default: 120; 0=desligado)",
+        )
+        p.add_argument(
+            "--rate-limit",
+            action="append",
+            metavar="PROVIDER=RPM:TPM",
+            help=(
+                "Cota compartilhada entre processos por provider/chave (ex: groq=30:6000; repita a flag). "
+                f"Também lida de {ratelimit.ENV_LIMITS}"
+            ),
+        )
+        p.add_argument(
+            "--rate-limit-db",
+            help="Arquivo SQLite da cota compartilhada (default: .automgr/ratelimit.sqlite3)",
+        )
+        p.add_argument(
+            "--cassette",
+            choices=["record", "replay"],
+            help="Grava os streams dos providers em cassetes ou os reproduz offline (sem chamadas de API)",
+        )
+        p.add_argument("--cassette-dir", help="Diretório dos cassetes (default: .automgr/cassettes)")
+        p.add_argument(
+            "--replay-speed",
+            type=float,
+            default=1.0,
+            help="(--cassette replay) velocidade da reprodução (1=tempo real, 10=10x, 0=instantâneo)",
+        )
+
+        echo = p.add_mutually_exclusive_group()
+        echo.add_argument(
+            "--progress",
+            dest="echo",
+            action="store_const",
+            const="progress",
+            help="Não ecoa o texto gerado; mostra progresso (tokens/s) por provider",
+        )
+        echo.add_argument(
+            "--no-echo",
+            dest="echo",
+            action="store_const",
+            const="no-echo",
+            help="Não ecoa o texto gerado; mostra só um resumo ao final de cada geração",
+        )
+        echo.add_argument(
+            "--quiet",
+            dest="echo",
+            action="store_const",
+            const="quiet",
+            help="Não imprime nada do streaming (execuções em lote/headless)",
+        )
+
+    def add_budget_flags(p: argparse.ArgumentParser) -> None:
+        p.add_argument(
+            "--max-spend",
+            type=float,
+            help="Teto de gasto estimado (US$) desta execução; ao atingir, não começa novas gerações",
+        )
+        p.add_argument(
+            "--max-tokens-total",
+            type=int,
+            help="Teto de tokens (entrada + saída) desta execução; ao atingir, não começa novas gerações",
+        )
+
+    def add_length_flags(p: argparse.ArgumentParser, *, max_tokens: bool = True) -> None:
+        if max_tokens:
+            p.add_argument(
+                "--max-tokens",
+                type=int,
+                help="Limite de tokens da resposta (default: previsto pelo MAX_RISCOS e pelas saídas "
+                "anteriores do modelo)",
+            )
+        p.add_argument(
+            "--max-continuations",
+            type=int,
+            default=continuation.DEFAULT_MAX_CONTINUATIONS,
+            help="Continuações automáticas quando a resposta para no limite de tokens (0 = desliga; "
+            f"default: {continuation.DEFAULT_MAX_CONTINUATIONS})",
+        )
+
+    def add_local_flags(p: argparse.ArgumentParser) -> None:
+        p.add_argument(
+            "--local-url",
+            help="(local) URL base do servidor compatível com a OpenAI (default: AUTOMGR_LOCAL_BASE_URL "
+            f"ou {local.DEFAULT_BASE_URL})",
+        )
+        p.add_argument("--local-model", help="(local) Modelo servido (default: AUTOMGR_LOCAL_MODEL)")
+        p.add_argument(
+            "--local-context",
+            type=int,
+            help="(local) Janela de contexto do servidor em tokens; limita o max_tokens de cada pedido",
+        )
+        p.add_argument(
+            "--local-concurrency",
+            type=int,
+            help="(local) Requisições simultâneas ao servidor (default: AUTOMGR_LOCAL_CONCURRENCY ou 1)",
+        )
+
+    def add_auto_model_flags(p: argparse.ArgumentParser) -> None:
+        p.add_argument(
+            "--auto-model",
+            choices=list(router.STRATEGIES),
+            help="Escolhe o modelo automaticamente (catálogo + histórico de latência)",
+        )
+        p.add_argument("--max-seconds", type=float, help="(--auto-model) tempo estimado máximo por geração")
+        p.add_argument("--max-cost", type=float, help="(--auto-model) custo estimado máximo em US$ por geração")
+
     run_p = sub.add_parser("run", help="Executa Gemini/Groq/OpenAI em sequência")
     add_common_io_flags(run_p)
     run_p.add_argument(
         "--provider",
         action="append",
-        choices=["gemini", "groq", "openai"],
+        choices=["gemini", "groq", "openai", "local"],
         help="Executa somente o(s) provider(s) escolhido(s) (repita a flag)",
     )
     run_p.add_argument("--temperature", type=float, default=0.2)
-    run_p.add_argument("--max-tokens", type=int, default=4000)
+    add_length_flags(run_p)
     run_p.add_argument("--attempts", type=int, default=3)
     run_p.add_argument(
         "--select-models",
@@ -401,6 +1493,29 @@ def build_parser() -> argparse.ArgumentParser:
     )
     run_p.add_argument("--groq-model", default="llama-3.3-70b-versatile")
     run_p.add_argument("--openai-model", default="gpt-4o")
+    run_p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reaproveita a execução anterior e regenera só os riscos afetados pelas mudanças no dados.json",
+    )
+    run_p.add_argument(
+        "--similar",
+        choices=similar.MODES,
+        default="off",
+        help=(
+            "Cache por similaridade com processos já gerados: record (só indexa), draft (salva o MGR do "
+            "processo parecido como rascunho) ou reuse (usa-o como resultado), sem chamar o modelo"
+        ),
+    )
+    run_p.add_argument(
+        "--similar-threshold",
+        type=float,
+        default=similar.DEFAULT_THRESHOLD,
+        help=f"Similaridade mínima (0-1) do ETP/TR para reaproveitar (default: {similar.DEFAULT_THRESHOLD})",
+    )
+    add_auto_model_flags(run_p)
+    add_budget_flags(run_p)
+    add_local_flags(run_p)
     run_p.set_defaults(func=cmd_run)
 
     or_p = sub.add_parser("openrouter", help="Executa via OpenRouter (menu ou --model)")
@@ -412,10 +1527,34 @@ def build_parser() -> argparse.ArgumentParser:
         help="Lista modelos do OpenRouter e permite escolher (pode ser bem grande)",
     )
     or_p.add_argument("--temperature", type=float, default=0.2)
-    or_p.add_argument("--max-tokens", type=int, default=4000)
+    add_length_flags(or_p)
     or_p.add_argument("--timeout", type=int, default=120)
+    add_auto_model_flags(or_p)
+    add_budget_flags(or_p)
     or_p.set_defaults(func=cmd_openrouter)
 
+    watch_p = sub.add_parser("watch", help="Regenera o MGR a cada edição do dados.json/template")
+    add_common_io_flags(watch_p)
+    watch_p.add_argument("--provider", choices=sorted(api.DEFAULT_MODELS), default="groq")
+    watch_p.add_argument("--model", help="Modelo (default: o padrão do provider)")
+    watch_p.add_argument("--temperature", type=float, default=0.2)
+    add_length_flags(watch_p)
+    watch_p.add_argument(
+        "--debounce",
+        type=float,
+        default=watch.DEFAULT_DEBOUNCE,
+        help=f"Espera N segundos sem novas edições antes de regenerar (default: {watch.DEFAULT_DEBOUNCE:g})",
+    )
+    watch_p.add_argument(
+        "--poll",
+        type=float,
+        default=watch.DEFAULT_POLL,
+        help=f"Intervalo de verificação dos arquivos em segundos (default: {watch.DEFAULT_POLL:g})",
+    )
+    add_budget_flags(watch_p)
+    add_local_flags(watch_p)
+    watch_p.set_defaults(func=cmd_watch)
+
     gb_p = sub.add_parser("gemini-batch", help="Gera várias versões usando Gemini (lote)")
     add_common_io_flags(gb_p)
     gb_p.add_argument(
@@ -426,8 +1565,172 @@ def build_parser() -> argparse.ArgumentParser:
     gb_p.add_argument("--count", type=int, default=3, help="Quantidade por modelo (default: 3)")
     gb_p.add_argument("--temperature", type=float, default=0.4, help="Temperatura (default: 0.4)")
     gb_p.add_argument("--sleep", type=float, default=2.0, help="Pausa entre gerações (segundos)")
+    add_budget_flags(gb_p)
+    add_length_flags(gb_p, max_tokens=False)
     gb_p.set_defaults(func=cmd_gemini_batch)
 
+    bs_p = sub.add_parser(
+        "batch-submit",
+        help="Envia vários prompts num job da Batch API (OpenAI/Groq; o modo batch do Gemini não é suportado)",
+    )
+    add_common_io_flags(bs_p)
+    bs_p.add_argument("--provider", choices=sorted(batch.PROVIDERS), default="openai")
+    bs_p.add_argument("--model", help="Modelo (default: gpt-4o para OpenAI, llama-3.3-70b-versatile para Groq)")
+    bs_p.add_argument(
+        "--dados-glob",
+        help="Padrão de arquivos de entrada (ex: 'inputs/lote/*.json'); cada um vira uma subpasta em outputs/",
+    )
+    bs_p.add_argument("--count", type=int, default=1, help="Versões por arquivo de entrada (default: 1)")
+    bs_p.add_argument("--temperature", type=float, default=0.2)
+    bs_p.add_argument(
+        "--max-tokens",
+        type=int,
+        help="Limite de tokens da resposta (default: previsto pelo MAX_RISCOS e pelas saídas anteriores)",
+    )
+    bs_p.add_argument("--base-url", help="URL base compatível com OpenAI (ex: servidor local de testes)")
+    add_budget_flags(bs_p)
+    bs_p.set_defaults(func=cmd_batch_submit)
+
+    bc_p = sub.add_parser("batch-collect", help="Coleta os resultados de jobs enviados com batch-submit")
+    bc_p.add_argument("--outdir", help="Diretório de saída com os manifestos lote_*.json (default: outputs/)")
+    bc_p.add_argument("--manifest", action="append", help="Manifesto específico (repita a flag)")
+    bc_p.add_argument("--no-wait", action="store_true", help="Consulta uma vez e sai se o job ainda não terminou")
+    bc_p.add_argument("--poll-interval", type=float, default=5.0, help="Intervalo inicial de consulta (segundos)")
+    bc_p.set_defaults(func=cmd_batch_collect)
+
+    def add_queue_dir_flag(p: argparse.ArgumentParser) -> None:
+        p.add_argument(
+            "--queue-dir",
+            help="Diretório da fila, compartilhado entre os hosts (ex.: NFS/SMB; default: .automgr/queue)",
+        )
+
+    qs_p = sub.add_parser("queue-submit", help="Enfileira gerações para `automgr worker` (um ou vários hosts)")
+    add_common_io_flags(qs_p)
+    add_queue_dir_flag(qs_p)
+    qs_p.add_argument("--provider", choices=sorted(api.DEFAULT_MODELS), default="groq")
+    qs_p.add_argument("--model", help="Modelo (default: o padrão do provider)")
+    qs_p.add_argument(
+        "--dados-glob",
+        help="Padrão de arquivos de entrada (ex: 'inputs/lote/*.json'); cada um vira uma subpasta em results/",
+    )
+    qs_p.add_argument("--count", type=int, default=1, help="Versões por arquivo de entrada (default: 1)")
+    qs_p.add_argument("--temperature", type=float, default=0.2)
+    add_length_flags(qs_p)
+    qs_p.set_defaults(func=cmd_queue_submit)
+
+    wk_p = sub.add_parser("worker", help="Processa jobs da fila (rode um por host; leases com heartbeat)")
+    add_queue_dir_flag(wk_p)
+    wk_p.add_argument("--concurrency", type=int, default=2, help="Jobs simultâneos neste worker (default: 2)")
+    wk_p.add_argument("--worker-id", help="Nome do worker nos leases (default: host-pid)")
+    wk_p.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=jobqueue.DEFAULT_LEASE_SECONDS,
+        help="Validade do lease; renovado a cada 1/3 do prazo (default: %(default)g)",
+    )
+    wk_p.add_argument(
+        "--poll",
+        type=float,
+        default=jobqueue.DEFAULT_POLL_SECONDS,
+        help="Intervalo entre consultas à fila vazia (default: %(default)g)",
+    )
+    wk_p.add_argument(
+        "--max-attempts",
+        type=int,
+        default=jobqueue.DEFAULT_MAX_ATTEMPTS,
+        help="Tentativas por job antes de marcá-lo como falha (default: %(default)d)",
+    )
+    wk_p.add_argument("--exit-when-done", action="store_true", help="Sai quando não houver mais jobs na fila")
+    wk_p.add_argument(
+        "--rate-limit",
+        action="append",
+        metavar="PROVIDER=RPM:TPM",
+        help="Cota compartilhada entre os processos deste host (como em `run`)",
+    )
+    wk_p.add_argument("--idle-timeout", type=float, default=120, help="Cancela streams parados há N segundos")
+    add_budget_flags(wk_p)
+    add_length_flags(wk_p, max_tokens=False)
+    add_local_flags(wk_p)
+    wk_p.set_defaults(func=cmd_worker)
+
+    lt_p = sub.add_parser(
+        "loadtest",
+        help="Simula N processos chegando a uma taxa dada (fila + workers + streaming) contra um servidor simulado",
+    )
+    lt_p.add_argument("--dados", help="JSON de entrada usado em todos os processos (default: inputs/dados.json)")
+    lt_p.add_argument("--template", help="Caminho do template (default: inputs/prompt_template.txt)")
+    lt_p.add_argument("--json-indent", type=int, default=2, help="Indentação do JSON no prompt (default: 2)")
+    lt_p.add_argument("-n", "--processos", type=int, default=50, help="Processos simulados (default: 50)")
+    lt_p.add_argument("--rate", type=float, default=2.0, help="Chegadas por segundo (default: 2)")
+    lt_p.add_argument(
+        "--arrival",
+        choices=loadtest.ARRIVALS,
+        default="poisson",
+        help="Intervalos entre chegadas: poisson (aleatórios, média 1/rate) ou uniform (fixos)",
+    )
+    lt_p.add_argument("--workers", type=int, default=4, help="Jobs simultâneos (como `worker --concurrency`)")
+    lt_p.add_argument(
+        "--poll",
+        type=float,
+        default=jobqueue.DEFAULT_POLL_SECONDS,
+        help="Intervalo entre consultas à fila vazia, como no worker (default: %(default)g)",
+    )
+    lt_p.add_argument("--seed", type=int, help="Semente das chegadas (repete a mesma sequência)")
+    lt_p.add_argument(
+        "--mock-first-token",
+        type=float,
+        default=loadtest.DEFAULT_FIRST_TOKEN_SECONDS,
+        help="(servidor simulado) Segundos até o primeiro token (default: %(default)g)",
+    )
+    lt_p.add_argument(
+        "--mock-tokens-per-second",
+        type=float,
+        default=loadtest.DEFAULT_TOKENS_PER_SECOND,
+        help="(servidor simulado) Vazão de cada resposta (default: %(default)g)",
+    )
+    lt_p.add_argument(
+        "--mock-output-tokens",
+        type=int,
+        default=loadtest.DEFAULT_OUTPUT_TOKENS,
+        help="(servidor simulado) Tamanho de cada resposta em tokens (default: %(default)d)",
+    )
+    lt_p.add_argument(
+        "--workdir",
+        help="Mantém as filas (uma por execução) e os resultados neste diretório (default: temporário)",
+    )
+    lt_p.add_argument("--json", help="Grava o relatório neste arquivo JSON")
+    add_local_flags(lt_p)
+    lt_p.set_defaults(func=cmd_loadtest)
+
+    usage_p = sub.add_parser("usage", help="Tokens e custo estimado por modelo (registro local das gerações)")
+    usage_p.add_argument("--days", type=float, help="Considera só os últimos N dias")
+    usage_p.add_argument(
+        "--provider",
+        action="append",
+        choices=["gemini", "groq", "openai", "openrouter", "local"],
+        help="Filtra por provider (repita a flag)",
+    )
+    usage_p.add_argument("--json", help="Grava o resumo e as entradas neste arquivo JSON")
+    usage_p.set_defaults(func=cmd_usage)
+
+    qst_p = sub.add_parser("queue-status", help="Mostra o andamento da fila de jobs")
+    add_queue_dir_flag(qst_p)
+    qst_p.set_defaults(func=cmd_queue_status)
+
+    score_p = sub.add_parser("score", help="Avalia os resultado_*.md e mostra um ranking por modelo")
+    score_p.add_argument("--outdir", help="Diretório com os resultados (busca recursiva; default: outputs/)")
+    score_p.add_argument("--pattern", default=scoring.DEFAULT_PATTERN, help="Padrão dos arquivos avaliados")
+    score_p.add_argument("--dados", help="JSON de entrada, para ler MAX_RISCOS (default: inputs/dados.json)")
+    score_p.add_argument(
+        "--max-riscos",
+        type=int,
+        help="Máximo de riscos esperado (default: MAX_RISCOS do dados.json)",
+    )
+    score_p.add_argument("--workers", type=int, help="Processos em paralelo (default: núcleos da máquina)")
+    score_p.add_argument("--details", action="store_true", help="Lista os problemas encontrados em cada arquivo")
+    score_p.add_argument("--json", help="Grava o ranking e as notas por arquivo neste JSON")
+    score_p.set_defaults(func=cmd_score)
+
     gm_p = sub.add_parser("list-gemini-models", help="Lista modelos do Gemini disponíveis na sua conta")
     gm_p.set_defaults(func=cmd_list_gemini_models)
 
@@ -435,7 +1738,7 @@ def build_parser() -> argparse.ArgumentParser:
     models_p.add_argument(
         "--provider",
         action="append",
-        choices=["gemini", "groq", "openai", "openrouter"],
+        choices=["gemini", "groq", "openai", "openrouter", "local"],
         help="Filtra por provider (repita a flag). Default: todos",
     )
     models_p.add_argument("--filter", help="Filtro por substring (ex: 'gemini-2.5', 'llama', 'deepseek')")
@@ -450,6 +1753,13 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="(OpenAI) inclui modelos além dos de chat (pode ficar bem grande)",
     )
+    models_p.add_argument(
+        "--timeout",
+        type=float,
+        default=discovery.DEFAULT_TIMEOUT,
+        help=f"Prazo (s) para cada provider responder (default: {discovery.DEFAULT_TIMEOUT:g})",
+    )
+    add_local_flags(models_p)
     models_p.set_defaults(func=cmd_models)
 
     return parser
@@ -458,7 +1768,85 @@ def build_parser() -> argparse.ArgumentParser:
 def main(argv: list[str] | None = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
-    return int(args.func(args))
+    console.configure(getattr(args, "echo", None) or "stream")
+    streaming.configure(
+        idle_timeout=getattr(args, "idle_timeout", None),
+        deadline_seconds=getattr(args, "deadline", None),
+    )
+    rate_limit_db = getattr(args, "rate_limit_db", None)
+    ratelimit.configure(
+        ratelimit.parse_limits(getattr(args, "rate_limit", None) or []),
+        db_path=Path(rate_limit_db) if rate_limit_db else None,
+        log=print,
+    )
+    ledger.configure(
+        max_spend=getattr(args, "max_spend", None),
+        max_tokens_total=getattr(args, "max_tokens_total", None),
+        command=args.command,
+    )
+    continuation.configure(max_continuations=getattr(args, "max_continuations", None))
+    local.configure(
+        base_url=getattr(args, "local_url", None),
+        model=getattr(args, "local_model", None),
+        context_size=getattr(args, "local_context", None),
+        concurrency=getattr(args, "local_concurrency", None),
+    )
+    cassette_dir = getattr(args, "cassette_dir", None)
+    cassette.configure(
+        getattr(args, "cassette", None) or "off",
+        directory=Path(cassette_dir) if cassette_dir else None,
+        speed=getattr(args, "replay_speed", 1.0),
+    )
+    if args.events == "off":
+        return _dispatch(args)
+
+    with contextlib.ExitStack() as stack:
+        if args.events_out:
+            out = stack.enter_context(open(args.events_out, "a", encoding="utf-8"))
+        else:
+            out = sys.stdout
+            # O stdout fica só com os eventos; prints e o eco do streaming vão para o stderr.
+            stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+        events.configure(args.events, out=out)
+        started = time.perf_counter()
+        events.emit(
+            "run_start",
+            command=args.command,
+            pid=os.getpid(),
+            argv=list(sys.argv[1:] if argv is None else argv),
+        )
+        exit_code = 1
+        try:
+            exit_code = _dispatch(args)
+            return exit_code
+        except KeyboardInterrupt:
+            exit_code = 130
+            raise
+        except Exception as exc:
+            events.error(str(exc))
+            raise
+        finally:
+            seconds = round(time.perf_counter() - started, 3)
+            events.emit("run_end", command=args.command, exit_code=exit_code, seconds=seconds)
+            events.configure("off")
+
+
+def _dispatch(args: argparse.Namespace) -> int:
+    if not args.profile and not args.profile_out:
+        return int(args.func(args))
+
+    profiling.configure(True)
+    profiler = cProfile.Profile() if args.profile_out else None
+    try:
+        if profiler is None:
+            return int(args.func(args))
+        return int(profiler.runcall(args.func, args))
+    finally:
+        if profiler is not None:
+            profiler.dump_stats(args.profile_out)
+        print(profiling.report())
+        if profiler is not None:
+            print(f"   cProfile: {args.profile_out}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+"""Condensação map-reduce de ETP/TR muito grandes antes da montagem do prompt.
+
+Map: cada seção grande do ETP/TR é condensada em paralelo (com cache por hash do conteúdo).
+Reduce: as seções condensadas são reunidas num resumo compacto por documento; se ainda
+ficar acima do limite, o documento inteiro passa por uma última condensação.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from automgr import ledger
+from automgr.paths import default_state_dir, ensure_dir
+from automgr.prompt import json_to_string, split_sections
+
+
+CACHE_DIRNAME = "condense_cache"
+CACHE_VERSION = "1"
+
+DEFAULT_MIN_SECTION_CHARS = 1500
+DEFAULT_MAX_DIGEST_CHARS = 40_000
+DEFAULT_MAX_WORKERS = 4
+
+DEFAULT_MODELS: dict[str, str] = {
+    "gemini": "models/gemini-2.0-flash",
+    "groq": "llama-3.1-8b-instant",
+    "openai": "gpt-4o-mini",
+    "openrouter": "deepseek/deepseek-chat",
+    "local": "local",
+}
+
+MAP_SYSTEM_PROMPT = (
+    "Você condensa seções de ETP/TR de contratações públicas (Lei nº 14.133/2021). "
+    "Preserve obrigações, prazos, valores, quantitativos, SLAs/IMR, penalidades, requisitos técnicos, "
+    "normas citadas e qualquer elemento útil para identificar riscos. Remova repetições e texto "
+    "protocolar. Não invente informações. Responda somente com o texto condensado, em tópicos curtos."
+)
+
+REDUCE_SYSTEM_PROMPT = (
+    "Você recebe resumos de seções de um mesmo documento (ETP ou TR) de contratação pública. "
+    "Una-os num resumo único e compacto, sem perder obrigações, prazos, valores, SLAs, penalidades "
+    "e requisitos técnicos. Mantenha a identificação das seções. Não invente informações. "
+    "Responda somente com o resumo."
+)
+
+Summarizer = Callable[[str, str], str]
+
+
+@dataclass
+class CondenseReport:
+    sections: int = 0
+    condensed: int = 0
+    cache_hits: int = 0
+    reduced_documents: list[str] = field(default_factory=list)
+    chars_before: int = 0
+    chars_after: int = 0
+
+
+class SummaryCache:
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(namespace: str, system_prompt: str, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (CACHE_VERSION, namespace, system_prompt, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        try:
+            return (self.cache_dir / f"{key}.txt").read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, text: str) -> None:
+        ensure_dir(self.cache_dir)
+        path = self.cache_dir / f"{key}.txt"
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def condense_dados(
+    dados: dict[str, Any],
+    summarize: Summarizer,
+    *,
+    namespace: str = "",
+    cache_dir: Path | None = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    min_section_chars: int = DEFAULT_MIN_SECTION_CHARS,
+    max_digest_chars: int = DEFAULT_MAX_DIGEST_CHARS,
+) -> tuple[dict[str, Any], CondenseReport]:
+    """
+    Retorna uma cópia de `dados` com `etp_conteudo`/`tr_conteudo` condensados.
+    `namespace` entra na chave do cache (ex.: provider/modelo usados na condensação).
+    """
+    cache = SummaryCache(cache_dir or default_state_dir(Path.cwd()) / CACHE_DIRNAME)
+    report = CondenseReport()
+    lock = threading.Lock()
+
+    def cached_summarize(system_prompt: str, text: str) -> str:
+        key = SummaryCache.key(namespace, system_prompt, text)
+        cached = cache.get(key)
+        if cached is not None:
+            with lock:
+                report.cache_hits += 1
+            return cached
+        summary = summarize(system_prompt, text).strip()
+        cache.put(key, summary)
+        return summary
+
+    sections = split_sections(dados)
+    report.sections = len(sections)
+    report.chars_before = sum(len(s.text) for s in sections)
+
+    def condense_section(index: int) -> str:
+        section = sections[index]
+        return cached_summarize(MAP_SYSTEM_PROMPT, f"[{section.document}] {section.title}\n{section.text}")
+
+    large = [i for i, section in enumerate(sections) if len(section.text) >= min_section_chars]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        summaries = dict(zip(large, pool.map(condense_section, large)))
+    report.condensed = len(summaries)
+
+    etp_digest: dict[str, Any] = {}
+    tr_digest: list[Any] = []
+    for index, section in enumerate(sections):
+        summary = summaries.get(index)
+        if section.document == "ETP":
+            etp_digest[section.title] = section.value if summary is None else summary
+        elif summary is None:
+            tr_digest.append(section.value)
+        else:
+            tr_digest.append({"secao": section.title, "resumo": summary})
+
+    condensed = copy.deepcopy(dados)
+    for key, document, digest in (("etp_conteudo", "ETP", etp_digest), ("tr_conteudo", "TR", tr_digest)):
+        merged = json_to_string(digest)
+        if len(merged) > max_digest_chars:
+            condensed[key] = cached_summarize(REDUCE_SYSTEM_PROMPT, merged)
+            report.reduced_documents.append(document)
+        elif digest:
+            condensed[key] = digest
+
+    report.chars_after = len(json_to_string(condensed.get("etp_conteudo", ""))) + len(
+        json_to_string(condensed.get("tr_conteudo", ""))
+    )
+    return condensed, report
+
+
+def make_summarizer(provider: str, model: str, *, max_tokens: int = 2000) -> Summarizer:
+    from automgr.providers import gemini, groq, local, openai_provider, openrouter
+
+    completers = {
+        "gemini": gemini.complete,
+        "groq": groq.complete,
+        "openai": openai_provider.complete,
+        "openrouter": openrouter.complete,
+        "local": local.complete,
+    }
+    if provider not in completers:
+        raise ValueError(f"Provider inválido para condensação: {provider}")
+    complete = completers[provider]
+
+    def summarize(system_prompt: str, text: str) -> str:
+        # Cada chamada (map ou reduce) conta nos tetos de --max-spend/--max-tokens-total.
+        stop = ledger.exhausted()
+        if stop:
+            raise RuntimeError(f"[Condensação] {stop}")
+        summary = complete(system_prompt, text, model=model, temperature=0.0, max_tokens=max_tokens)
+        ledger.record(
+            provider, model, usage=None, system_prompt=system_prompt, user_prompt=text, output_text=summary
+        )
+        return summary
+
+    return summarize
@@ -0,0 +1,182 @@
+"""Renderização do streaming no terminal com escrita em lote.
+
+Modos (`configure`):
+  - "stream": ecoa o texto gerado (padrão); com vários streams simultâneos,
+    só um ocupa o terminal por vez e os demais ficam em buffer até a vez deles.
+  - "progress": não ecoa o texto; mostra uma linha de progresso com tokens/s por stream.
+  - "no-echo": não ecoa o texto; imprime só um resumo ao final de cada stream.
+  - "quiet": não imprime nada do streaming.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from typing import TextIO
+
+from automgr.prompt import CHARS_PER_TOKEN
+
+
+MODES = ("stream", "progress", "no-echo", "quiet")
+
+FLUSH_INTERVAL_SECONDS = 0.05
+FLUSH_BYTES = 4096
+PROGRESS_INTERVAL_SECONDS = 0.25
+
+_mode = "stream"
+_out: TextIO | None = None
+_lock = threading.RLock()
+_active: list[StreamRenderer] = []
+_last_progress = 0.0
+
+
+def configure(mode: str = "stream", *, out: TextIO | None = None) -> None:
+    global _mode, _out
+    if mode not in MODES:
+        raise ValueError(f"Modo inválido: {mode} (use {', '.join(MODES)})")
+    _mode = mode
+    _out = out
+
+
+def get_mode() -> str:
+    return _mode
+
+
+def _stream_out() -> TextIO:
+    return _out or sys.stdout
+
+
+class StreamRenderer:
+    def __init__(self, label: str, *, rule_width: int = 30) -> None:
+        self.label = label
+        self.rule_width = rule_width
+        self.chars = 0
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        self._pending: list[str] = []
+        self._pending_bytes = 0
+        self._last_flush = self.started
+
+    def __enter__(self) -> StreamRenderer:
+        with _lock:
+            _active.append(self)
+            if _mode == "stream" and self._owns_terminal():
+                self._emit("-" * self.rule_width + "\n")
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def tokens(self) -> int:
+        return self.chars // CHARS_PER_TOKEN
+
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.elapsed if self.elapsed > 0 else 0.0
+
+    def write(self, delta: str) -> None:
+        if not delta:
+            return
+        self.chars += len(delta)
+
+        if _mode == "quiet" or _mode == "no-echo":
+            return
+        if _mode == "progress":
+            _render_progress()
+            return
+
+        with _lock:
+            self._pending.append(delta)
+            self._pending_bytes += len(delta)
+            if not self._owns_terminal():
+                return
+            now = time.perf_counter()
+            if self._pending_bytes >= FLUSH_BYTES or now - self._last_flush >= FLUSH_INTERVAL_SECONDS:
+                self._flush(now)
+
+    def close(self) -> None:
+        with _lock:
+            if self.finished is not None:
+                return
+            self.finished = time.perf_counter()
+
+            if _mode == "stream":
+                if self._owns_terminal():
+                    self._finish_stream_output()
+                    _active.remove(self)
+                    _promote_next_owner()
+                # Streams que não possuem o terminal são impressos quando chegar a vez deles.
+                return
+
+            _active.remove(self)
+            if _mode == "progress":
+                _emit_line("\r\033[K" + self._summary())
+                _render_progress(force=True)
+            elif _mode == "no-echo":
+                _emit_line(self._summary())
+
+    def _owns_terminal(self) -> bool:
+        return bool(_active) and _active[0] is self
+
+    def _flush(self, now: float | None = None) -> None:
+        if self._pending:
+            self._emit("".join(self._pending))
+            self._pending.clear()
+            self._pending_bytes = 0
+        self._last_flush = now or time.perf_counter()
+
+    def _finish_stream_output(self) -> None:
+        self._flush()
+        self._emit("\n" + "-" * self.rule_width + "\n")
+
+    def _emit(self, text: str) -> None:
+        out = _stream_out()
+        out.write(text)
+        out.flush()
+
+    def _summary(self) -> str:
+        return (
+            f"   📊 [{self.label}] ~{self.tokens} tokens em {self.elapsed:.1f}s "
+            f"({self.tokens_per_second():.1f} tok/s)"
+        )
+
+
+def _promote_next_owner() -> None:
+    while _active:
+        owner = _active[0]
+        owner._emit("-" * owner.rule_width + "\n")
+        if owner.finished is None:
+            owner._flush()
+            return
+        owner._finish_stream_output()
+        _active.pop(0)
+
+
+def _emit_line(text: str) -> None:
+    out = _stream_out()
+    out.write(text + "\n")
+    out.flush()
+
+
+def _render_progress(*, force: bool = False) -> None:
+    global _last_progress
+    with _lock:
+        now = time.perf_counter()
+        if not force and now - _last_progress < PROGRESS_INTERVAL_SECONDS:
+            return
+        _last_progress = now
+        if not _active:
+            return
+        parts = [f"[{r.label}] {r.tokens} tok {r.tokens_per_second():.1f} tok/s" for r in _active]
+        out = _stream_out()
+        out.write("\r\033[K" + " | ".join(parts))
+        out.flush()
+
+
+def open_stream(label: str, *, rule_width: int = 30) -> StreamRenderer:
+    return StreamRenderer(label, rule_width=rule_width)
@@ -0,0 +1,169 @@
+"""Saídas truncadas pelo limite de tokens: continuação automática e `max_tokens` sob medida.
+
+- `extend` envolve o stream de um provider: se a resposta termina com `finish_reason`
+  de limite ("length"/"max_tokens"), pede a continuação com o texto já gerado no prompt
+  e emenda as partes no mesmo stream (sem repetir o trecho que o modelo reescrever).
+  Para quem consome, é um único stream; o `usage` final soma as partes.
+- `suggest_max_tokens` estima o tamanho da saída a partir do MAX_RISCOS e dos tamanhos
+  das saídas anteriores do modelo (histórico local): nem trunca um MGR de 10 riscos,
+  nem reserva (no limitador e nos tetos de gasto) muito mais tokens que o necessário.
+"""
+
+from __future__ import annotations
+
+import math
+import statistics
+from typing import Any, Callable, Iterator
+
+from automgr import events, ledger, streaming
+from automgr.incremental import parse_document
+from automgr.prompt import CHARS_PER_TOKEN
+from automgr.streaming import StreamChunk
+
+
+DEFAULT_MAX_CONTINUATIONS = 2
+TRUNCATED_REASONS = {"length", "max_tokens"}
+# Quantos caracteres do início da continuação são comparados com o fim do texto anterior.
+OVERLAP_SCAN_CHARS = 400
+MIN_OVERLAP_CHARS = 12
+
+# Estimativa de saída: trechos fixos (cabeçalho, Itens 1 e 4) + tokens por risco.
+BASE_OUTPUT_TOKENS = 800
+DEFAULT_TOKENS_PER_RISK = 420
+MIN_TOKENS_PER_RISK = 100
+OUTPUT_MARGIN = 1.25
+MIN_MAX_TOKENS = 2048
+MAX_MAX_TOKENS = 16384
+
+CONTINUE_INSTRUCTIONS = (
+    "A resposta anterior foi interrompida pelo limite de tamanho. Abaixo está o texto já gerado. "
+    "Continue EXATAMENTE do ponto em que ele parou (pode ser no meio de uma palavra ou de uma linha "
+    "de tabela), mantendo o mesmo formato. Não repita nada do que já foi gerado, não comente e não "
+    "use blocos de código."
+)
+
+_max_continuations = DEFAULT_MAX_CONTINUATIONS
+
+
+def configure(*, max_continuations: int | None = None) -> None:
+    global _max_continuations
+    _max_continuations = DEFAULT_MAX_CONTINUATIONS if max_continuations is None else max(0, max_continuations)
+
+
+def continuation_prompt(user_prompt: str, generated: str) -> str:
+    return (
+        f"{user_prompt}\n\n{CONTINUE_INSTRUCTIONS}\n\n"
+        f"<<<TEXTO JÁ GERADO>>>\n{generated}\n<<<FIM DO TEXTO JÁ GERADO>>>"
+    )
+
+
+def trim_overlap(previous: str, continuation: str) -> str:
+    """Remove do início da continuação o trecho que só repete o fim do texto anterior."""
+    partial_line = previous.rpartition("\n")[2]
+    for size in range(min(len(continuation), len(previous), OVERLAP_SCAN_CHARS), 0, -1):
+        head = continuation[:size]
+        if previous.endswith(head) and (size >= MIN_OVERLAP_CHARS or head == partial_line):
+            return continuation[size:]
+    # O modelo recomeçou a linha interrompida desde o início.
+    if partial_line.strip() and continuation.startswith(partial_line):
+        return continuation[len(partial_line):]
+    return continuation
+
+
+def _add_usage(total: dict[str, int] | None, usage: dict[str, int] | None) -> dict[str, int] | None:
+    if usage is None:
+        return total
+    if total is None:
+        return dict(usage)
+    return {key: total.get(key, 0) + usage.get(key, 0) for key in total.keys() | usage.keys()}
+
+
+def extend(
+    open_part: Callable[[str], Iterator[StreamChunk]],
+    user_prompt: str,
+    *,
+    max_continuations: int | None = None,
+) -> Iterator[StreamChunk]:
+    """
+    Stream único com as continuações emendadas. `open_part(prompt)` abre o stream de uma
+    parte (o prompt de sistema fica a cargo do provider).
+    """
+    limit = _max_continuations if max_continuations is None else max_continuations
+    generated = ""
+    total_usage: dict[str, int] | None = None
+    finish_reason: str | None = None
+
+    for part in range(limit + 1):
+        prompt = user_prompt if part == 0 else continuation_prompt(user_prompt, generated)
+        part_usage: dict[str, int] | None = None
+        finish_reason = None
+        # O início de cada continuação fica retido até dar para comparar com o fim do texto anterior.
+        held: str | None = "" if part else None
+
+        for chunk in open_part(prompt):
+            part_usage = chunk.usage or part_usage
+            finish_reason = chunk.finish_reason or finish_reason
+            text = chunk.text
+            if held is not None:
+                held += text
+                if len(held) < OVERLAP_SCAN_CHARS:
+                    continue
+                text, held = trim_overlap(generated, held), None
+            if text:
+                generated += text
+                yield StreamChunk(text=text)
+
+        if held:
+            text = trim_overlap(generated, held)
+            generated += text
+            yield StreamChunk(text=text)
+        total_usage = _add_usage(total_usage, part_usage)
+
+        if not truncated(finish_reason) or part == limit:
+            break
+        if streaming.deadline_expired() or ledger.exhausted():
+            break
+        events.emit("continuation", part=part + 1, max_continuations=limit, output_chars=len(generated))
+
+    yield StreamChunk(finish_reason=finish_reason, usage=total_usage)
+
+
+def truncated(finish_reason: str | None) -> bool:
+    return (finish_reason or "").lower() in TRUNCATED_REASONS
+
+
+def truncation_warning(label: str, finish_reason: str | None) -> str | None:
+    """Aviso para a CLI quando a saída terminou no limite mesmo depois das continuações."""
+    if not truncated(finish_reason):
+        return None
+    return (
+        f"⚠️ [{label}] A saída ainda terminou no limite de tokens depois de {_max_continuations} "
+        "continuação(ões); aumente --max-tokens ou --max-continuations."
+    )
+
+
+def count_risks(text: str) -> int:
+    """Riscos na tabela-síntese (Item 2) do documento gerado."""
+    return sum(1 for segment in parse_document(text) if segment.kind == "row")
+
+
+def suggest_max_tokens(
+    history_data: dict[str, list[dict[str, Any]]],
+    provider: str,
+    model: str | None,
+    max_risks: int,
+) -> int:
+    """
+    `max_tokens` para um MGR com até `max_risks` riscos: usa os tokens por risco das saídas
+    anteriores do modelo (quando há histórico) ou uma média padrão, com folga de OUTPUT_MARGIN.
+    """
+    samples = (history_data.get(f"{provider}:{model}") or []) if model else []
+    per_risk = [
+        max(MIN_TOKENS_PER_RISK, (s["output_chars"] / CHARS_PER_TOKEN - BASE_OUTPUT_TOKENS) / s["risks"])
+        for s in samples
+        if s.get("risks") and s.get("output_chars")
+    ]
+    tokens_per_risk = statistics.median(per_risk) if per_risk else DEFAULT_TOKENS_PER_RISK
+    estimate = (BASE_OUTPUT_TOKENS + tokens_per_risk * max(1, max_risks)) * OUTPUT_MARGIN
+    rounded = 256 * math.ceil(estimate / 256)
+    return max(MIN_MAX_TOKENS, min(MAX_MAX_TOKENS, rounded))
@@ -0,0 +1,128 @@
+"""Descoberta de modelos em paralelo (`automgr models` e menus do `--select-models`).
+
+Cada provider é consultado na sua própria thread. Os resultados ficam disponíveis na
+ordem em que chegam; um provider lento ou com erro não segura os demais e, depois do
+prazo, é dado como esgotado (a thread é daemon e não impede o processo de terminar).
+Os avisos que os providers imprimem durante a listagem são guardados em `notes`, para
+não se misturarem na tela.
+"""
+
+from __future__ import annotations
+
+import io
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+
+DEFAULT_TIMEOUT = 15.0
+
+
+@dataclass
+class Discovery:
+    provider: str
+    models: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+    error: str | None = None
+    notes: list[str] = field(default_factory=list)
+
+
+class _ThreadRouter(io.TextIOBase):
+    """Stdout que desvia para um buffer o que as threads de descoberta imprimem."""
+
+    def __init__(self, target: io.TextIOBase) -> None:
+        self.target = target
+        self.buffers: dict[int, io.StringIO] = {}
+
+    def write(self, text: str) -> int:
+        buffer = self.buffers.get(threading.get_ident())
+        return buffer.write(text) if buffer is not None else self.target.write(text)
+
+    def flush(self) -> None:
+        self.target.flush()
+
+
+_router_lock = threading.Lock()
+_router: _ThreadRouter | None = None
+
+
+def _capture_start() -> io.StringIO:
+    global _router
+    buffer = io.StringIO()
+    with _router_lock:
+        if _router is None:
+            _router = _ThreadRouter(sys.stdout)
+            sys.stdout = _router
+        _router.buffers[threading.get_ident()] = buffer
+    return buffer
+
+
+def _capture_stop() -> None:
+    global _router
+    with _router_lock:
+        if _router is None:
+            return
+        _router.buffers.pop(threading.get_ident(), None)
+        if not _router.buffers:
+            if sys.stdout is _router:
+                sys.stdout = _router.target
+            _router = None
+
+
+class ModelDiscovery:
+    """Dispara a listagem de todos os providers de uma vez; `as_completed` e `get` leem os resultados."""
+
+    def __init__(self, listers: dict[str, Callable[[], list[str]]], *, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.started = time.perf_counter()
+        self.deadline = time.monotonic() + timeout
+        self._arrivals: queue.Queue[Discovery] = queue.Queue()
+        self._results: dict[str, Discovery] = {}
+        self._ready = {provider: threading.Event() for provider in listers}
+        self._lock = threading.Lock()
+        for provider, lister in listers.items():
+            threading.Thread(
+                target=self._work,
+                args=(provider, lister),
+                name=f"automgr-models-{provider}",
+                daemon=True,
+            ).start()
+
+    def _work(self, provider: str, lister: Callable[[], list[str]]) -> None:
+        buffer = _capture_start()
+        try:
+            result = Discovery(provider, list(lister()))
+        except Exception as exc:  # noqa: BLE001
+            result = Discovery(provider, error=str(exc) or type(exc).__name__)
+        finally:
+            _capture_stop()
+        result.notes = [line for line in buffer.getvalue().splitlines() if line.strip()]
+        result.seconds = time.perf_counter() - self.started
+        with self._lock:
+            self._results[provider] = result
+        self._ready[provider].set()
+        self._arrivals.put(result)
+
+    def _timed_out(self, provider: str) -> Discovery:
+        return Discovery(provider, seconds=time.perf_counter() - self.started, error="tempo esgotado")
+
+    def get(self, provider: str) -> Discovery:
+        """Espera o resultado de um provider (no máximo até o prazo comum)."""
+        self._ready[provider].wait(max(0.0, self.deadline - time.monotonic()))
+        with self._lock:
+            return self._results.get(provider) or self._timed_out(provider)
+
+    def as_completed(self) -> Iterator[Discovery]:
+        """Resultados na ordem de chegada; os providers que não responderem no prazo vêm por último."""
+        pending = set(self._ready)
+        while pending:
+            try:
+                result = self._arrivals.get(timeout=max(0.0, self.deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            pending.discard(result.provider)
+            yield result
+        for provider in sorted(pending):
+            yield self._timed_out(provider)
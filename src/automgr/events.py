@@ -0,0 +1,102 @@
+"""Eventos estruturados (`automgr --events ndjson`) para outras ferramentas acompanharem a execução.
+
+Cada evento é uma linha JSON (NDJSON) com `ts`, `run` (id da execução) e `event`:
+  - run_start / run_end: comando e pid (início), código de saída e duração (fim)
+  - prompt_built: tamanho do prompt montado (caracteres e tokens estimados)
+  - chunk: trecho de texto recebido no stream
+  - rate_limit_wait: espera pela cota do `--rate-limit` (provider e segundos)
+  - retry: tentativa que falhou e será repetida (erro ou stream parado)
+  - provider_done: geração concluída, com tempos (total e primeiro byte), tamanho e uso de tokens
+  - error: provider/comando que desistiu
+
+Sem `--events-out`, os eventos vão para o stdout e a saída para humanos passa para o stderr.
+Desligado (padrão), `emit` só compara uma variável; ligado, cada evento é um `json.dumps`
+e uma escrita de linha.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any, TextIO
+
+
+FORMATS = ("off", "ndjson")
+
+_out: TextIO | None = None
+_lock = threading.Lock()
+_run_id = ""
+
+
+def configure(fmt: str = "off", *, out: TextIO | None = None) -> None:
+    global _out, _run_id
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de eventos inválido: {fmt} (use {', '.join(FORMATS)})")
+    _out = out if fmt == "ndjson" else None
+    _run_id = f"{os.getpid():x}-{time.time_ns():x}"
+
+
+def enabled() -> bool:
+    return _out is not None
+
+
+def emit(event: str, **fields: Any) -> None:
+    out = _out
+    if out is None:
+        return
+    record = {"ts": round(time.time(), 3), "run": _run_id, "event": event, **fields}
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+    with _lock:
+        try:
+            out.write(line)
+            out.flush()
+        except (OSError, ValueError):
+            # Consumidor fechou o pipe: a geração continua, só sem eventos.
+            configure("off")
+
+
+def chunk(provider: str, model: str, text: str) -> None:
+    if _out is not None and text:
+        emit("chunk", provider=provider, model=model, text=text)
+
+
+def retry(provider: str, model: str, *, attempt: int, attempts: int, error: BaseException) -> None:
+    emit(
+        "retry",
+        provider=provider,
+        model=model,
+        attempt=attempt,
+        attempts=attempts,
+        error=str(error),
+        error_type=type(error).__name__,
+    )
+
+
+def provider_done(
+    provider: str,
+    model: str,
+    *,
+    seconds: float,
+    first_byte_seconds: float | None,
+    output_chars: int,
+    usage: dict[str, int] | None = None,
+    output: str | None = None,
+    finish_reason: str | None = None,
+) -> None:
+    emit(
+        "provider_done",
+        provider=provider,
+        model=model,
+        seconds=round(seconds, 3),
+        first_byte_seconds=None if first_byte_seconds is None else round(first_byte_seconds, 3),
+        output_chars=output_chars,
+        usage=usage,
+        output=output,
+        finish_reason=finish_reason,
+    )
+
+
+def error(message: str, *, provider: str | None = None, model: str | None = None) -> None:
+    emit("error", provider=provider, model=model, message=message)
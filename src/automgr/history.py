@@ -0,0 +1,97 @@
+"""Histórico local de latência por provider/modelo (usado pelo roteador de modelos)."""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Any
+
+from automgr.paths import default_state_dir, ensure_dir
+
+
+HISTORY_FILENAME = "latency_history.json"
+MAX_SAMPLES_PER_MODEL = 20
+
+
+def _history_path(state_dir: Path | None) -> Path:
+    return (state_dir or default_state_dir(Path.cwd())) / HISTORY_FILENAME
+
+
+def _key(provider: str, model: str) -> str:
+    return f"{provider}:{model}"
+
+
+def load_history(state_dir: Path | None = None) -> dict[str, list[dict[str, Any]]]:
+    path = _history_path(state_dir)
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def record_latency(
+    provider: str,
+    model: str,
+    *,
+    seconds: float,
+    first_byte_seconds: float | None,
+    input_chars: int,
+    output_chars: int,
+    risks: int | None = None,
+    state_dir: Path | None = None,
+) -> None:
+    path = _history_path(state_dir)
+    ensure_dir(path.parent)
+
+    history = load_history(state_dir)
+    samples = history.setdefault(_key(provider, model), [])
+    samples.append(
+        {
+            "ts": round(time.time(), 3),
+            "seconds": round(seconds, 3),
+            "first_byte_seconds": None if first_byte_seconds is None else round(first_byte_seconds, 3),
+            "input_chars": input_chars,
+            "output_chars": output_chars,
+        }
+    )
+    if risks:
+        # Tokens por risco alimentam o max_tokens automático (continuation.suggest_max_tokens).
+        samples[-1]["risks"] = risks
+    del samples[:-MAX_SAMPLES_PER_MODEL]
+
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(history, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def model_stats(
+    history: dict[str, list[dict[str, Any]]],
+    provider: str,
+    model: str,
+) -> dict[str, float] | None:
+    """
+    Retorna medianas de `first_byte_seconds`, `chars_per_second` e `output_chars`
+    das últimas execuções, ou None se não houver histórico do modelo.
+    """
+    samples = history.get(_key(provider, model)) or []
+    if not samples:
+        return None
+
+    first_bytes = [s["first_byte_seconds"] for s in samples if s.get("first_byte_seconds") is not None]
+    rates: list[float] = []
+    for sample in samples:
+        streaming = sample["seconds"] - (sample.get("first_byte_seconds") or 0.0)
+        if streaming > 0 and sample.get("output_chars"):
+            rates.append(sample["output_chars"] / streaming)
+
+    stats = {"output_chars": float(statistics.median(s.get("output_chars", 0) for s in samples))}
+    if first_bytes:
+        stats["first_byte_seconds"] = float(statistics.median(first_bytes))
+    if rates:
+        stats["chars_per_second"] = float(statistics.median(rates))
+    return stats
@@ -0,0 +1,329 @@
+"""Regeneração incremental do MGR quando o dados.json muda pouco.
+
+Após cada execução completa, guarda um retrato (snapshot) das entradas (metadados e
+seções do ETP/TR) e do documento gerado. Na execução seguinte, compara o dados.json
+atual com o retrato e escolhe a ação mais barata:
+
+- "reuse": nada relevante mudou; o documento anterior é mantido.
+- "patch": só alguns riscos são afetados; o modelo reescreve apenas esses riscos
+  (linha da tabela-síntese do Item 2 + bloco do Item 3) e o restante é reaproveitado.
+  Metadados alterados são trocados localmente no texto, sem chamada ao modelo.
+- "full": mudança grande, template/modelo diferente ou documento não reconhecido.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from automgr.paths import default_state_dir, ensure_dir
+from automgr.prompt import BM25Index, split_sections, tokenize
+
+
+SNAPSHOT_VERSION = 1
+SNAPSHOTS_DIRNAME = "incremental"
+
+# Riscos com relevância >= RELEVANCE_RATIO x a maior relevância de uma alteração são revistos.
+RELEVANCE_RATIO = 0.6
+MAX_RISKS_PER_CHANGE = 3
+# Acima desta fração de riscos afetados, regenerar tudo sai quase pelo mesmo custo.
+MAX_PATCH_FRACTION = 0.5
+MIN_REPLACE_CHARS = 3
+
+PATCH_SYSTEM_PROMPT = (
+    "MODO REVISÃO INCREMENTAL. Você recebe alguns riscos de um Mapa de Gerenciamento de Riscos já "
+    "gerado e as alterações feitas no ETP/TR desde então. Reescreva SOMENTE os riscos listados, "
+    "ajustando-os às alterações, mantendo o mesmo Id, o mesmo formato Markdown e a metodologia "
+    "(P, I e NR = P x I; danos; tratamento; ações preventivas e de contingência com responsáveis). "
+    "Estas regras substituem as regras de formato de saída das instruções originais. "
+    "Para cada risco, responda exatamente neste formato e nada mais:\n"
+    "<<<RISCO Rnn\n"
+    "| Rnn | ... |   (a linha do risco na tabela-síntese do Item 2)\n"
+    "Risco nn ...   (o bloco completo do risco no Item 3)\n"
+    "FIM_RISCO>>>"
+)
+
+_ITEM2_RE = re.compile(r"^\W*2\s*[–—-]\s*IDENTIFICA", re.IGNORECASE)
+_ITEM3_RE = re.compile(r"^\W*3\s*[–—-]\s*AVALIA", re.IGNORECASE)
+_ITEM4_RE = re.compile(r"^\W*4\s*[–—-]\s*ACOMPANHAMENTO", re.IGNORECASE)
+_ROW_RE = re.compile(r"^\s*\|\s*\**\s*(R\d{2})\b")
+_BLOCK_RE = re.compile(r"^\W*Risco\s+(\d{2})\b")
+_PATCH_RE = re.compile(r"<<<RISCO\s+(R\d{2})\s*\n(.*?)\n?FIM_RISCO>>>", re.DOTALL)
+
+
+@dataclass
+class Segment:
+    kind: str  # "text" | "row" | "block"
+    text: str
+    risk_id: str | None = None
+
+
+@dataclass
+class SectionChange:
+    document: str
+    title: str
+    before: str
+    after: str
+
+
+@dataclass
+class UpdatePlan:
+    action: str  # "reuse" | "patch" | "full"
+    reason: str
+    document: str | None = None
+    risk_ids: list[str] = field(default_factory=list)
+    changes: list[SectionChange] = field(default_factory=list)
+
+
+def parse_document(text: str) -> list[Segment]:
+    """Divide o documento em trechos fixos, linhas da tabela-síntese e blocos de risco do Item 3."""
+    segments: list[Segment] = []
+    part = "head"
+
+    def add_text(line: str) -> None:
+        if segments and segments[-1].kind == "text":
+            segments[-1].text += line
+        else:
+            segments.append(Segment("text", line))
+
+    for line in text.splitlines(keepends=True):
+        if _ITEM2_RE.match(line):
+            part = "item2"
+        elif _ITEM3_RE.match(line):
+            part = "item3"
+        elif _ITEM4_RE.match(line):
+            part = "tail"
+        elif part == "item2" and (row := _ROW_RE.match(line)):
+            segments.append(Segment("row", line, row.group(1)))
+            continue
+        elif part == "item3" and (block := _BLOCK_RE.match(line)):
+            segments.append(Segment("block", line, f"R{block.group(1)}"))
+            continue
+        elif part == "item3" and segments and segments[-1].kind == "block":
+            segments[-1].text += line
+            continue
+        add_text(line)
+    return segments
+
+
+def render(segments: list[Segment]) -> str:
+    return "".join(segment.text for segment in segments)
+
+
+def risk_texts(segments: list[Segment]) -> dict[str, str]:
+    texts: dict[str, str] = {}
+    for segment in segments:
+        if segment.risk_id is not None:
+            texts[segment.risk_id] = texts.get(segment.risk_id, "") + segment.text
+    return texts
+
+
+def _section_map(dados: dict[str, Any]) -> dict[str, list[str]]:
+    sections: dict[str, list[str]] = {}
+    for section in split_sections(dados):
+        key = f"{section.document}::{section.title}"
+        while key in sections:
+            key += "'"
+        sections[key] = [section.document, section.title, section.text]
+    return sections
+
+
+def fingerprint(template_text: str, model: str) -> str:
+    digest = hashlib.sha256()
+    for part in (str(SNAPSHOT_VERSION), template_text, model):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def snapshot_path(output_path: Path, state_dir: Path | None = None) -> Path:
+    key = hashlib.sha256(str(output_path.resolve()).encode("utf-8")).hexdigest()[:16]
+    return (state_dir or default_state_dir(Path.cwd())) / SNAPSHOTS_DIRNAME / f"{output_path.stem}_{key}.json"
+
+
+def load_snapshot(output_path: Path, state_dir: Path | None = None) -> dict[str, Any] | None:
+    try:
+        with snapshot_path(output_path, state_dir).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return data if isinstance(data, dict) and data.get("version") == SNAPSHOT_VERSION else None
+
+
+def save_snapshot(
+    output_path: Path,
+    dados: dict[str, Any],
+    *,
+    fingerprint: str,
+    document: str,
+    state_dir: Path | None = None,
+) -> Path:
+    path = snapshot_path(output_path, state_dir)
+    ensure_dir(path.parent)
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprint": fingerprint,
+        "metadados": {key: str(value) for key, value in dados.get("metadados", {}).items()},
+        "sections": _section_map(dados),
+        "risks": sorted(risk_texts(parse_document(document))),
+        "document": document,
+    }
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return path
+
+
+def diff_sections(before: dict[str, list[str]], after: dict[str, list[str]]) -> list[SectionChange]:
+    changes: list[SectionChange] = []
+    for key in list(before) + [k for k in after if k not in before]:
+        old = before.get(key)
+        new = after.get(key)
+        if old is not None and new is not None and old[2] == new[2]:
+            continue
+        document, title = (new or old)[0], (new or old)[1]
+        changes.append(SectionChange(document, title, old[2] if old else "", new[2] if new else ""))
+    return changes
+
+
+def affected_risks(segments: list[Segment], changes: list[SectionChange]) -> list[str] | None:
+    """
+    Riscos relacionados a cada alteração (BM25 sobre o texto de cada risco, consultado com os
+    termos que mudaram). Retorna None se alguma alteração não tiver nenhum risco relacionado.
+    """
+    texts = risk_texts(segments)
+    ids = list(texts)
+    if not ids:
+        return None
+    index = BM25Index([tokenize(texts[risk_id]) for risk_id in ids])
+
+    selected: set[str] = set()
+    for change in changes:
+        before, after = tokenize(change.before), tokenize(change.after)
+        changed_terms = sorted(set(before) ^ set(after)) or before + after
+        scores = index.scores(tokenize(change.title) + changed_terms)
+        best = max(scores)
+        if best <= 0:
+            return None
+        ranked = sorted(zip(ids, scores), key=lambda item: item[1], reverse=True)
+        selected.update(
+            risk_id for risk_id, score in ranked[:MAX_RISKS_PER_CHANGE] if score >= RELEVANCE_RATIO * best
+        )
+    return [risk_id for risk_id in ids if risk_id in selected]
+
+
+def apply_metadata(document: str, before: dict[str, str], after: dict[str, str], template_text: str) -> str | None:
+    """
+    Troca no texto os valores de metadados usados pelo template, numa única passada. None se algum
+    valor alterado não for localizável ou aparecer mais vezes do que o template o usa (o valor também
+    está no corpo do texto, ex.: um ano ou uma sigla, e a troca reescreveria o documento).
+    """
+    replacements: dict[str, str] = {}
+    uses: Counter[str] = Counter()
+    for key in sorted(set(before) | set(after)):
+        old, new = before.get(key, ""), after.get(key, "")
+        placeholders = template_text.count(f"{{{{{key}}}}}")
+        if old == new or not placeholders:
+            continue
+        if len(old) < MIN_REPLACE_CHARS or replacements.get(old, new) != new:
+            return None
+        replacements[old] = new
+        uses[old] += placeholders
+    if not replacements:
+        return document
+
+    pattern = re.compile("|".join(re.escape(old) for old in sorted(replacements, key=len, reverse=True)))
+    found = Counter(match.group(0) for match in pattern.finditer(document))
+    if any(not 0 < found[old] <= uses[old] for old in replacements):
+        return None
+    return pattern.sub(lambda match: replacements[match.group(0)], document)
+
+
+def plan_update(
+    snapshot: dict[str, Any] | None,
+    dados: dict[str, Any],
+    *,
+    template_text: str,
+    model: str,
+) -> UpdatePlan:
+    if snapshot is None:
+        return UpdatePlan("full", "sem execução anterior registrada")
+    if snapshot.get("fingerprint") != fingerprint(template_text, model):
+        return UpdatePlan("full", "template ou modelo mudou desde a última execução")
+
+    metadados = {key: str(value) for key, value in dados.get("metadados", {}).items()}
+    document = apply_metadata(snapshot["document"], snapshot.get("metadados", {}), metadados, template_text)
+    if document is None:
+        return UpdatePlan("full", "metadado alterado não localizado (ou repetido no corpo) do documento anterior")
+
+    changes = diff_sections(snapshot.get("sections", {}), _section_map(dados))
+    if not changes:
+        reason = "nenhuma alteração" if document == snapshot["document"] else "apenas metadados alterados"
+        return UpdatePlan("reuse", reason, document=document)
+
+    segments = parse_document(document)
+    risk_ids = affected_risks(segments, changes)
+    if risk_ids is None:
+        return UpdatePlan("full", "alteração sem risco relacionado no documento anterior", changes=changes)
+    total = len(risk_texts(segments))
+    if len(risk_ids) > MAX_PATCH_FRACTION * total:
+        return UpdatePlan("full", f"{len(risk_ids)}/{total} riscos afetados", changes=changes)
+
+    reason = f"{len(changes)} seção(ões) alterada(s) → revisar {', '.join(risk_ids)} de {total} riscos"
+    return UpdatePlan("patch", reason, document=document, risk_ids=risk_ids, changes=changes)
+
+
+def build_patch_prompts(system_prompt: str, user_prompt: str, plan: UpdatePlan) -> tuple[str, str]:
+    texts = risk_texts(parse_document(plan.document or ""))
+    risks = "\n\n".join(texts[risk_id].strip() for risk_id in plan.risk_ids)
+
+    changes: list[str] = []
+    for change in plan.changes:
+        changes.append(f"- [{change.document}] {change.title}")
+        changes.append(f"  ANTES: {change.before or '(seção inexistente)'}")
+        changes.append(f"  DEPOIS: {change.after or '(seção removida)'}")
+
+    patch_system = f"{PATCH_SYSTEM_PROMPT}\n\n[INSTRUÇÕES ORIGINAIS — metodologia e estilo]\n{system_prompt}"
+    patch_user = (
+        f"Reescreva somente os riscos {', '.join(plan.risk_ids)}.\n\n"
+        f"[RISCOS A REVISAR — versão anterior]\n{risks}\n\n"
+        f"[ALTERAÇÕES NO ETP/TR]\n" + "\n".join(changes) + "\n\n"
+        f"[ENTRADA ATUALIZADA — referência]\n{user_prompt}"
+    )
+    return patch_system, patch_user
+
+
+def merge_patch(document: str, response: str, risk_ids: list[str]) -> str | None:
+    """Substitui no documento os riscos revisados. None se a resposta não trouxer todos eles."""
+    revised: dict[str, tuple[str, str]] = {}
+    for match in _PATCH_RE.finditer(response):
+        risk_id, body = match.group(1), match.group(2)
+        lines = body.strip("\n").splitlines(keepends=True)
+        row_index = next((i for i, line in enumerate(lines) if _ROW_RE.match(line)), None)
+        if row_index is None:
+            continue
+        block = "".join(lines[row_index + 1 :]).strip("\n")
+        if not _BLOCK_RE.match(block):
+            continue
+        revised[risk_id] = (lines[row_index].rstrip("\n") + "\n", block)
+
+    if any(risk_id not in revised for risk_id in risk_ids):
+        return None
+
+    segments = parse_document(document)
+    for segment in segments:
+        if segment.risk_id not in risk_ids:
+            continue
+        row, block = revised[segment.risk_id]
+        if segment.kind == "row":
+            segment.text = row
+        else:
+            trailing = segment.text[len(segment.text.rstrip("\n")) :]
+            segment.text = block + (trailing or "\n")
+    return render(segments)
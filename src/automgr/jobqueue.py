@@ -0,0 +1,375 @@
+"""Fila de jobs num diretório compartilhado, para vários `automgr worker` (em vários hosts).
+
+Layout de <fila>/:
+  jobs/<id>.json     especificação (prompt já montado, provider, modelo, arquivo de saída)
+  leases/<id>.json   posse atual: worker, prazo (renovado por heartbeat) e tentativa
+  done/<id>.json     desfecho (ok ou falha), criado uma única vez (O_EXCL)
+  results/...        os `resultado_*.md`, no mesmo layout do batch-submit
+
+A posse de um job é garantida pela criação exclusiva do arquivo de lease. Um lease
+vencido (worker que caiu ou ficou sem rede) é tomado por outro worker: o arquivo é
+renomeado (só um consegue) e recriado com a tentativa seguinte. Os prazos usam o
+relógio de cada host; mantenha-os sincronizados (NTP) e o lease bem maior que o
+intervalo de heartbeat.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from automgr.paths import default_state_dir, ensure_dir
+
+
+DEFAULT_LEASE_SECONDS = 90.0
+DEFAULT_POLL_SECONDS = 2.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+@dataclass
+class QueueJob:
+    id: str
+    provider: str
+    model: str
+    system_prompt: str
+    user_prompt: str
+    output: str
+    temperature: float = 0.2
+    max_tokens: int = 4000
+
+
+@dataclass
+class Lease:
+    job_id: str
+    worker: str
+    token: str
+    attempt: int
+    expires: float
+
+
+@dataclass
+class QueueStatus:
+    total: int
+    ok: int
+    failed: int
+    running: int
+    stale: int
+    pending: int
+    workers: list[str]
+
+
+def default_queue_dir(project_root: Path) -> Path:
+    return default_state_dir(project_root) / "queue"
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _dirs(root: Path) -> tuple[Path, Path, Path, Path]:
+    return root / "jobs", root / "leases", root / "done", root / "results"
+
+
+def _read_json(path: Path) -> dict[str, Any] | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_atomic(path: Path, data: dict[str, Any]) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _create_exclusive(path: Path, data: dict[str, Any]) -> bool:
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return True
+
+
+def _lease_expiry(path: Path, lease_seconds: float) -> float:
+    data = _read_json(path)
+    if data is not None:
+        return float(data.get("expires", 0.0))
+    # Lease recém-criado e ainda vazio (ou ilegível): conta a partir da criação do arquivo.
+    try:
+        return path.stat().st_mtime + lease_seconds
+    except FileNotFoundError:
+        return 0.0
+
+
+def submit(root: Path, jobs: list[QueueJob]) -> list[str]:
+    jobs_dir, leases_dir, done_dir, results_dir = _dirs(root)
+    for directory in (jobs_dir, leases_dir, done_dir, results_dir):
+        ensure_dir(directory)
+    for job in jobs:
+        _write_atomic(jobs_dir / f"{job.id}.json", asdict(job))
+    return [job.id for job in jobs]
+
+
+def new_job_id(stem: str, index: int) -> str:
+    return f"{stem}-{index:02d}-{uuid.uuid4().hex[:8]}"
+
+
+def _new_lease(job_id: str, worker: str, attempt: int, lease_seconds: float) -> Lease:
+    return Lease(job_id, worker, uuid.uuid4().hex, attempt, time.time() + lease_seconds)
+
+
+def _steal(lease_path: Path, worker: str, lease_seconds: float) -> Lease | None:
+    """Toma um lease vencido. Só um worker consegue renomear o arquivo antigo."""
+    stale_path = lease_path.with_name(f"{lease_path.stem}.{uuid.uuid4().hex[:8]}.stale")
+    try:
+        os.rename(lease_path, stale_path)
+    except FileNotFoundError:
+        return None
+    old = _read_json(stale_path) or {}
+    if float(old.get("expires", 0.0)) > time.time():
+        # Outro worker renovou/tomou o lease entre a leitura e o rename: devolve e desiste.
+        try:
+            os.link(stale_path, lease_path)
+        except FileExistsError:
+            pass
+        stale_path.unlink(missing_ok=True)
+        return None
+    stale_path.unlink(missing_ok=True)
+
+    lease = _new_lease(lease_path.stem, worker, int(old.get("attempt", 0)) + 1, lease_seconds)
+    return lease if _create_exclusive(lease_path, asdict(lease)) else None
+
+
+def claim(
+    root: Path,
+    worker: str,
+    *,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> tuple[QueueJob, Lease] | None:
+    """Reserva um job livre (ou com lease vencido). Retorna None se não houver nenhum agora."""
+    jobs_dir, leases_dir, done_dir, _ = _dirs(root)
+    candidates = [p.stem for p in jobs_dir.glob("*.json") if not (done_dir / p.name).exists()]
+    # Ordem aleatória: workers diferentes não disputam sempre o mesmo job.
+    random.shuffle(candidates)
+
+    for job_id in candidates:
+        lease_path = leases_dir / f"{job_id}.json"
+        lease: Lease | None = _new_lease(job_id, worker, 1, lease_seconds)
+        if not _create_exclusive(lease_path, asdict(lease)):
+            if _lease_expiry(lease_path, lease_seconds) > time.time():
+                continue
+            lease = _steal(lease_path, worker, lease_seconds)
+            if lease is None:
+                continue
+
+        if lease.attempt > max_attempts:
+            finish(root, lease, ok=False, error=f"desistência após {max_attempts} tentativa(s) sem concluir")
+            continue
+
+        data = _read_json(jobs_dir / f"{job_id}.json")
+        if data is None:
+            release(root, lease)
+            continue
+        return QueueJob(**data), lease
+    return None
+
+
+def renew(root: Path, lease: Lease, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+    """Heartbeat: estende o prazo. Retorna False se o lease foi perdido para outro worker."""
+    lease_path = _dirs(root)[1] / f"{lease.job_id}.json"
+    current = _read_json(lease_path)
+    if current is None or current.get("token") != lease.token:
+        return False
+    lease.expires = time.time() + lease_seconds
+    _write_atomic(lease_path, asdict(lease))
+    return True
+
+
+def release(root: Path, lease: Lease) -> None:
+    """Devolve o job à fila já vencido, para ser retomado (com a tentativa seguinte) por qualquer worker."""
+    lease_path = _dirs(root)[1] / f"{lease.job_id}.json"
+    current = _read_json(lease_path)
+    if current is not None and current.get("token") == lease.token:
+        lease.expires = 0.0
+        _write_atomic(lease_path, asdict(lease))
+
+
+def finish(
+    root: Path,
+    lease: Lease,
+    *,
+    ok: bool,
+    seconds: float | None = None,
+    error: str | None = None,
+) -> bool:
+    """Registra o desfecho do job. Retorna False se outro worker já o tinha concluído."""
+    _, leases_dir, done_dir, _ = _dirs(root)
+    record = {
+        "status": "ok" if ok else "failed",
+        "worker": lease.worker,
+        "attempt": lease.attempt,
+        "seconds": seconds,
+        "error": error,
+        "finished_at": time.time(),
+    }
+    created = _create_exclusive(done_dir / f"{lease.job_id}.json", record)
+    (leases_dir / f"{lease.job_id}.json").unlink(missing_ok=True)
+    return created
+
+
+def write_result(root: Path, job: QueueJob, text: str) -> Path:
+    output_path = _dirs(root)[3] / job.output
+    ensure_dir(output_path.parent)
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def status(root: Path) -> QueueStatus:
+    jobs_dir, leases_dir, done_dir, _ = _dirs(root)
+    job_ids = {p.stem for p in jobs_dir.glob("*.json")}
+    outcomes = {p.stem: (_read_json(p) or {}).get("status") for p in done_dir.glob("*.json")}
+    now = time.time()
+    running = stale = 0
+    workers: set[str] = set()
+    for path in leases_dir.glob("*.json"):
+        if path.stem not in job_ids or path.stem in outcomes:
+            continue
+        data = _read_json(path) or {}
+        if float(data.get("expires", now)) > now:
+            running += 1
+            workers.add(str(data.get("worker", "?")))
+        else:
+            stale += 1
+    ok = sum(1 for job_id in job_ids if outcomes.get(job_id) == "ok")
+    failed = sum(1 for job_id in job_ids if outcomes.get(job_id) == "failed")
+    return QueueStatus(
+        total=len(job_ids),
+        ok=ok,
+        failed=failed,
+        running=running,
+        stale=stale,
+        pending=len(job_ids) - ok - failed - running - stale,
+        workers=sorted(workers),
+    )
+
+
+class _Heartbeat:
+    """Renova o lease em segundo plano enquanto o job roda."""
+
+    def __init__(self, root: Path, lease: Lease, lease_seconds: float) -> None:
+        self.root = root
+        self.lease = lease
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"automgr-lease-{lease.job_id}", daemon=True)
+
+    def __enter__(self) -> _Heartbeat:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not renew(self.root, self.lease, self.lease_seconds):
+                    self.lost = True
+                    return
+            except OSError:
+                # Falha momentânea no diretório compartilhado: tenta de novo no próximo ciclo.
+                continue
+
+
+def run_worker(
+    root: Path,
+    execute: Callable[[QueueJob], str],
+    *,
+    worker: str | None = None,
+    concurrency: int = 1,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    exit_when_done: bool = False,
+    should_stop: Callable[[], str | None] | None = None,
+    log: Callable[[str], None] = print,
+) -> int:
+    """
+    Processa jobs da fila com `concurrency` threads até a fila esvaziar (`exit_when_done`)
+    ou para sempre. `should_stop` é consultado antes de cada reserva (ex.: teto de gasto);
+    se retornar um motivo, o worker para de pegar jobs. Retorna quantos jobs concluiu.
+    """
+    worker = worker or worker_name()
+    completed = 0
+    lock = threading.Lock()
+
+    def emit(line: str) -> None:
+        with lock:
+            log(line)
+
+    def loop(slot: int) -> None:
+        nonlocal completed
+        name = f"{worker}-{slot}"
+        while True:
+            reason = should_stop() if should_stop is not None else None
+            if reason:
+                emit(f"🛑 [{name}] Parando: {reason}.")
+                return
+            claimed = claim(root, name, lease_seconds=lease_seconds, max_attempts=max_attempts)
+            if claimed is None:
+                if exit_when_done:
+                    current = status(root)
+                    if current.pending == 0 and current.running == 0 and current.stale == 0:
+                        return
+                time.sleep(poll_seconds * random.uniform(0.5, 1.5))
+                continue
+
+            job, lease = claimed
+            emit(f"▶️  [{name}] {job.id} ({job.provider}:{job.model}, tentativa {lease.attempt})")
+            started = time.perf_counter()
+            with _Heartbeat(root, lease, lease_seconds) as heartbeat:
+                try:
+                    text = execute(job)
+                except Exception as exc:  # noqa: BLE001 (job volta para a fila)
+                    emit(f"⚠️ [{name}] {job.id} falhou: {exc}")
+                    if lease.attempt >= max_attempts:
+                        finish(root, lease, ok=False, error=str(exc))
+                    else:
+                        release(root, lease)
+                    continue
+
+            if heartbeat.lost:
+                emit(f"⚠️ [{name}] {job.id}: lease perdido para outro worker; resultado descartado.")
+                continue
+            seconds = time.perf_counter() - started
+            output_path = write_result(root, job, text)
+            if finish(root, lease, ok=True, seconds=seconds):
+                with lock:
+                    completed += 1
+                emit(f"✅ [{name}] {job.id} em {seconds:.1f}s → {output_path}")
+
+    threads = [
+        threading.Thread(target=loop, args=(slot,), name=f"automgr-worker-{slot}", daemon=True)
+        for slot in range(1, max(1, concurrency) + 1)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return completed
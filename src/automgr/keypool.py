@@ -0,0 +1,113 @@
+"""Pool de chaves de API por provider, com rotação e quarentena.
+
+Além da variável de sempre (ex.: GROQ_API_KEY), aceita várias chaves separadas por
+vírgula na forma plural (ex.: GROQ_API_KEYS="k1,k2,k3"). Cada requisição usa a chave
+com mais cota livre no limitador de taxa (`ratelimit.headroom`); empates vão para a
+chave usada há mais tempo. Chaves que respondem com erro de autenticação ou de cota
+ficam em quarentena (neste processo) e só voltam depois do prazo.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+
+from automgr import ratelimit
+
+
+ENV_VARS: dict[str, str] = {
+    "gemini": "GOOGLE_API_KEY",
+    "groq": "GROQ_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "openrouter": "OPENROUTER_API_KEY",
+    "local": "AUTOMGR_LOCAL_API_KEY",
+}
+
+AUTH_QUARANTINE_SECONDS = 15 * 60
+QUOTA_QUARANTINE_SECONDS = 60.0
+
+# Nomes das exceções dos SDKs (OpenAI/Groq e google-api-core) para erros de chave.
+AUTH_ERRORS = {"AuthenticationError", "PermissionDeniedError", "PermissionDenied", "Unauthenticated"}
+QUOTA_ERRORS = {"RateLimitError", "ResourceExhausted"}
+
+_lock = threading.Lock()
+_quarantine: dict[tuple[str, str], float] = {}
+_last_used: dict[tuple[str, str], float] = {}
+
+
+def keys(provider: str) -> list[str]:
+    env = ENV_VARS[provider]
+    found = re.split(r"[,\s]+", os.getenv(f"{env}S", "")) + [os.getenv(env, "")]
+    return list(dict.fromkeys(key.strip() for key in found if key.strip()))
+
+
+def choose(provider: str) -> str | None:
+    """Chave a usar na próxima requisição (None se o provider não tiver nenhuma configurada)."""
+    pool = keys(provider)
+    if not pool:
+        return None
+    if len(pool) == 1:
+        return pool[0]
+
+    now = time.monotonic()
+    with _lock:
+        available = [key for key in pool if _quarantine.get((provider, key), 0.0) <= now]
+        if not available:
+            # Todas em quarentena: usa a que sai primeiro, em vez de falhar sem tentar.
+            available = [min(pool, key=lambda key: _quarantine[(provider, key)])]
+        ranked = sorted(
+            available,
+            key=lambda key: (-ratelimit.headroom(provider, key), _last_used.get((provider, key), 0.0)),
+        )
+        chosen = ranked[0]
+        _last_used[(provider, chosen)] = now
+    return chosen
+
+
+def quarantine(provider: str, api_key: str, seconds: float) -> None:
+    with _lock:
+        _quarantine[(provider, api_key)] = time.monotonic() + seconds
+
+
+def _status_code(exc: Exception) -> int | None:
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _retry_after(exc: Exception) -> float | None:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc: Exception) -> str | None:
+    """'auth', 'quota' ou None (erro que não depende da chave)."""
+    status = _status_code(exc)
+    name = type(exc).__name__
+    if status in {401, 403} or name in AUTH_ERRORS:
+        return "auth"
+    if status == 429 or name in QUOTA_ERRORS:
+        return "quota"
+    return None
+
+
+def rotate(provider: str, api_key: str | None, exc: Exception) -> str | None:
+    """
+    Se `exc` indicar problema com a chave, coloca-a em quarentena e retorna outra chave do pool.
+    Retorna None se o erro não for da chave ou se não houver outra chave disponível.
+    """
+    kind = classify_error(exc)
+    if kind is None or not api_key:
+        return None
+    seconds = AUTH_QUARANTINE_SECONDS if kind == "auth" else _retry_after(exc) or QUOTA_QUARANTINE_SECONDS
+    quarantine(provider, api_key, seconds)
+    replacement = choose(provider)
+    return replacement if replacement and replacement != api_key else None
@@ -0,0 +1,239 @@
+"""Registro de uso (tokens e custo estimado) de cada geração e tetos de gasto por execução.
+
+Cada geração concluída (ou interrompida com texto parcial) vira uma linha em
+`.automgr/usage_ledger.jsonl`, gravada em modo append (seguro entre processos). Os
+tokens vêm do próprio stream quando o provider informa (`usage`); senão, de uma
+estimativa local (caracteres / CHARS_PER_TOKEN). O custo usa os preços do catálogo;
+modelos sem preço conhecido entram no registro com custo vazio.
+
+Os tetos (`--max-spend`, `--max-tokens-total`) valem para a execução atual: antes de
+começar cada nova geração, os comandos consultam `exhausted()` e param de agendar
+trabalho quando o teto foi atingido (a geração em andamento termina normalmente).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from automgr import catalog
+from automgr.paths import default_state_dir, ensure_dir
+from automgr.prompt import CHARS_PER_TOKEN
+
+
+LEDGER_FILENAME = "usage_ledger.jsonl"
+# Desconto da Batch API (OpenAI/Groq) sobre o preço normal.
+BATCH_PRICE_FACTOR = 0.5
+
+
+@dataclass
+class UsageEntry:
+    ts: float
+    provider: str
+    model: str
+    input_tokens: int
+    output_tokens: int
+    estimated: bool
+    cost: float | None
+    command: str | None = None
+    output: str | None = None
+
+
+@dataclass
+class ModelUsage:
+    provider: str
+    model: str
+    calls: int
+    input_tokens: int
+    output_tokens: int
+    cost: float | None
+    cost_per_call: float | None
+    median_output_tokens: float
+    estimated_calls: int
+
+
+_lock = threading.Lock()
+_state_dir: Path | None = None
+_command: str | None = None
+_max_spend: float | None = None
+_max_tokens_total: int | None = None
+_session_cost = 0.0
+_session_tokens = 0
+
+
+def configure(
+    *,
+    max_spend: float | None = None,
+    max_tokens_total: int | None = None,
+    command: str | None = None,
+    state_dir: Path | None = None,
+) -> None:
+    global _max_spend, _max_tokens_total, _command, _state_dir, _session_cost, _session_tokens
+    _max_spend = max_spend if max_spend and max_spend > 0 else None
+    _max_tokens_total = max_tokens_total if max_tokens_total and max_tokens_total > 0 else None
+    _command = command
+    _state_dir = state_dir
+    _session_cost = 0.0
+    _session_tokens = 0
+
+
+def _ledger_path(state_dir: Path | None = None) -> Path:
+    return (state_dir or _state_dir or default_state_dir(Path.cwd())) / LEDGER_FILENAME
+
+
+@lru_cache(maxsize=None)
+def _price(provider: str, model: str) -> catalog.ModelInfo | None:
+    if provider == "local":
+        # Servidor próprio: sem custo por token (só os tokens contam para --max-tokens-total).
+        return catalog.ModelInfo(provider, model, prompt_price=0.0, completion_price=0.0)
+    try:
+        models = catalog.load_catalog([provider])
+    except Exception:  # noqa: BLE001 (sem catálogo, o custo fica vazio)
+        return None
+    return next((info for info in models if info.model == model), None)
+
+
+def estimate_cost(provider: str, model: str, input_tokens: int, output_tokens: int) -> float | None:
+    info = _price(provider, model)
+    return None if info is None else info.estimate_cost(input_tokens, output_tokens)
+
+
+def record(
+    provider: str,
+    model: str,
+    *,
+    usage: dict[str, int] | None,
+    system_prompt: str,
+    user_prompt: str,
+    output_text: str,
+    output: str | None = None,
+    price_factor: float = 1.0,
+) -> UsageEntry:
+    """Registra uma geração no ledger e soma no total da execução atual."""
+    global _session_cost, _session_tokens
+    if usage:
+        input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    else:
+        input_tokens = (len(system_prompt) + len(user_prompt)) // CHARS_PER_TOKEN
+        output_tokens = len(output_text) // CHARS_PER_TOKEN
+    cost = estimate_cost(provider, model, input_tokens, output_tokens)
+    entry = UsageEntry(
+        ts=round(time.time(), 3),
+        provider=provider,
+        model=model,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        estimated=not usage,
+        cost=None if cost is None else round(cost * price_factor, 6),
+        command=_command,
+        output=output,
+    )
+
+    path = _ledger_path()
+    line = json.dumps(asdict(entry), ensure_ascii=False) + "\n"
+    with _lock:
+        _session_tokens += input_tokens + output_tokens
+        _session_cost += entry.cost or 0.0
+        ensure_dir(path.parent)
+        # Uma única escrita em modo append: linhas de processos diferentes não se misturam.
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+    return entry
+
+
+def session_totals() -> tuple[float, int]:
+    with _lock:
+        return _session_cost, _session_tokens
+
+
+def exhausted() -> str | None:
+    """Motivo da parada se algum teto da execução atual foi atingido; None caso contrário."""
+    cost, tokens = session_totals()
+    if _max_spend is not None and cost >= _max_spend:
+        return f"gasto estimado US$ {cost:.4f} atingiu --max-spend {_max_spend:g}"
+    if _max_tokens_total is not None and tokens >= _max_tokens_total:
+        return f"{tokens} tokens atingiram --max-tokens-total {_max_tokens_total}"
+    return None
+
+
+def remaining_budget() -> tuple[float | None, int | None]:
+    """Quanto ainda cabe nos tetos (None = sem teto)."""
+    cost, tokens = session_totals()
+    spend_left = None if _max_spend is None else max(0.0, _max_spend - cost)
+    tokens_left = None if _max_tokens_total is None else max(0, _max_tokens_total - tokens)
+    return spend_left, tokens_left
+
+
+def affordable(
+    provider: str,
+    model: str,
+    *,
+    input_tokens: int,
+    output_tokens: int,
+    count: int,
+    price_factor: float = 1.0,
+) -> int:
+    """Quantas gerações com esse tamanho (estimado) ainda cabem nos tetos da execução atual."""
+    spend_left, tokens_left = remaining_budget()
+    fits = count
+    if tokens_left is not None:
+        fits = min(fits, tokens_left // max(1, input_tokens + output_tokens))
+    if spend_left is not None:
+        cost = estimate_cost(provider, model, input_tokens, output_tokens)
+        if cost:
+            fits = min(fits, int(spend_left // (cost * price_factor)))
+    return fits
+
+
+def load_entries(state_dir: Path | None = None, *, since: float | None = None) -> list[UsageEntry]:
+    entries: list[UsageEntry] = []
+    try:
+        with _ledger_path(state_dir).open("r", encoding="utf-8") as f:
+            for raw in f:
+                try:
+                    data: dict[str, Any] = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                if since is not None and float(data.get("ts", 0.0)) < since:
+                    continue
+                entries.append(UsageEntry(**data))
+    except FileNotFoundError:
+        return []
+    return entries
+
+
+def summarize(entries: list[UsageEntry]) -> list[ModelUsage]:
+    """Totais por provider/modelo; `cost_per_call` é o custo médio de um MGR gerado."""
+    groups: dict[tuple[str, str], list[UsageEntry]] = {}
+    for entry in entries:
+        groups.setdefault((entry.provider, entry.model), []).append(entry)
+
+    summary: list[ModelUsage] = []
+    for (provider, model), items in groups.items():
+        costs = [e.cost for e in items if e.cost is not None]
+        total_cost = sum(costs) if costs else None
+        summary.append(
+            ModelUsage(
+                provider=provider,
+                model=model,
+                calls=len(items),
+                input_tokens=sum(e.input_tokens for e in items),
+                output_tokens=sum(e.output_tokens for e in items),
+                cost=total_cost,
+                cost_per_call=None if total_cost is None else total_cost / len(costs),
+                median_output_tokens=float(statistics.median(e.output_tokens for e in items)),
+                estimated_calls=sum(1 for e in items if e.estimated),
+            )
+        )
+    summary.sort(key=lambda u: (u.cost_per_call is None, u.cost_per_call or 0.0, u.provider, u.model))
+    return summary
@@ -0,0 +1,340 @@
+"""Teste de carga (`automgr loadtest`): N processos chegando a uma taxa dada, contra um provider simulado.
+
+- `MockServer`: servidor compatível com a API da OpenAI (só stdlib, numa thread deste processo)
+  que responde em streaming com atraso do primeiro token e vazão configuráveis. O provider
+  `local` aponta para ele (ou para um servidor de verdade, com `--local-url`).
+- Cada processo passa pelo caminho de produção: montagem do prompt, fila de jobs em disco
+  (`jobqueue`, com `workers` threads), stream pela API em processo, ledger e gravação do resultado.
+- No fim: vazão, latência (chegada → resultado gravado) p50/p95/p99, espera na fila,
+  profundidade máxima da fila e pico de memória (RSS) do processo.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable
+
+from automgr import jobqueue
+from automgr.prompt import CHARS_PER_TOKEN, build_prompts, estimate_tokens
+
+
+ARRIVALS = ("poisson", "uniform")
+MOCK_MODEL = "mock-mgr"
+DEFAULT_FIRST_TOKEN_SECONDS = 0.3
+DEFAULT_TOKENS_PER_SECOND = 400.0
+DEFAULT_OUTPUT_TOKENS = 1200
+# Tokens por evento SSE (servidores reais mandam de 1 a poucos tokens por chunk).
+MOCK_CHUNK_TOKENS = 8
+
+MOCK_TEXT = (
+    "| R01 | Atraso na entrega dos serviços contratados | 3 | 4 | 12 | Contratante |\n"
+    "Risco 01 – Atraso na entrega. Probabilidade: média. Impacto: alto. Dano: interrupção das "
+    "atividades. Ação preventiva: cronograma com marcos de verificação. Ação de contingência: "
+    "aplicação das sanções previstas e acionamento do cadastro de reserva.\n"
+)
+
+
+@dataclass
+class MockConfig:
+    first_token_seconds: float = DEFAULT_FIRST_TOKEN_SECONDS
+    tokens_per_second: float = DEFAULT_TOKENS_PER_SECOND
+    output_tokens: int = DEFAULT_OUTPUT_TOKENS
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig) -> None:
+        super().__init__(("127.0.0.1", 0), _MockHandler)
+        self.config = config
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.max_inflight = 0
+        self.requests = 0
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    server: _MockHTTPServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 (assinatura da stdlib)
+        return
+
+    def _send_json(self, payload: dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_event(self, payload: dict[str, Any] | str) -> None:
+        data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        line = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self) -> None:  # noqa: N802 (nome exigido pelo http.server)
+        self._send_json({"object": "list", "data": [{"id": MOCK_MODEL, "object": "model", "owned_by": "automgr"}]})
+
+    def do_POST(self) -> None:  # noqa: N802 (nome exigido pelo http.server)
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        config = self.server.config
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.inflight += 1
+            self.server.max_inflight = max(self.server.max_inflight, self.server.inflight)
+        try:
+            self._respond(request, config)
+        finally:
+            with self.server.lock:
+                self.server.inflight -= 1
+
+    def _respond(self, request: dict[str, Any], config: MockConfig) -> None:
+        prompt_tokens = estimate_tokens("".join(str(m.get("content", "")) for m in request.get("messages", [])))
+        limit = int(request.get("max_tokens") or config.output_tokens)
+        output_tokens = min(config.output_tokens, limit)
+        finish_reason = "length" if output_tokens < config.output_tokens else "stop"
+        size = output_tokens * CHARS_PER_TOKEN
+        text = (MOCK_TEXT * (size // len(MOCK_TEXT) + 1))[:size]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        }
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": MOCK_MODEL}
+
+        time.sleep(config.first_token_seconds)
+        if not request.get("stream"):
+            message = {"role": "assistant", "content": text}
+            choice = {"index": 0, "message": message, "finish_reason": finish_reason}
+            self._send_json({**base, "object": "chat.completion", "choices": [choice], "usage": usage})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = MOCK_CHUNK_TOKENS * CHARS_PER_TOKEN
+        delay = MOCK_CHUNK_TOKENS / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        chunk = {**base, "object": "chat.completion.chunk"}
+        for start in range(0, len(text), step):
+            delta = {"content": text[start : start + step]}
+            self._send_event({**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            if delay:
+                time.sleep(delay)
+        self._send_event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._send_event({**chunk, "choices": [], "usage": usage})
+        self._send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class MockServer:
+    """Servidor simulado em segundo plano; use como context manager."""
+
+    def __init__(self, config: MockConfig | None = None) -> None:
+        self._httpd = _MockHTTPServer(config or MockConfig())
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="automgr-mock", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    @property
+    def max_inflight(self) -> int:
+        return self._httpd.max_inflight
+
+    def __enter__(self) -> MockServer:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@dataclass
+class LoadReport:
+    processos: int
+    completed: int
+    failed: int
+    workers: int
+    rate: float
+    seconds: float
+    throughput_per_minute: float
+    latency: dict[str, float] = field(default_factory=dict)
+    queue_wait: dict[str, float] = field(default_factory=dict)
+    max_queue_depth: int = 0
+    peak_rss_mb: float | None = None
+    baseline_rss_mb: float | None = None
+    # Maior número de requisições simultâneas atendidas pelo servidor simulado.
+    max_inflight: int | None = None
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Percentil (0-100) com interpolação linear entre as amostras ordenadas."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def peak_rss_mb() -> float | None:
+    """Pico de memória residente do processo (None onde o módulo `resource` não existe, ex.: Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em bytes no macOS e em KiB no Linux.
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def max_depth(arrivals: list[float], starts: list[float]) -> int:
+    """Maior número de processos que já chegaram e ainda esperavam um worker."""
+    timeline = sorted([(t, 1) for t in arrivals] + [(t, -1) for t in starts], key=lambda e: (e[0], e[1]))
+    depth = peak = 0
+    for _, delta in timeline:
+        depth += delta
+        peak = max(peak, depth)
+    return peak
+
+
+def _variant(dados: dict[str, Any], index: int) -> dict[str, Any]:
+    """Cópia rasa do dados.json com um número de processo próprio (prompts distintos, como na produção)."""
+    metadados = dict(dados.get("metadados", {}))
+    metadados["NUM_PROCESSO"] = f"{metadados.get('NUM_PROCESSO', 'processo')} (carga {index:04d})"
+    return {**dados, "metadados": metadados}
+
+
+def run(
+    dados: dict[str, Any],
+    template_text: str,
+    execute: Callable[[jobqueue.QueueJob], str],
+    *,
+    root: Path,
+    processos: int,
+    rate: float,
+    workers: int,
+    provider: str = "local",
+    model: str = MOCK_MODEL,
+    arrival: str = "poisson",
+    json_indent: int | None = 2,
+    poll_seconds: float = jobqueue.DEFAULT_POLL_SECONDS,
+    seed: int | None = None,
+    log: Callable[[str], None] = print,
+) -> LoadReport:
+    """
+    Gera `processos` chegadas a `rate` por segundo (Poisson ou intervalos fixos) numa fila em
+    `root` e processa com `workers` threads de `jobqueue.run_worker`, como o `automgr worker`.
+    """
+    if arrival not in ARRIVALS:
+        raise ValueError(f"Chegada inválida: {arrival} (use {', '.join(ARRIVALS)})")
+    baseline = peak_rss_mb()
+    lock = threading.Lock()
+    arrived: dict[str, float] = {}
+    started: dict[str, float] = {}
+    produced = threading.Event()
+
+    def produce() -> None:
+        rng = random.Random(seed)
+        begin = time.time()
+        due = 0.0
+        for index in range(1, processos + 1):
+            delay = begin + due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            arrived_at = time.time()
+            variant = _variant(dados, index)
+            system_prompt, user_prompt = build_prompts(variant, template_text, json_indent=json_indent)
+            job = jobqueue.QueueJob(
+                id=jobqueue.new_job_id("carga", index),
+                provider=provider,
+                model=model,
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                output=f"processo_{index:04d}/resultado_{provider}.md",
+            )
+            with lock:
+                arrived[job.id] = arrived_at
+            jobqueue.submit(root, [job])
+            due += rng.expovariate(rate) if arrival == "poisson" else 1 / rate
+        produced.set()
+
+    def timed_execute(job: jobqueue.QueueJob) -> str:
+        with lock:
+            started.setdefault(job.id, time.time())
+        return execute(job)
+
+    def drained() -> str | None:
+        if produced.is_set() and jobqueue.status(root).pending == 0:
+            return "todos os processos foram atendidos"
+        return None
+
+    jobqueue.submit(root, [])
+    producer = threading.Thread(target=produce, name="automgr-loadtest-producer", daemon=True)
+    begin = time.time()
+    producer.start()
+    jobqueue.run_worker(
+        root,
+        timed_execute,
+        worker="loadtest",
+        concurrency=workers,
+        poll_seconds=poll_seconds,
+        max_attempts=1,
+        should_stop=drained,
+        # Só as falhas; o andamento de cada job poluiria o relatório.
+        log=lambda line: log(line) if line.startswith("⚠️") else None,
+    )
+    producer.join()
+
+    finished: dict[str, float] = {}
+    failed = 0
+    for path in (root / "done").glob("*.json"):
+        if path.stem not in arrived:
+            continue  # de outra execução na mesma fila
+        record = json.loads(path.read_text(encoding="utf-8"))
+        if record.get("status") == "ok":
+            finished[path.stem] = float(record["finished_at"])
+        else:
+            failed += 1
+    elapsed = (max(finished.values()) if finished else time.time()) - begin
+
+    return LoadReport(
+        processos=processos,
+        completed=len(finished),
+        failed=failed,
+        workers=workers,
+        rate=rate,
+        seconds=round(elapsed, 3),
+        throughput_per_minute=round(len(finished) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        latency=_summary([finished[job_id] - arrived[job_id] for job_id in finished if job_id in arrived]),
+        queue_wait=_summary([started[job_id] - arrived[job_id] for job_id in started if job_id in arrived]),
+        max_queue_depth=max_depth(list(arrived.values()), list(started.values())),
+        peak_rss_mb=peak_rss_mb(),
+        baseline_rss_mb=baseline,
+    )
@@ -35,3 +35,6 @@ def default_outdir(project_root: Path) -> Path:
 def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
+
+def default_state_dir(project_root: Path) -> Path:
+    return project_root / ".automgr"
@@ -0,0 +1,78 @@
+"""Medição de tempo por fase (`automgr --profile`)."""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+# Fases que medem espera de rede (o restante é tempo do próprio processo).
+NETWORK_PHASES = ("ttfb", "streaming")
+
+_enabled = False
+_lock = threading.Lock()
+_timings: dict[str, float] = {}
+_started = time.perf_counter()
+
+
+def configure(enabled: bool) -> None:
+    global _enabled, _started
+    _enabled = enabled
+    _started = time.perf_counter()
+    _timings.clear()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def record(name: str, seconds: float) -> None:
+    if not _enabled:
+        return
+    with _lock:
+        _timings[name] = _timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def timings() -> dict[str, float]:
+    with _lock:
+        return dict(_timings)
+
+
+def report() -> str:
+    wall = time.perf_counter() - _started
+    items = timings()
+    width = max([len(name) for name in items] + [len("rede (ttfb+streaming)")])
+
+    lines = ["", "⏱️  Perfil de tempo por fase:"]
+    for name, seconds in items.items():
+        share = 100 * seconds / wall if wall > 0 else 0.0
+        lines.append(f"   {name:<{width}} {seconds:9.4f}s {share:5.1f}%")
+
+    network = sum(s for name, s in items.items() if name.rsplit(".", 1)[-1] in NETWORK_PHASES)
+    lines.append(f"   {'-' * (width + 18)}")
+    lines.append(f"   {'rede (ttfb+streaming)':<{width}} {network:9.4f}s")
+    lines.append(f"   {'processo (restante)':<{width}} {max(0.0, wall - network):9.4f}s")
+    lines.append(f"   {'total (parede)':<{width}} {wall:9.4f}s")
+    return "\n".join(lines)
+
+
+def record_stream(prefix: str, *, started: float, first_byte: float | None) -> None:
+    """Separa a duração de um stream em espera pelo primeiro byte e recebimento do restante."""
+    elapsed = time.perf_counter() - started
+    ttfb = elapsed if first_byte is None else first_byte
+    record(f"{prefix}.ttfb", ttfb)
+    record(f"{prefix}.streaming", elapsed - ttfb)
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
 import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator
+
+from automgr import profiling
 
 
 DEFAULT_SEPARATOR = "___SEPARADOR___"
 
+CHARS_PER_TOKEN = 4
+
 DEFAULT_IGNORE_KEYS = {
     "id",
     "fk_processo",
@@ -17,6 +27,73 @@ DEFAULT_IGNORE_KEYS = {
     "updated_at",
 }
 
+# Deduplicação ETP→TR: trechos repetidos com pelo menos DEDUP_MIN_WORDS palavras viram referência.
+DEDUP_MIN_WORDS = 30
+DEDUP_SHINGLE_WORDS = 8
+
+# Consultas (BM25) por categoria de risco, usadas para podar seções pouco relevantes do ETP/TR.
+RISK_QUERIES: dict[str, str] = {
+    "Planejamento da Contratação": (
+        "estimativa preço orçamento pesquisa mercado quantitativo demanda especificação requisito dotação"
+    ),
+    "Seleção do Fornecedor": (
+        "licitação pregão habilitação qualificação técnica econômica proposta impugnação recurso "
+        "fornecedor exequibilidade"
+    ),
+    "Gestão Contratual": (
+        "execução prazo fiscalização penalidade multa sanção glosa pagamento medição ordem serviço "
+        "substituição rescisão"
+    ),
+    "Trabalhista e Previdenciário": (
+        "trabalhista previdenciária fgts salário encargos convenção coletiva terceirização "
+        "solidária subsidiária"
+    ),
+    "Segurança e Saúde": "segurança acidente epi ergonomia norma saúde treinamento",
+    "Qualidade e Nível de Serviço": "sla ans imr indicador qualidade nível serviço atendimento desempenho",
+    "Patrimônio e Danos": "dano patrimônio avaria ressarcimento seguro garantia integridade perda",
+}
+
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "da", "das", "de", "do", "dos", "e", "em", "na", "nas", "no", "nos",
+    "o", "os", "ou", "para", "pela", "pelas", "pelo", "pelos", "por", "que", "se", "sem", "sob", "um",
+    "uma", "ser", "sera", "deve", "devera", "bem", "como", "mais", "nao", "sua", "seu", "suas", "seus",
+}
+
+
+JSON_BACKENDS = ("auto", "orjson", "stdlib")
+
+_orjson: Any = None
+
+
+def set_json_backend(name: str = "auto") -> str:
+    """
+    Escolhe o backend da serialização do ETP/TR no prompt e retorna o nome do backend ativo.
+    "auto" usa o orjson se estiver instalado (`pip install automgr[fast]`); a saída é
+    idêntica byte a byte à do stdlib, que continua cuidando dos casos que o orjson
+    formataria diferente. (A leitura fica sempre com o stdlib: o `json.loads` já é em C
+    e o orjson leria inteiros acima de 64 bits como float.)
+    """
+    global _orjson
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"Backend de JSON inválido: {name} (use {', '.join(JSON_BACKENDS)})")
+    _orjson = None
+    if name != "stdlib":
+        try:
+            import orjson
+        except ImportError:
+            if name == "orjson":
+                raise
+        else:
+            _orjson = orjson
+    return "orjson" if _orjson is not None else "stdlib"
+
+
+def json_backend() -> str:
+    return "orjson" if _orjson is not None else "stdlib"
+
+
+set_json_backend(os.getenv("AUTOMGR_JSON_BACKEND") or "auto")
+
 
 def load_json(path: Path) -> dict[str, Any]:
     with path.open("r", encoding="utf-8") as f:
@@ -48,13 +125,39 @@ def clean_json(value: Any, ignore_keys: set[str] = DEFAULT_IGNORE_KEYS) -> Any:
     return value
 
 
-def json_to_string(value: Any, *, indent: int | None = 2) -> str:
-    cleaned = clean_json(value)
+def _stdlib_only_floats(value: Any) -> bool:
+    """Floats que o orjson escreve diferente do stdlib (notação científica, NaN/Infinity)."""
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        kind = type(item)
+        if kind is str or kind is int:
+            continue  # o caso comum (textos do ETP/TR), sem passar pelos isinstance
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, float) and (not math.isfinite(item) or "e" in repr(item)):
+            return True
+    return False
+
+
+def _serialize(cleaned: Any, *, indent: int | None = 2) -> str:
     if isinstance(cleaned, (dict, list)):
+        # O orjson só indenta com 2 espaços; outro indent (ou compacto) fica com o stdlib.
+        if _orjson is not None and indent == 2 and not _stdlib_only_floats(cleaned):
+            try:
+                return _orjson.dumps(cleaned, option=_orjson.OPT_INDENT_2).decode("utf-8")
+            except TypeError:
+                pass  # chave não-str, inteiro > 64 bits, surrogate isolado: o stdlib decide
         return json.dumps(cleaned, indent=indent, ensure_ascii=False)
     return str(cleaned)
 
 
+def json_to_string(value: Any, *, indent: int | None = 2) -> str:
+    return _serialize(clean_json(value), indent=indent)
+
+
 def split_template(template_text: str, *, separator: str = DEFAULT_SEPARATOR) -> tuple[str, str]:
     if separator in template_text:
         system_txt, user_txt = template_text.split(separator, 1)
@@ -70,16 +173,269 @@ def build_prompts(
     separator: str = DEFAULT_SEPARATOR,
     json_indent: int | None = 2,
 ) -> tuple[str, str]:
-    system_txt, user_txt = split_template(template_text, separator=separator)
+    with profiling.phase("clean_json"):
+        etp = clean_json(dados.get("etp_conteudo", ""))
+        tr = clean_json(dados.get("tr_conteudo", ""))
 
-    for key, value in dados.get("metadados", {}).items():
-        user_txt = user_txt.replace(f"{{{{{key}}}}}", str(value))
+    with profiling.phase("build_prompts"):
+        system_txt, user_txt = split_template(template_text, separator=separator)
+        etp_str = _serialize(etp, indent=json_indent)
+        tr_str = _serialize(tr, indent=json_indent)
+        user_txt = fill_template(user_txt, dados.get("metadados", {}), etp_str, tr_str)
+
+    return system_txt, user_txt
 
-    etp_str = json_to_string(dados.get("etp_conteudo", ""), indent=json_indent)
-    tr_str = json_to_string(dados.get("tr_conteudo", ""), indent=json_indent)
+
+def fill_template(user_template: str, metadados: dict[str, Any], etp_str: str, tr_str: str) -> str:
+    """Substitui os placeholders do USER prompt (metadados primeiro, depois ETP/TR já serializados)."""
+    user_txt = user_template
+    for key, value in metadados.items():
+        user_txt = user_txt.replace(f"{{{{{key}}}}}", str(value))
 
     user_txt = user_txt.replace("{{ETP_CONTEUDO}}", etp_str)
     user_txt = user_txt.replace("{{TR_CONTEUDO}}", tr_str)
+    return user_txt
 
-    return system_txt, user_txt
 
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+@dataclass(frozen=True)
+class Section:
+    document: str
+    title: str
+    value: Any
+
+    @property
+    def text(self) -> str:
+        return json_to_string(self.value)
+
+
+def split_sections(dados: dict[str, Any]) -> list[Section]:
+    sections: list[Section] = []
+
+    etp = clean_json(dados.get("etp_conteudo", {}))
+    if isinstance(etp, dict):
+        sections.extend(Section("ETP", str(key), value) for key, value in etp.items())
+    elif etp:
+        sections.append(Section("ETP", "etp_conteudo", etp))
+
+    tr = clean_json(dados.get("tr_conteudo", []))
+    if isinstance(tr, list):
+        for i, item in enumerate(tr, start=1):
+            title = item.get("secao", f"Seção {i}") if isinstance(item, dict) else f"Seção {i}"
+            sections.append(Section("TR", str(title), item))
+    elif tr:
+        sections.append(Section("TR", "tr_conteudo", tr))
+
+    return sections
+
+
+def sections_to_dados(dados: dict[str, Any], sections: list[Section]) -> dict[str, Any]:
+    etp = [s for s in sections if s.document == "ETP"]
+    tr = [s for s in sections if s.document == "TR"]
+    rebuilt = dict(dados)
+
+    if isinstance(clean_json(dados.get("etp_conteudo", {})), dict):
+        rebuilt["etp_conteudo"] = {s.title: s.value for s in etp}
+    else:
+        rebuilt["etp_conteudo"] = etp[0].value if etp else ""
+
+    if isinstance(clean_json(dados.get("tr_conteudo", [])), list):
+        rebuilt["tr_conteudo"] = [s.value for s in tr]
+    else:
+        rebuilt["tr_conteudo"] = tr[0].value if tr else ""
+
+    return rebuilt
+
+
+def _stem(token: str) -> str:
+    if token.endswith("oes"):
+        return token[:-3] + "ao"
+    if token.endswith("s") and len(token) > 4:
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    ascii_text = "".join(ch for ch in normalized if not unicodedata.combining(ch))
+    return [_stem(t) for t in re.findall(r"[a-z0-9]+", ascii_text) if len(t) > 1 and t not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, documents: list[list[str]], *, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(doc) for doc in documents]
+        self.doc_lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.doc_lengths) / len(documents)) if documents else 0.0
+
+        doc_freq: Counter[str] = Counter()
+        for freqs in self.term_freqs:
+            doc_freq.update(freqs.keys())
+        n_docs = len(documents)
+        self.idf = {term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def scores(self, query: list[str]) -> list[float]:
+        results: list[float] = []
+        for freqs, length in zip(self.term_freqs, self.doc_lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            score = 0.0
+            for term in query:
+                tf = freqs.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+@dataclass
+class PruneReport:
+    kept: list[tuple[Section, float]] = field(default_factory=list)
+    dropped: list[tuple[Section, float]] = field(default_factory=list)
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+
+def prune_sections(
+    dados: dict[str, Any],
+    *,
+    top_k: int | None = None,
+    token_budget: int | None = None,
+    queries: dict[str, str] = RISK_QUERIES,
+) -> tuple[dict[str, Any], PruneReport]:
+    """
+    Mantém as seções do ETP/TR mais relevantes para as categorias de risco (BM25),
+    limitadas a `top_k` seções e/ou `token_budget` tokens, preservando a ordem original.
+    """
+    sections = split_sections(dados)
+    index = BM25Index([tokenize(f"{s.title} {s.text}") for s in sections])
+
+    relevance = [0.0] * len(sections)
+    for query in queries.values():
+        query_scores = index.scores(tokenize(query))
+        best = max(query_scores, default=0.0)
+        if best > 0:
+            relevance = [total + score / best for total, score in zip(relevance, query_scores)]
+
+    costs = [estimate_tokens(s.text) for s in sections]
+    ranked = sorted(range(len(sections)), key=lambda i: relevance[i], reverse=True)
+
+    kept_indexes: set[int] = set()
+    used_tokens = 0
+    for i in ranked:
+        if top_k is not None and len(kept_indexes) >= top_k:
+            break
+        if token_budget is not None and used_tokens + costs[i] > token_budget:
+            continue
+        kept_indexes.add(i)
+        used_tokens += costs[i]
+
+    report = PruneReport(tokens_before=sum(costs), tokens_after=used_tokens)
+    for i, section in enumerate(sections):
+        target = report.kept if i in kept_indexes else report.dropped
+        target.append((section, relevance[i]))
+
+    pruned = sections_to_dados(dados, [s for s, _ in report.kept])
+    return pruned, report
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class DedupReport:
+    # (local no TR, chave do ETP referenciada, palavras removidas)
+    spans: list[tuple[str, str, int]] = field(default_factory=list)
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+
+def _string_leaves(value: Any, path: str = "") -> Iterator[tuple[str, str]]:
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            yield from _string_leaves(inner, f"{path} › {key}" if path else str(key))
+    elif isinstance(value, list):
+        for i, inner in enumerate(value, start=1):
+            yield from _string_leaves(inner, f"{path}[{i}]")
+    elif isinstance(value, str):
+        yield path, value
+
+
+def _replace_leaves(value: Any, replace: Callable[[str, str], str], path: str = "") -> Any:
+    if isinstance(value, dict):
+        return {
+            key: _replace_leaves(inner, replace, f"{path} › {key}" if path else str(key))
+            for key, inner in value.items()
+        }
+    if isinstance(value, list):
+        return [_replace_leaves(inner, replace, f"{path}[{i}]") for i, inner in enumerate(value, start=1)]
+    if isinstance(value, str):
+        return replace(path, value)
+    return value
+
+
+def dedup_sections(
+    dados: dict[str, Any],
+    *,
+    min_words: int = DEDUP_MIN_WORDS,
+    shingle_words: int = DEDUP_SHINGLE_WORDS,
+) -> tuple[dict[str, Any], DedupReport]:
+    """
+    Troca, no TR, os trechos longos copiados do ETP por uma referência curta
+    (`[[idêntico ao ETP › chave]]`). O ETP fica íntegro; a comparação ignora
+    maiúsculas e pontuação entre as palavras.
+    """
+    etp = clean_json(dados.get("etp_conteudo", ""))
+    tr = clean_json(dados.get("tr_conteudo", ""))
+    report = DedupReport()
+    report.tokens_before = estimate_tokens(_serialize(etp)) + estimate_tokens(_serialize(tr))
+
+    shingles: dict[tuple[str, ...], str] = {}
+    for path, text in _string_leaves(etp):
+        words = [w.lower() for w in _WORD_RE.findall(text)]
+        for i in range(len(words) - shingle_words + 1):
+            shingles.setdefault(tuple(words[i : i + shingle_words]), path or "etp_conteudo")
+
+    def replace(path: str, text: str) -> str:
+        matches = list(_WORD_RE.finditer(text))
+        words = [m.group().lower() for m in matches]
+        pieces: list[str] = []
+        cursor = 0
+        i = 0
+        while i <= len(words) - shingle_words:
+            source = shingles.get(tuple(words[i : i + shingle_words]))
+            if source is None:
+                i += 1
+                continue
+            end = i
+            last_start = len(words) - shingle_words
+            while end < last_start and tuple(words[end + 1 : end + 1 + shingle_words]) in shingles:
+                end += 1
+            span_words = end - i + shingle_words
+            if span_words < min_words:
+                i = end + 1
+                continue
+            last = matches[end + shingle_words - 1]
+            pieces.append(text[cursor : matches[i].start()])
+            pieces.append(f"[[idêntico ao ETP › {source}]]")
+            cursor = last.end()
+            report.spans.append((path, source, span_words))
+            i = end + shingle_words
+        pieces.append(text[cursor:])
+        return "".join(pieces)
+
+    if not shingles:
+        report.tokens_after = report.tokens_before
+        return dados, report
+
+    deduped_tr = _replace_leaves(tr, replace, "TR")
+    report.tokens_after = estimate_tokens(_serialize(etp)) + estimate_tokens(_serialize(deduped_tr))
+    if not report.spans:
+        return dados, report
+
+    deduped = dict(dados)
+    deduped["tr_conteudo"] = deduped_tr
+    return deduped, report
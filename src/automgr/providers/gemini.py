@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-import os
 import time
 from pathlib import Path
+from typing import Iterator
 
 from dotenv import load_dotenv
 
+from automgr import keypool, ledger, profiling, ratelimit, streaming
+from automgr.providers import runner
+
 
 DEFAULT_MODELS_TO_TRY = [
     "models/gemini-2.5-pro",
@@ -18,14 +21,26 @@ DEFAULT_BATCH_MODELS = [
     "models/gemini-2.0-flash",
 ]
 
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
 
 def _safe_name(model_name: str) -> str:
     return model_name.split("/")[-1].replace("-", "_").replace(".", "")
 
 
+def _missing_model(exc: Exception) -> bool:
+    msg = str(exc).lower()
+    return "404" in msg or "not found" in msg
+
+
 def list_models(*, only_gemini: bool = True) -> list[str]:
     load_dotenv()
-    api_key = os.getenv("GOOGLE_API_KEY")
+    api_key = keypool.choose("gemini")
     if not api_key:
         print("⚠️ [Gemini] Não foi possível listar: GOOGLE_API_KEY não encontrada.")
         return []
@@ -51,78 +66,108 @@ def list_models(*, only_gemini: bool = True) -> list[str]:
         return []
 
 
-def run(
+def complete(
     system_prompt: str,
     user_prompt: str,
     *,
-    outdir: Path,
-    models_to_try: list[str] | None = None,
+    model: str = "models/gemini-2.0-flash",
     temperature: float = 0.2,
-) -> Path | None:
-    print("\n" + "=" * 50)
-    print("🔵 [Gemini] Iniciando...")
-
+    max_tokens: int = 4000,
+) -> str:
     load_dotenv()
-    api_key = os.getenv("GOOGLE_API_KEY")
+    api_key = keypool.choose("gemini")
     if not api_key:
-        print("⚠️ [Gemini] Pulei: GOOGLE_API_KEY não encontrada.")
-        return None
+        raise RuntimeError("[Gemini] GOOGLE_API_KEY não encontrada.")
 
-    try:
-        import google.generativeai as genai
-    except ImportError:
-        print("❌ [Gemini] Dependência ausente: instale com `pip install google-generativeai`.")
-        return None
+    import google.generativeai as genai
 
-    outdir.mkdir(parents=True, exist_ok=True)
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("gemini", api_key, tokens=tokens)
     genai.configure(api_key=api_key)
+    generative_model = genai.GenerativeModel(model, system_instruction=system_prompt)
+    response = generative_model.generate_content(
+        user_prompt,
+        generation_config=genai.types.GenerationConfig(temperature=temperature, max_output_tokens=max_tokens),
+    )
+    return response.text or ""
 
-    candidates = models_to_try or DEFAULT_MODELS_TO_TRY
-    for model_name in candidates:
-        print(f"   👉 Tentando modelo: {model_name}")
-        try:
-            safety_settings = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-            ]
-
-            model = genai.GenerativeModel(
-                model_name,
-                system_instruction=system_prompt,
-                safety_settings=safety_settings,
-            )
 
-            print("   ⏳ Gerando resposta (streaming)...")
-            stream = model.generate_content(
-                user_prompt,
-                stream=True,
-                generation_config=genai.types.GenerationConfig(temperature=temperature),
-            )
+def stream(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    model: str = "models/gemini-2.0-flash",
+    temperature: float = 0.2,
+    max_tokens: int | None = 4000,
+    api_key: str | None = None,
+    safety_settings: list[dict[str, str]] | None = None,
+) -> Iterator[streaming.StreamChunk]:
+    """
+    Stream sem prints nem arquivos (usado pela API em processo).
+    Obs.: `genai.configure` é global no SDK; chaves diferentes em paralelo não são isoladas.
+    """
+    if api_key is None:
+        load_dotenv()
+        api_key = keypool.choose("gemini")
+    if not api_key:
+        raise RuntimeError("[Gemini] GOOGLE_API_KEY não encontrada.")
 
-            text = ""
-            print("-" * 30)
-            for chunk in stream:
-                if getattr(chunk, "text", None):
-                    print(chunk.text, end="", flush=True)
-                    text += chunk.text
-            print("\n" + "-" * 30)
-
-            output_path = outdir / "resultado_gemini.md"
-            output_path.write_text(text, encoding="utf-8")
-            print(f"\n✅ [Gemini] Sucesso! Salvo em '{output_path}'.")
-            return output_path
-
-        except Exception as exc:  # noqa: BLE001 (CLI tool)
-            msg = str(exc).lower()
-            if "404" in msg or "not found" in msg:
-                continue
-            print(f"\n❌ [Gemini] Erro ({model_name}): {exc}")
-            time.sleep(1)
+    import google.generativeai as genai
+
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("gemini", api_key, tokens=tokens)
+    with profiling.phase("gemini.client"):
+        genai.configure(api_key=api_key)
+        generative_model = genai.GenerativeModel(
+            model,
+            system_instruction=system_prompt,
+            safety_settings=safety_settings,
+        )
+    return streaming.gemini_chunks(
+        generative_model.generate_content(
+            user_prompt,
+            stream=True,
+            generation_config=genai.types.GenerationConfig(temperature=temperature, max_output_tokens=max_tokens),
+            request_options=streaming.deadline_kwargs(),
+        )
+    )
+
+
+def run(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    outdir: Path,
+    models_to_try: list[str] | None = None,
+    temperature: float = 0.2,
+) -> Path | None:
+    print("\n" + "=" * 50)
+    print("🔵 [Gemini] Iniciando...")
 
-    print("❌ [Gemini] Nenhum modelo funcionou (verifique sua API key/permissões).")
-    return None
+    def open_stream(api_key: str | None, model: str, prompt: str) -> Iterator[streaming.StreamChunk]:
+        return stream(
+            system_prompt,
+            prompt,
+            model=model,
+            temperature=temperature,
+            max_tokens=None,
+            api_key=api_key,
+            safety_settings=SAFETY_SETTINGS,
+        )
+
+    # Modelos alternativos em ordem; um modelo inexistente para a conta é pulado em silêncio.
+    return runner.run(
+        "gemini",
+        "Gemini",
+        system_prompt,
+        user_prompt,
+        output_path=outdir / "resultado_gemini.md",
+        models=list(models_to_try or DEFAULT_MODELS_TO_TRY),
+        open_stream=open_stream,
+        package="google.generativeai",
+        pip_name="google-generativeai",
+        skip_error=_missing_model,
+    )
 
 
 def run_batch(
@@ -137,71 +182,52 @@ def run_batch(
 ) -> list[Path]:
     print("\n" + "=" * 50)
     print("🔵 [Gemini] Lote de gerações...")
-
-    load_dotenv()
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        print("⚠️ [Gemini] Pulei: GOOGLE_API_KEY não encontrada.")
-        return []
-
-    try:
-        import google.generativeai as genai
-    except ImportError:
-        print("❌ [Gemini] Dependência ausente: instale com `pip install google-generativeai`.")
+    if not runner.ready("gemini", "Gemini", package="google.generativeai", pip_name="google-generativeai"):
         return []
 
-    outdir.mkdir(parents=True, exist_ok=True)
-    genai.configure(api_key=api_key)
+    def open_stream(api_key: str | None, model: str, prompt: str) -> Iterator[streaming.StreamChunk]:
+        return stream(
+            system_prompt,
+            prompt,
+            model=model,
+            temperature=temperature,
+            max_tokens=None,
+            api_key=api_key,
+            safety_settings=SAFETY_SETTINGS,
+        )
 
-    selected_models = models or DEFAULT_BATCH_MODELS
     outputs: list[Path] = []
-
-    safety_settings = [
-        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-    ]
-
-    for model_name in selected_models:
+    for model_name in models or DEFAULT_BATCH_MODELS:
         print("\n" + "-" * 50)
         print(f"🚀 [Gemini] Modelo: {model_name} | {count_per_model} variações")
 
-        try:
-            model = genai.GenerativeModel(
-                model_name,
-                system_instruction=system_prompt,
-                safety_settings=safety_settings,
-            )
-        except Exception as exc:  # noqa: BLE001
-            print(f"❌ [Gemini] Erro ao configurar modelo {model_name}: {exc}")
-            continue
-
         for i in range(1, count_per_model + 1):
-            filename = f"resultado_gemini_{_safe_name(model_name)}_{i:02d}.md"
-            output_path = outdir / filename
+            if streaming.deadline_expired():
+                print("⏰ [Gemini] Prazo global esgotado; encerrando o lote.")
+                return outputs
+            stop = ledger.exhausted()
+            if stop:
+                print(f"💸 [Gemini] Encerrando o lote: {stop}.")
+                return outputs
+
+            output_path = outdir / f"resultado_gemini_{_safe_name(model_name)}_{i:02d}.md"
             print(f"📄 Gerando {i}/{count_per_model} → {output_path.name}")
-
-            try:
-                stream = model.generate_content(
-                    user_prompt,
-                    stream=True,
-                    generation_config=genai.types.GenerationConfig(temperature=temperature),
-                )
-
-                text = ""
-                for chunk in stream:
-                    if getattr(chunk, "text", None):
-                        text += chunk.text
-
-                output_path.write_text(text, encoding="utf-8")
-                outputs.append(output_path)
-
-                if i < count_per_model:
-                    time.sleep(max(0.0, sleep_seconds))
-
-            except Exception as exc:  # noqa: BLE001
-                print(f"❌ [Gemini] Falha na geração {i}/{count_per_model}: {exc}")
-                time.sleep(1)
+            path = runner.run(
+                "gemini",
+                "Gemini",
+                system_prompt,
+                user_prompt,
+                output_path=output_path,
+                models=[model_name],
+                open_stream=open_stream,
+                package="google.generativeai",
+                pip_name="google-generativeai",
+                stream_label=f"Gemini {i}/{count_per_model}",
+                variant=i,
+            )
+            if path is not None:
+                outputs.append(path)
+            if i < count_per_model:
+                time.sleep(max(0.0, sleep_seconds))
 
     return outputs
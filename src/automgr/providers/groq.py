@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-import os
-import time
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Iterator
 
 from dotenv import load_dotenv
 
+from automgr import keypool, profiling, ratelimit, streaming
+from automgr.providers import runner
+
 
 DEFAULT_MODELS = [
     "llama-3.3-70b-versatile",
@@ -14,21 +17,29 @@ DEFAULT_MODELS = [
 ]
 
 
+@lru_cache(maxsize=8)
+def _client(api_key: str) -> Any:
+    """Cliente reaproveitado por chave: mantém o pool de conexões (e a sessão TLS) entre chamadas."""
+    from groq import Groq
+
+    return Groq(api_key=api_key)
+
+
 def list_models() -> list[str]:
     load_dotenv()
-    api_key = os.getenv("GROQ_API_KEY")
+    api_key = keypool.choose("groq")
     if not api_key:
         print("⚠️ [Groq] Não foi possível listar: GROQ_API_KEY não encontrada.")
         return []
 
     try:
-        from groq import Groq
+        from groq import Groq  # noqa: F401
     except ImportError:
         print("❌ [Groq] Dependência ausente: instale com `pip install groq`.")
         return []
 
     try:
-        client = Groq(api_key=api_key)
+        client = _client(api_key)
         response = client.models.list()
         models = [m.id for m in response.data if getattr(m, "id", None)]
         models = sorted(set(models))
@@ -38,6 +49,69 @@ def list_models() -> list[str]:
         return DEFAULT_MODELS
 
 
+def complete(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    model: str = "llama-3.3-70b-versatile",
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+) -> str:
+    load_dotenv()
+    api_key = keypool.choose("groq")
+    if not api_key:
+        raise RuntimeError("[Groq] GROQ_API_KEY não encontrada.")
+
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("groq", api_key, tokens=tokens)
+    client = _client(api_key)
+    response = client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    return response.choices[0].message.content or ""
+
+
+def stream(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    model: str = "llama-3.3-70b-versatile",
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+    api_key: str | None = None,
+) -> Iterator[streaming.StreamChunk]:
+    """Stream sem prints nem arquivos (usado pela API em processo)."""
+    if api_key is None:
+        load_dotenv()
+        api_key = keypool.choose("groq")
+    if not api_key:
+        raise RuntimeError("[Groq] GROQ_API_KEY não encontrada.")
+
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("groq", api_key, tokens=tokens)
+    with profiling.phase("groq.client"):
+        client = _client(api_key)
+    return streaming.openai_chunks(
+        client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **streaming.timeout_kwargs(),
+        )
+    )
+
+
 def run(
     system_prompt: str,
     user_prompt: str,
@@ -51,51 +125,19 @@ def run(
     print("\n" + "=" * 50)
     print("🟠 [Groq] Iniciando...")
 
-    load_dotenv()
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        print("⚠️ [Groq] Pulei: GROQ_API_KEY não encontrada.")
-        return None
-
-    try:
-        from groq import Groq
-    except ImportError:
-        print("❌ [Groq] Dependência ausente: instale com `pip install groq`.")
-        return None
-
-    outdir.mkdir(parents=True, exist_ok=True)
-    client = Groq(api_key=api_key)
-
-    for attempt in range(1, attempts + 1):
-        try:
-            stream = client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stream=True,
-            )
-
-            text = ""
-            print("   ⏳ Gerando resposta (streaming)...")
-            print("-" * 30)
-            for chunk in stream:
-                delta = chunk.choices[0].delta.content
-                if delta:
-                    print(delta, end="", flush=True)
-                    text += delta
-            print("\n" + "-" * 30)
-
-            output_path = outdir / "resultado_groq.md"
-            output_path.write_text(text, encoding="utf-8")
-            print(f"\n✅ [Groq] Sucesso! Salvo em '{output_path}'.")
-            return output_path
-
-        except Exception as exc:  # noqa: BLE001 (CLI tool)
-            print(f"\n⚠️ [Groq] Erro (tentativa {attempt}/{attempts}): {exc}")
-            time.sleep(2)
-
-    return None
+    def open_stream(api_key: str | None, model: str, prompt: str) -> Iterator[streaming.StreamChunk]:
+        return stream(
+            system_prompt, prompt, model=model, temperature=temperature, max_tokens=max_tokens, api_key=api_key
+        )
+
+    return runner.run(
+        "groq",
+        "Groq",
+        system_prompt,
+        user_prompt,
+        output_path=outdir / "resultado_groq.md",
+        models=[model] * attempts,
+        open_stream=open_stream,
+        package="groq",
+        pip_name="groq",
+    )
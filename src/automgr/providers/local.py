@@ -0,0 +1,233 @@
+"""Provider local: qualquer servidor compatível com a API da OpenAI (llama.cpp, vLLM, Ollama, LM Studio).
+
+Configuração (flags `--local-*` ou variáveis de ambiente):
+  - AUTOMGR_LOCAL_BASE_URL: URL base da API (default: http://127.0.0.1:8080/v1)
+  - AUTOMGR_LOCAL_MODEL: nome do modelo servido (default: "local")
+  - AUTOMGR_LOCAL_API_KEY: chave, se o servidor exigir (opcional)
+  - AUTOMGR_LOCAL_CONTEXT: janela de contexto do servidor, em tokens; limita o max_tokens
+  - AUTOMGR_LOCAL_CONCURRENCY: requisições simultâneas neste processo (default: 1)
+
+Nada sai da máquina/rede interna e não há custo por token.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from dotenv import load_dotenv
+
+from automgr import keypool, profiling, ratelimit, streaming
+from automgr.prompt import estimate_tokens
+from automgr.providers import runner
+
+
+DEFAULT_BASE_URL = "http://127.0.0.1:8080/v1"
+DEFAULT_MODEL = "local"
+# Sem chave configurada, o SDK ainda exige uma; servidores locais costumam ignorá-la.
+PLACEHOLDER_KEY = "sem-chave"
+# Folga para os tokens do chat template (papéis, separadores), que a estimativa não conta.
+CONTEXT_MARGIN_TOKENS = 256
+
+_base_url: str | None = None
+_model: str | None = None
+_context_size: int | None = None
+_slots = threading.BoundedSemaphore(1)
+
+
+def configure(
+    *,
+    base_url: str | None = None,
+    model: str | None = None,
+    context_size: int | None = None,
+    concurrency: int | None = None,
+) -> None:
+    global _base_url, _model, _context_size, _slots
+    load_dotenv()
+    _base_url = base_url or os.getenv("AUTOMGR_LOCAL_BASE_URL") or DEFAULT_BASE_URL
+    _model = model or os.getenv("AUTOMGR_LOCAL_MODEL") or DEFAULT_MODEL
+    _context_size = context_size or int(os.getenv("AUTOMGR_LOCAL_CONTEXT", "0") or 0) or None
+    slots = concurrency or int(os.getenv("AUTOMGR_LOCAL_CONCURRENCY", "1") or 1)
+    _slots = threading.BoundedSemaphore(max(1, slots))
+
+
+def base_url() -> str:
+    if _base_url is None:
+        configure()
+    return str(_base_url)
+
+
+def default_model() -> str:
+    if _model is None:
+        configure()
+    return str(_model)
+
+
+def _api_key() -> str:
+    load_dotenv()
+    return keypool.choose("local") or PLACEHOLDER_KEY
+
+
+@lru_cache(maxsize=8)
+def _client(api_key: str, url: str) -> Any:
+    """Cliente reaproveitado por chave/URL: mantém o pool de conexões entre chamadas."""
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key, base_url=url)
+
+
+def fit_max_tokens(system_prompt: str, user_prompt: str, max_tokens: int) -> int:
+    """
+    Ajusta o max_tokens à janela de contexto do servidor (se configurada). Servidores como
+    o llama.cpp recusam (ou truncam em silêncio) pedidos que não cabem no contexto.
+    """
+    if _context_size is None:
+        return max_tokens
+    available = _context_size - estimate_tokens(system_prompt + user_prompt) - CONTEXT_MARGIN_TOKENS
+    if available <= 0:
+        raise RuntimeError(
+            f"[Local] O prompt (~{estimate_tokens(system_prompt + user_prompt)} tokens) não cabe no contexto "
+            f"do servidor ({_context_size}); use --prune-*/--condense ou aumente o contexto."
+        )
+    return min(max_tokens, available)
+
+
+def _slot(open_stream: Callable[[], Iterator[streaming.StreamChunk]]) -> Iterator[streaming.StreamChunk]:
+    """Limita as requisições simultâneas ao servidor local (o slot fica preso até o fim do stream)."""
+    with _slots:
+        yield from open_stream()
+
+
+def list_models() -> list[str]:
+    try:
+        from openai import OpenAI  # noqa: F401
+    except ImportError:
+        print("❌ [Local] Dependência ausente: instale com `pip install openai`.")
+        return []
+
+    try:
+        response = _client(_api_key(), base_url()).models.list()
+        return sorted({m.id for m in getattr(response, "data", response) if getattr(m, "id", None)})
+    except Exception as exc:  # noqa: BLE001
+        print(f"❌ [Local] Erro ao listar modelos em {base_url()}: {exc}")
+        return [default_model()]
+
+
+def _create(
+    client: Any,
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    model: str,
+    temperature: float,
+    **kwargs: Any,
+) -> Any:
+    return client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        model=model,
+        temperature=temperature,
+        **kwargs,
+    )
+
+
+def complete(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    model: str | None = None,
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+) -> str:
+    api_key = _api_key()
+    max_tokens = fit_max_tokens(system_prompt, user_prompt, max_tokens)
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("local", api_key, tokens=tokens)
+    with _slots:
+        response = _create(
+            _client(api_key, base_url()),
+            system_prompt,
+            user_prompt,
+            model=model or default_model(),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+    return response.choices[0].message.content or ""
+
+
+def stream(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    model: str | None = None,
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+    api_key: str | None = None,
+) -> Iterator[streaming.StreamChunk]:
+    """Stream sem prints nem arquivos (usado pela API em processo)."""
+    api_key = api_key or _api_key()
+    max_tokens = fit_max_tokens(system_prompt, user_prompt, max_tokens)
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("local", api_key, tokens=tokens)
+    with profiling.phase("local.client"):
+        client = _client(api_key, base_url())
+
+    def open_stream() -> Iterator[streaming.StreamChunk]:
+        return streaming.openai_chunks(
+            _create(
+                client,
+                system_prompt,
+                user_prompt,
+                model=model or default_model(),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+                **streaming.timeout_kwargs(),
+            )
+        )
+
+    return _slot(open_stream)
+
+
+def run(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    outdir: Path,
+    model: str | None = None,
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+    attempts: int = 3,
+) -> Path | None:
+    print("\n" + "=" * 50)
+    print(f"🟣 [Local] Iniciando ({base_url()})...")
+    try:
+        fit_max_tokens(system_prompt, user_prompt, max_tokens)
+    except RuntimeError as exc:
+        print(f"❌ {exc}")
+        return None
+
+    def open_stream(api_key: str | None, model: str, prompt: str) -> Iterator[streaming.StreamChunk]:
+        # A continuação carrega o texto já gerado: `stream` reajusta o max_tokens a cada parte.
+        return stream(
+            system_prompt, prompt, model=model, temperature=temperature, max_tokens=max_tokens, api_key=api_key
+        )
+
+    return runner.run(
+        "local",
+        "Local",
+        system_prompt,
+        user_prompt,
+        output_path=outdir / "resultado_local.md",
+        models=[model or default_model()] * attempts,
+        open_stream=open_stream,
+        package="openai",
+        pip_name="openai",
+        key_required=False,
+    )
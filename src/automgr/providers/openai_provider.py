@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-import os
-import time
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Iterator
 
 from dotenv import load_dotenv
 
+from automgr import keypool, profiling, ratelimit, streaming
+from automgr.providers import runner
+
 
 DEFAULT_MODELS = [
     "gpt-4o",
@@ -13,21 +16,29 @@ DEFAULT_MODELS = [
 ]
 
 
+@lru_cache(maxsize=8)
+def _client(api_key: str) -> Any:
+    """Cliente reaproveitado por chave: mantém o pool de conexões (e a sessão TLS) entre chamadas."""
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key)
+
+
 def list_models(*, only_chat: bool = True) -> list[str]:
     load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
+    api_key = keypool.choose("openai")
     if not api_key:
         print("⚠️ [OpenAI] Não foi possível listar: OPENAI_API_KEY não encontrada.")
         return []
 
     try:
-        from openai import OpenAI
+        from openai import OpenAI  # noqa: F401
     except ImportError:
         print("❌ [OpenAI] Dependência ausente: instale com `pip install openai`.")
         return []
 
     try:
-        client = OpenAI(api_key=api_key)
+        client = _client(api_key)
         response = client.models.list()
         data = getattr(response, "data", response)
         ids: list[str] = []
@@ -63,6 +74,72 @@ def list_models(*, only_chat: bool = True) -> list[str]:
         return DEFAULT_MODELS
 
 
+def complete(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    model: str = "gpt-4o",
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+) -> str:
+    load_dotenv()
+    api_key = keypool.choose("openai")
+    if not api_key:
+        raise RuntimeError("[OpenAI] OPENAI_API_KEY não encontrada.")
+
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("openai", api_key, tokens=tokens)
+    client = _client(api_key)
+    response = client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    return response.choices[0].message.content or ""
+
+
+def stream(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    model: str = "gpt-4o",
+    temperature: float = 0.2,
+    frequency_penalty: float = 0.0,
+    max_tokens: int = 4000,
+    api_key: str | None = None,
+) -> Iterator[streaming.StreamChunk]:
+    """Stream sem prints nem arquivos (usado pela API em processo)."""
+    if api_key is None:
+        load_dotenv()
+        api_key = keypool.choose("openai")
+    if not api_key:
+        raise RuntimeError("[OpenAI] OPENAI_API_KEY não encontrada.")
+
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("openai", api_key, tokens=tokens)
+    with profiling.phase("openai.client"):
+        client = _client(api_key)
+    return streaming.openai_chunks(
+        client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            model=model,
+            temperature=temperature,
+            frequency_penalty=frequency_penalty,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+            **streaming.timeout_kwargs(),
+        )
+    )
+
+
 def run(
     system_prompt: str,
     user_prompt: str,
@@ -71,56 +148,31 @@ def run(
     model: str = "gpt-4o",
     temperature: float = 0.2,
     frequency_penalty: float = 0.3,
+    max_tokens: int = 4000,
     attempts: int = 3,
 ) -> Path | None:
     print("\n" + "=" * 50)
     print("🟢 [OpenAI] Iniciando...")
 
-    load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("⚠️ [OpenAI] Pulei: OPENAI_API_KEY não encontrada.")
-        return None
-
-    try:
-        from openai import OpenAI
-    except ImportError:
-        print("❌ [OpenAI] Dependência ausente: instale com `pip install openai`.")
-        return None
-
-    outdir.mkdir(parents=True, exist_ok=True)
-    client = OpenAI(api_key=api_key)
-
-    for attempt in range(1, attempts + 1):
-        try:
-            stream = client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                model=model,
-                temperature=temperature,
-                frequency_penalty=frequency_penalty,
-                stream=True,
-            )
-
-            text = ""
-            print("   ⏳ Gerando resposta (streaming)...")
-            print("-" * 30)
-            for chunk in stream:
-                delta = chunk.choices[0].delta.content
-                if delta:
-                    print(delta, end="", flush=True)
-                    text += delta
-            print("\n" + "-" * 30)
-
-            output_path = outdir / "resultado_openai.md"
-            output_path.write_text(text, encoding="utf-8")
-            print(f"\n✅ [OpenAI] Sucesso! Salvo em '{output_path}'.")
-            return output_path
-
-        except Exception as exc:  # noqa: BLE001 (CLI tool)
-            print(f"\n⚠️ [OpenAI] Erro (tentativa {attempt}/{attempts}): {exc}")
-            time.sleep(2)
-
-    return None
+    def open_stream(api_key: str | None, model: str, prompt: str) -> Iterator[streaming.StreamChunk]:
+        return stream(
+            system_prompt,
+            prompt,
+            model=model,
+            temperature=temperature,
+            frequency_penalty=frequency_penalty,
+            max_tokens=max_tokens,
+            api_key=api_key,
+        )
+
+    return runner.run(
+        "openai",
+        "OpenAI",
+        system_prompt,
+        user_prompt,
+        output_path=outdir / "resultado_openai.md",
+        models=[model] * attempts,
+        open_stream=open_stream,
+        package="openai",
+        pip_name="openai",
+    )
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-import os
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Iterator
 
 from dotenv import load_dotenv
 
+from automgr import keypool, profiling, ratelimit, streaming
+from automgr.providers import runner
+
 
 DEFAULT_MODELS: dict[str, dict[str, str]] = {
     "1": {
@@ -37,21 +41,29 @@ DEFAULT_MODELS: dict[str, dict[str, str]] = {
 DEFAULT_MODELS_FLAT = sorted({info["slug"] for info in DEFAULT_MODELS.values()})
 
 
+@lru_cache(maxsize=8)
+def _client(api_key: str) -> Any:
+    """Cliente reaproveitado por chave: mantém o pool de conexões (e a sessão TLS) entre chamadas."""
+    from openai import OpenAI
+
+    return OpenAI(base_url="https://openrouter.ai/api/v1", api_key=api_key)
+
+
 def list_models() -> list[str]:
     load_dotenv()
-    api_key = os.getenv("OPENROUTER_API_KEY")
+    api_key = keypool.choose("openrouter")
     if not api_key:
         print("⚠️ [OpenRouter] Não foi possível listar: OPENROUTER_API_KEY não encontrada.")
         return []
 
     try:
-        from openai import OpenAI
+        from openai import OpenAI  # noqa: F401
     except ImportError:
         print("❌ [OpenRouter] Dependência ausente: instale com `pip install openai`.")
         return []
 
     try:
-        client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=api_key)
+        client = _client(api_key)
         response = client.models.list(
             extra_headers={
                 "HTTP-Referer": "https://automgr.local",
@@ -67,51 +79,86 @@ def list_models() -> list[str]:
         return DEFAULT_MODELS_FLAT
 
 
+def list_models_detailed() -> list[dict[str, Any]]:
+    """
+    Lista modelos com metadados do catálogo do OpenRouter:
+    `id`, `context_length` e preços em USD por 1M tokens (`prompt_price`, `completion_price`).
+    """
+    load_dotenv()
+    api_key = keypool.choose("openrouter")
+    if not api_key:
+        print("⚠️ [OpenRouter] Não foi possível listar: OPENROUTER_API_KEY não encontrada.")
+        return []
+
+    try:
+        from openai import OpenAI  # noqa: F401
+    except ImportError:
+        print("❌ [OpenRouter] Dependência ausente: instale com `pip install openai`.")
+        return []
+
+    def per_million(value: Any) -> float | None:
+        try:
+            price = float(value)
+        except (TypeError, ValueError):
+            return None
+        return None if price < 0 else price * 1_000_000
+
+    try:
+        client = _client(api_key)
+        response = client.models.list(
+            extra_headers={
+                "HTTP-Referer": "https://automgr.local",
+                "X-Title": "AutoMGR Script",
+            }
+        )
+        data = getattr(response, "data", response)
+        models: list[dict[str, Any]] = []
+        for item in data:
+            model_id = getattr(item, "id", None)
+            if not model_id:
+                continue
+            pricing = getattr(item, "pricing", None) or {}
+            models.append(
+                {
+                    "id": model_id,
+                    "context_length": getattr(item, "context_length", None),
+                    "prompt_price": per_million(pricing.get("prompt")),
+                    "completion_price": per_million(pricing.get("completion")),
+                }
+            )
+        return sorted(models, key=lambda m: m["id"])
+    except Exception as exc:  # noqa: BLE001
+        print(f"❌ [OpenRouter] Erro ao listar catálogo: {exc}")
+        return []
+
+
 def _safe_name(model_slug: str) -> str:
     return model_slug.split("/")[-1].replace("-", "_").replace(".", "")
 
 
-def run_one(
-    model_slug: str,
+def complete(
     system_prompt: str,
     user_prompt: str,
     *,
-    outdir: Path,
+    model: str = "deepseek/deepseek-chat",
     temperature: float = 0.2,
     max_tokens: int = 4000,
     timeout: int = 120,
-) -> Path | None:
-    print(f"\n🚀 [OpenRouter] Iniciando: {model_slug}")
-
+) -> str:
     load_dotenv()
-    api_key = os.getenv("OPENROUTER_API_KEY")
+    api_key = keypool.choose("openrouter")
     if not api_key:
-        print("❌ [OpenRouter] Erro: configure OPENROUTER_API_KEY no .env.")
-        return None
-
-    try:
-        from openai import OpenAI
-    except ImportError:
-        print("❌ [OpenRouter] Dependência ausente: instale com `pip install openai`.")
-        return None
-
-    outdir.mkdir(parents=True, exist_ok=True)
+        raise RuntimeError("[OpenRouter] OPENROUTER_API_KEY não encontrada.")
 
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=api_key,
-    )
-
-    text = ""
-    print("   ⏳ Gerando resposta (streaming)...")
-    print("-" * 40)
-
-    stream = client.chat.completions.create(
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("openrouter", api_key, tokens=tokens)
+    client = _client(api_key)
+    response = client.chat.completions.create(
         extra_headers={
             "HTTP-Referer": "https://automgr.local",
             "X-Title": "AutoMGR Script",
         },
-        model=model_slug,
+        model=model,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
@@ -119,22 +166,87 @@ def run_one(
         temperature=temperature,
         max_tokens=max_tokens,
         timeout=timeout,
-        stream=True,
+    )
+    return response.choices[0].message.content or ""
+
+
+def stream(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    model: str = "deepseek/deepseek-chat",
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+    timeout: int = 120,
+    api_key: str | None = None,
+) -> Iterator[streaming.StreamChunk]:
+    """Stream sem prints nem arquivos (usado pela API em processo)."""
+    if api_key is None:
+        load_dotenv()
+        api_key = keypool.choose("openrouter")
+    if not api_key:
+        raise RuntimeError("[OpenRouter] OPENROUTER_API_KEY não encontrada.")
+
+    tokens = ratelimit.reserve_tokens(system_prompt, user_prompt, max_tokens)
+    ratelimit.acquire("openrouter", api_key, tokens=tokens)
+    with profiling.phase("openrouter.client"):
+        client = _client(api_key)
+    return streaming.openai_chunks(
+        client.chat.completions.create(
+            extra_headers={
+                "HTTP-Referer": "https://automgr.local",
+                "X-Title": "AutoMGR Script",
+            },
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            timeout=streaming.request_timeout(timeout),
+            extra_body={"usage": {"include": True}},
+        )
     )
 
-    for chunk in stream:
-        delta = chunk.choices[0].delta.content
-        if delta is not None:
-            print(delta, end="", flush=True)
-            text += delta
 
-    print("\n" + "-" * 40)
+def run_one(
+    model_slug: str,
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    outdir: Path,
+    temperature: float = 0.2,
+    max_tokens: int = 4000,
+    timeout: int = 120,
+) -> Path | None:
+    print(f"\n🚀 [OpenRouter] Iniciando: {model_slug}")
 
-    filename = f"resultado_openrouter_{_safe_name(model_slug)}.md"
-    output_path = outdir / filename
-    output_path.write_text(text, encoding="utf-8")
-    print(f"\n✅ [OpenRouter] Sucesso! Salvo em '{output_path}'.")
-    return output_path
+    def open_stream(api_key: str | None, model: str, prompt: str) -> Iterator[streaming.StreamChunk]:
+        return stream(
+            system_prompt,
+            prompt,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            api_key=api_key,
+        )
+
+    return runner.run(
+        "openrouter",
+        "OpenRouter",
+        system_prompt,
+        user_prompt,
+        output_path=outdir / f"resultado_openrouter_{_safe_name(model_slug)}.md",
+        models=[model_slug],
+        open_stream=open_stream,
+        package="openai",
+        pip_name="openai",
+        stream_label=f"OpenRouter {model_slug}",
+        rule_width=40,
+    )
 
 
 def run_menu(
@@ -0,0 +1,198 @@
+"""Fluxo de geração da CLI comum a todos os providers.
+
+Cada provider informa só como abrir o stream de uma parte com o SDK (`open_stream`); o resto é
+igual para todos e fica aqui: orçamento (ledger), prazo global, pool de chaves, tentativas,
+cassete, continuações, renderização no terminal, eventos, histórico, ledger e o parcial salvo
+quando o stream para ou falha no meio.
+"""
+
+from __future__ import annotations
+
+import importlib
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+from dotenv import load_dotenv
+
+from automgr import cassette, console, continuation, events, history, keypool, ledger, profiling, streaming
+
+
+# open_stream(api_key, model, prompt): stream de uma parte (o prompt de sistema fica com o provider).
+OpenStream = Callable[[str | None, str, str], Iterator[streaming.StreamChunk]]
+
+
+def ready(provider: str, label: str, *, package: str, pip_name: str, key_required: bool = True) -> bool:
+    """Confere orçamento, chave e dependência antes de gerar (com o aviso para o usuário)."""
+    stop = ledger.exhausted()
+    if stop:
+        print(f"💸 [{label}] Pulei: {stop}.")
+        events.error(stop, provider=provider)
+        return False
+
+    load_dotenv()
+    if key_required and not keypool.choose(provider) and not cassette.replaying():
+        env = keypool.ENV_VARS[provider]
+        print(f"⚠️ [{label}] Pulei: {env} não encontrada.")
+        events.error(f"{env} não encontrada", provider=provider)
+        return False
+
+    try:
+        importlib.import_module(package)
+    except ImportError:
+        print(f"❌ [{label}] Dependência ausente: instale com `pip install {pip_name}`.")
+        return False
+    return True
+
+
+def _save_partial(
+    provider: str,
+    model: str,
+    output_path: Path,
+    text: str,
+    usage: dict[str, int] | None,
+    system_prompt: str,
+    user_prompt: str,
+) -> str:
+    """Salva o texto recebido até a interrupção e o registra no ledger; retorna o aviso para o usuário."""
+    partial_path = streaming.save_partial(output_path, text)
+    if partial_path is None:
+        return ""
+    if not cassette.replaying():
+        ledger.record(
+            provider,
+            model,
+            usage=usage,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            output_text=text,
+            output=str(partial_path),
+        )
+    return f" Parcial salvo em '{partial_path}'."
+
+
+def run(
+    provider: str,
+    label: str,
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    output_path: Path,
+    models: list[str],
+    open_stream: OpenStream,
+    package: str,
+    pip_name: str,
+    key_required: bool = True,
+    skip_error: Callable[[Exception], bool] | None = None,
+    stream_label: str | None = None,
+    rule_width: int = 30,
+    variant: int = 0,
+) -> Path | None:
+    """
+    Gera em `output_path`, com uma tentativa por item de `models` (o mesmo modelo repetido para
+    novas tentativas, ou modelos alternativos). `skip_error(exc)` pula a tentativa sem aviso
+    (ex.: modelo inexistente). Retorna None se nenhuma tentativa funcionar.
+    """
+    if not ready(provider, label, package=package, pip_name=pip_name, key_required=key_required):
+        return None
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    api_key = keypool.choose(provider)
+    attempts = len(models)
+
+    for attempt, model in enumerate(models, start=1):
+        if streaming.deadline_expired():
+            print(f"⏰ [{label}] Prazo global esgotado; não haverá novas tentativas.")
+            events.error("prazo global esgotado", provider=provider, model=model)
+            return None
+        if len(set(models)) > 1:
+            print(f"   👉 Tentando modelo: {model}")
+
+        text = ""
+        usage: dict[str, int] | None = None
+        finish_reason: str | None = None
+        try:
+            started = time.perf_counter()
+            first_byte: float | None = None
+
+            stream = cassette.wrap(
+                provider,
+                model,
+                system_prompt,
+                user_prompt,
+                lambda: continuation.extend(lambda prompt: open_stream(api_key, model, prompt), user_prompt),
+                variant=variant,
+            )
+
+            print("   ⏳ Gerando resposta (streaming)...")
+            with console.open_stream(stream_label or label, rule_width=rule_width) as renderer:
+                for chunk in streaming.guard(stream):
+                    usage = chunk.usage or usage
+                    finish_reason = chunk.finish_reason or finish_reason
+                    if chunk.text:
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - started
+                        renderer.write(chunk.text)
+                        events.chunk(provider, model, chunk.text)
+                        text += chunk.text
+
+            profiling.record_stream(provider, started=started, first_byte=first_byte)
+            with profiling.phase(f"{provider}.file_write"):
+                output_path.write_text(text, encoding="utf-8")
+            if not cassette.replaying():
+                history.record_latency(
+                    provider,
+                    model,
+                    seconds=time.perf_counter() - started,
+                    first_byte_seconds=first_byte,
+                    input_chars=len(system_prompt) + len(user_prompt),
+                    output_chars=len(text),
+                    risks=continuation.count_risks(text),
+                )
+                ledger.record(
+                    provider,
+                    model,
+                    usage=usage,
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                    output_text=text,
+                    output=str(output_path),
+                )
+            events.provider_done(
+                provider,
+                model,
+                seconds=time.perf_counter() - started,
+                first_byte_seconds=first_byte,
+                output_chars=len(text),
+                usage=usage,
+                output=str(output_path),
+                finish_reason=finish_reason,
+            )
+            print(f"\n✅ [{label}] Sucesso! Salvo em '{output_path}'.")
+            warning = continuation.truncation_warning(label, finish_reason)
+            if warning:
+                print(warning)
+            return output_path
+
+        except streaming.StreamTimeoutError as exc:
+            saved = _save_partial(provider, model, output_path, text, usage, system_prompt, user_prompt)
+            print(f"\n⏱️ [{label}] {exc} (tentativa {attempt}/{attempts}).{saved}")
+            events.retry(provider, model, attempt=attempt, attempts=attempts, error=exc)
+
+        except Exception as exc:  # noqa: BLE001 (CLI tool)
+            if skip_error is not None and skip_error(exc) and not text:
+                continue
+            # Erro no meio do stream: o texto já recebido (e pago) também vira parcial.
+            saved = _save_partial(provider, model, output_path, text, usage, system_prompt, user_prompt)
+            print(f"\n⚠️ [{label}] Erro (tentativa {attempt}/{attempts}): {exc}{saved}")
+            events.retry(provider, model, attempt=attempt, attempts=attempts, error=exc)
+            replacement = keypool.rotate(provider, api_key, exc)
+            if replacement is not None:
+                print(f"   🔑 [{label}] Chave em quarentena; próxima tentativa com outra chave do pool.")
+                api_key = replacement
+            elif attempt < attempts:
+                time.sleep(2)
+
+    print(f"❌ [{label}] Nenhuma tentativa funcionou.")
+    events.error(f"{attempts} tentativa(s) sem sucesso", provider=provider)
+    return None
@@ -0,0 +1,179 @@
+"""Limitador de taxa compartilhado entre processos (SQLite) por provider/chave de API.
+
+Cada chamada reserva capacidade (1 requisição + tokens estimados) numa janela deslizante
+de 60s antes de enviar a requisição. Vários processos `automgr` apontando para o mesmo
+arquivo (default: .automgr/ratelimit.sqlite3) dividem a mesma cota.
+
+Limites: `--rate-limit groq=30:6000` (RPM:TPM; qualquer um pode ser omitido, ex. `openai=:30000`)
+ou a variável de ambiente AUTOMGR_RATE_LIMITS="groq=30:6000,gemini=15".
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from automgr import events, streaming
+from automgr.paths import default_state_dir, ensure_dir
+from automgr.prompt import estimate_tokens
+
+
+DB_FILENAME = "ratelimit.sqlite3"
+WINDOW_SECONDS = 60.0
+DEFAULT_OUTPUT_RESERVE = 4000
+ENV_LIMITS = "AUTOMGR_RATE_LIMITS"
+
+
+@dataclass(frozen=True)
+class Limit:
+    rpm: int | None = None
+    tpm: int | None = None
+
+
+_limits: dict[str, Limit] = {}
+_db_path: Path | None = None
+_log: Callable[[str], None] | None = None
+
+
+def parse_limits(specs: list[str]) -> dict[str, Limit]:
+    limits: dict[str, Limit] = {}
+    for spec in specs:
+        for item in spec.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            provider, sep, values = item.partition("=")
+            if not sep or not provider:
+                raise ValueError(f"Limite inválido: '{item}' (use provider=RPM:TPM)")
+            rpm_str, _, tpm_str = values.partition(":")
+            limits[provider.strip()] = Limit(
+                rpm=int(rpm_str) if rpm_str.strip() else None,
+                tpm=int(tpm_str) if tpm_str.strip() else None,
+            )
+    return limits
+
+
+def configure(
+    limits: dict[str, Limit] | None = None,
+    *,
+    db_path: Path | None = None,
+    log: Callable[[str], None] | None = None,
+) -> None:
+    """`log` recebe o aviso de espera por cota (a CLI passa `print`; como biblioteca, só o evento)."""
+    global _limits, _db_path, _log
+    env_spec = os.getenv(ENV_LIMITS, "")
+    _limits = {**(parse_limits([env_spec]) if env_spec else {}), **(limits or {})}
+    _db_path = db_path
+    _log = log
+
+
+def _connect() -> sqlite3.Connection:
+    path = _db_path or default_state_dir(Path.cwd()) / DB_FILENAME
+    ensure_dir(path.parent)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS usage (bucket TEXT NOT NULL, ts REAL NOT NULL, tokens INTEGER NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS usage_bucket_ts ON usage (bucket, ts)")
+    return conn
+
+
+def bucket_for(provider: str, api_key: str | None) -> str:
+    # A chave nunca é gravada: só um prefixo do hash, para separar cotas de chaves diferentes.
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+    return f"{provider}:{key_hash}"
+
+
+def _wait_needed(conn: sqlite3.Connection, bucket: str, limit: Limit, tokens: int, now: float) -> float:
+    rows = conn.execute(
+        "SELECT ts, tokens FROM usage WHERE bucket = ? AND ts > ? ORDER BY ts",
+        (bucket, now - WINDOW_SECONDS),
+    ).fetchall()
+
+    wait = 0.0
+    if limit.rpm is not None and len(rows) >= limit.rpm:
+        oldest_needed = rows[len(rows) - limit.rpm]
+        wait = max(wait, oldest_needed[0] + WINDOW_SECONDS - now)
+
+    if limit.tpm is not None:
+        used = sum(row[1] for row in rows)
+        # Uma reserva maior que a cota inteira só passa com a janela vazia.
+        budget = max(limit.tpm, tokens)
+        for ts, row_tokens in rows:
+            if used + tokens <= budget:
+                break
+            used -= row_tokens
+            wait = max(wait, ts + WINDOW_SECONDS - now)
+    return wait
+
+
+def acquire(provider: str, api_key: str | None, *, tokens: int) -> float:
+    """
+    Bloqueia até haver capacidade para 1 requisição com `tokens` tokens e registra a reserva.
+    Retorna o tempo esperado (segundos). Sem limite configurado para o provider, não faz nada.
+    """
+    limit = _limits.get(provider)
+    if limit is None or (limit.rpm is None and limit.tpm is None):
+        return 0.0
+
+    bucket = bucket_for(provider, api_key)
+    waited = 0.0
+    conn = _connect()
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            conn.execute("DELETE FROM usage WHERE ts <= ?", (now - WINDOW_SECONDS,))
+            wait = _wait_needed(conn, bucket, limit, tokens, now)
+            if wait <= 0:
+                conn.execute("INSERT INTO usage (bucket, ts, tokens) VALUES (?, ?, ?)", (bucket, now, tokens))
+                conn.execute("COMMIT")
+                return waited
+            conn.execute("ROLLBACK")
+
+            left = streaming.remaining()
+            if left is not None and wait > left:
+                raise streaming.DeadlineExceededError(
+                    f"[{provider}] Cota de taxa só libera em {wait:.0f}s, depois do prazo global."
+                )
+            if waited == 0.0:
+                events.emit("rate_limit_wait", provider=provider, seconds=round(wait, 3))
+                if _log is not None:
+                    _log(f"   🚦 [{provider}] Aguardando cota ({wait:.1f}s)...")
+            time.sleep(min(wait, 5.0) + 0.05)
+            waited += min(wait, 5.0) + 0.05
+    finally:
+        conn.close()
+
+
+def reserve_tokens(system_prompt: str, user_prompt: str, max_tokens: int | None = None) -> int:
+    return estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + (max_tokens or DEFAULT_OUTPUT_RESERVE)
+
+
+def headroom(provider: str, api_key: str | None) -> float:
+    """Fração da cota ainda livre na janela atual (1.0 sem limite configurado para o provider)."""
+    limit = _limits.get(provider)
+    if limit is None or (limit.rpm is None and limit.tpm is None):
+        return 1.0
+
+    conn = _connect()
+    try:
+        count, used = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM usage WHERE bucket = ? AND ts > ?",
+            (bucket_for(provider, api_key), time.time() - WINDOW_SECONDS),
+        ).fetchone()
+    finally:
+        conn.close()
+
+    fractions = []
+    if limit.rpm:
+        fractions.append(1.0 - count / limit.rpm)
+    if limit.tpm:
+        fractions.append(1.0 - used / limit.tpm)
+    return max(0.0, min(fractions)) if fractions else 1.0
@@ -0,0 +1,112 @@
+"""Escolha automática de modelo por latência ou custo estimados."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from automgr.catalog import ModelInfo
+from automgr.history import model_stats
+from automgr.prompt import CHARS_PER_TOKEN
+
+
+STRATEGIES = ("fastest", "cheapest")
+
+# Estimativas iniciais, usadas enquanto não há histórico local do modelo.
+DEFAULT_FIRST_BYTE_SECONDS = 2.0
+DEFAULT_TOKENS_PER_SECOND: dict[str, float] = {
+    "groq": 250.0,
+    "gemini": 80.0,
+    "openai": 60.0,
+    "openrouter": 40.0,
+}
+
+
+@dataclass(frozen=True)
+class RouteChoice:
+    info: ModelInfo
+    est_seconds: float
+    est_cost: float | None
+    from_history: bool
+
+
+def estimate(
+    info: ModelInfo,
+    history: dict[str, list[dict[str, Any]]],
+    *,
+    prompt_tokens: int,
+    output_tokens: int,
+) -> RouteChoice:
+    stats = model_stats(history, info.provider, info.model)
+    first_byte = DEFAULT_FIRST_BYTE_SECONDS
+    chars_per_second = DEFAULT_TOKENS_PER_SECOND.get(info.provider, 40.0) * CHARS_PER_TOKEN
+    expected_output = output_tokens
+
+    if stats:
+        first_byte = stats.get("first_byte_seconds", first_byte)
+        chars_per_second = stats.get("chars_per_second", chars_per_second)
+        if stats.get("output_chars"):
+            expected_output = min(output_tokens, int(stats["output_chars"]) // CHARS_PER_TOKEN)
+
+    est_seconds = first_byte + (expected_output * CHARS_PER_TOKEN) / max(chars_per_second, 1.0)
+    return RouteChoice(
+        info=info,
+        est_seconds=est_seconds,
+        est_cost=info.estimate_cost(prompt_tokens, output_tokens),
+        from_history=stats is not None,
+    )
+
+
+def rank_models(
+    catalog: list[ModelInfo],
+    history: dict[str, list[dict[str, Any]]],
+    *,
+    prompt_tokens: int,
+    output_tokens: int,
+    strategy: str,
+    max_seconds: float | None = None,
+    max_cost: float | None = None,
+) -> list[RouteChoice]:
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estratégia inválida: {strategy} (use {', '.join(STRATEGIES)})")
+
+    choices: list[RouteChoice] = []
+    for info in catalog:
+        if info.context_length is not None and info.context_length < prompt_tokens + output_tokens:
+            continue
+        choice = estimate(info, history, prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+        if max_seconds is not None and choice.est_seconds > max_seconds:
+            continue
+        if max_cost is not None and (choice.est_cost is None or choice.est_cost > max_cost):
+            continue
+        choices.append(choice)
+
+    def sort_key(choice: RouteChoice) -> tuple[Any, ...]:
+        cost = choice.est_cost if choice.est_cost is not None else float("inf")
+        if strategy == "cheapest":
+            return (cost, choice.est_seconds)
+        return (choice.est_seconds, cost)
+
+    return sorted(choices, key=sort_key)
+
+
+def choose_model(
+    catalog: list[ModelInfo],
+    history: dict[str, list[dict[str, Any]]],
+    *,
+    prompt_tokens: int,
+    output_tokens: int,
+    strategy: str,
+    max_seconds: float | None = None,
+    max_cost: float | None = None,
+) -> RouteChoice | None:
+    ranked = rank_models(
+        catalog,
+        history,
+        prompt_tokens=prompt_tokens,
+        output_tokens=output_tokens,
+        strategy=strategy,
+        max_seconds=max_seconds,
+        max_cost=max_cost,
+    )
+    return ranked[0] if ranked else None
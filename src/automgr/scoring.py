@@ -0,0 +1,221 @@
+"""Avaliação estrutural dos `resultado_*.md` e ranking por modelo (`automgr score`).
+
+Cada arquivo recebe uma nota de 0 a 1 (média das verificações abaixo), calculada em
+paralelo num pool de processos. As notas são agrupadas por modelo e combinadas com a
+latência e o custo estimado registrados no histórico local.
+
+- secoes: títulos obrigatórios do modelo presentes e na ordem;
+- nr: linhas da tabela-síntese com P e I em {5, 10, 15} e NR = P x I;
+- riscos: quantidade entre 1 e MAX_RISCOS e mesmo número de riscos nos Itens 2 e 3;
+- marcadores: nenhum trecho instrucional `<...>` ou `{CAMPO}` esquecido no texto.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import statistics
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from automgr.catalog import ModelInfo
+from automgr.incremental import parse_document
+from automgr.prompt import CHARS_PER_TOKEN
+
+
+DEFAULT_PATTERN = "resultado_*.md"
+# Parciais (stream interrompido) e rascunhos (`--similar draft`) não são saídas de um modelo.
+EXCLUDED_SUFFIXES = (".parcial.md", ".rascunho.md")
+DEFAULT_MAX_RISKS = 10
+# Abaixo disso o custo de subir o pool de processos supera o ganho.
+MIN_FILES_FOR_POOL = 32
+
+REQUIRED_SECTIONS = [
+    "MAPA DE GERENCIAMENTO DE RISCOS",
+    "HISTORICO DE REVISOES",
+    "INTRODUCAO",
+    "2 - IDENTIFICACAO E ANALISE DOS PRINCIPAIS RISCOS",
+    "3 - AVALIACAO E TRATAMENTO DOS RISCOS IDENTIFICADOS",
+    "4 - ACOMPANHAMENTO DAS ACOES DE TRATAMENTO DE RISCOS",
+    "5 - APROVACAO E ASSINATURA",
+    "ESPACO DESTINADO A IDENTIFICACAO DO ORGAO/ENTIDADE",
+]
+SCALE = {5, 10, 15}
+
+_PLACEHOLDER_RE = re.compile(r"<(?!/?(?:br|b|i|u|sup|sub)\s*/?>)[^<>\n]{1,120}>|\{[A-Z_]{3,}[^{}\n]*\}")
+_BATCH_SUFFIX_RE = re.compile(r"_\d{2}$")
+
+
+@dataclass
+class FileScore:
+    path: str
+    label: str
+    score: float
+    checks: dict[str, float]
+    risks: int
+    problems: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ModelScore:
+    label: str
+    provider: str | None
+    model: str | None
+    files: int
+    mean_score: float
+    pass_rate: float
+    seconds: float | None = None
+    cost: float | None = None
+
+
+def _normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.upper())
+    ascii_text = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    ascii_text = re.sub(r"[–—]", "-", ascii_text)
+    return re.sub(r"\s+", " ", re.sub(r"[*#_`|]", " ", ascii_text)).strip()
+
+
+def _label_for(path: Path) -> str:
+    return _BATCH_SUFFIX_RE.sub("", path.stem).removeprefix("resultado_")
+
+
+def _check_sections(text: str) -> tuple[float, list[str]]:
+    normalized = _normalize(text)
+    position = 0
+    missing: list[str] = []
+    for title in REQUIRED_SECTIONS:
+        found = normalized.find(title, position)
+        if found < 0:
+            missing.append(title)
+            continue
+        position = found + len(title)
+    problems = [f"seção ausente ou fora de ordem: {title}" for title in missing]
+    return 1.0 - len(missing) / len(REQUIRED_SECTIONS), problems
+
+
+def _row_numbers(line: str) -> list[int]:
+    cells = [cell.strip(" *") for cell in line.strip().strip("|").split("|")]
+    return [int(cell) for cell in cells[-3:] if cell.isdigit()]
+
+
+def score_text(text: str, *, max_risks: int = DEFAULT_MAX_RISKS) -> tuple[float, dict[str, float], int, list[str]]:
+    segments = parse_document(text)
+    rows = [s for s in segments if s.kind == "row"]
+    blocks = [s for s in segments if s.kind == "block"]
+    checks: dict[str, float] = {}
+    problems: list[str] = []
+
+    checks["secoes"], section_problems = _check_sections(text)
+    problems.extend(section_problems)
+
+    valid_rows = 0
+    for row in rows:
+        numbers = _row_numbers(row.text)
+        if len(numbers) == 3 and {numbers[0], numbers[1]} <= SCALE and numbers[0] * numbers[1] == numbers[2]:
+            valid_rows += 1
+        else:
+            problems.append(f"{row.risk_id}: P/I/NR inválidos ({' | '.join(map(str, numbers)) or 'sem números'})")
+    checks["nr"] = valid_rows / len(rows) if rows else 0.0
+
+    count_ok = 1 <= len(rows) <= max_risks
+    blocks_ok = {s.risk_id for s in rows} == {s.risk_id for s in blocks}
+    checks["riscos"] = (count_ok + blocks_ok) / 2
+    if not count_ok:
+        problems.append(f"{len(rows)} riscos na tabela-síntese (esperado 1 a {max_risks})")
+    if not blocks_ok:
+        problems.append(f"Itens 2 e 3 com riscos diferentes ({len(rows)} linhas, {len(blocks)} blocos)")
+
+    placeholders = _PLACEHOLDER_RE.findall(text)
+    checks["marcadores"] = 0.0 if placeholders else 1.0
+    if placeholders:
+        problems.append(f"{len(placeholders)} marcador(es) esquecido(s), ex.: {placeholders[0][:40]}")
+
+    score = sum(checks.values()) / len(checks)
+    return score, checks, len(rows), problems
+
+
+def score_file(path: str, max_risks: int = DEFAULT_MAX_RISKS) -> FileScore:
+    text = Path(path).read_text(encoding="utf-8", errors="replace")
+    score, checks, risks, problems = score_text(text, max_risks=max_risks)
+    return FileScore(path, _label_for(Path(path)), score, checks, risks, problems)
+
+
+def find_outputs(outdir: Path, pattern: str = DEFAULT_PATTERN) -> list[Path]:
+    return sorted(p for p in outdir.rglob(pattern) if p.is_file() and not p.name.endswith(EXCLUDED_SUFFIXES))
+
+
+def score_files(
+    paths: list[Path],
+    *,
+    max_risks: int = DEFAULT_MAX_RISKS,
+    workers: int | None = None,
+) -> list[FileScore]:
+    scorer = partial(score_file, max_risks=max_risks)
+    names = [str(p) for p in paths]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(names) < MIN_FILES_FOR_POOL:
+        return [scorer(name) for name in names]
+    chunksize = max(1, len(names) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(scorer, names, chunksize=chunksize))
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def resolve_model(label: str, history: dict[str, list[dict[str, Any]]]) -> tuple[str | None, str | None]:
+    """
+    Associa o rótulo do arquivo (ex.: 'gemini_gemini_20_flash', 'groq') a provider/modelo do histórico.
+    Arquivos sem o modelo no nome (resultado_groq.md) ficam com o modelo usado por último.
+    """
+    provider, _, model_part = label.partition("_")
+    candidates = [key.partition(":")[2] for key in history if key.partition(":")[0] == provider]
+    if not model_part:
+        if not candidates:
+            return provider, None
+        latest = max(candidates, key=lambda m: max(s.get("ts", 0.0) for s in history[f"{provider}:{m}"]))
+        return provider, latest
+    for model in candidates:
+        if _squash(model.split("/")[-1]) == _squash(model_part):
+            return provider, model
+    return provider, None
+
+
+def leaderboard(
+    scores: list[FileScore],
+    history: dict[str, list[dict[str, Any]]],
+    catalog: list[ModelInfo],
+) -> list[ModelScore]:
+    prices = {(info.provider, info.model): info for info in catalog}
+    groups: dict[str, list[FileScore]] = {}
+    for item in scores:
+        groups.setdefault(item.label, []).append(item)
+
+    board: list[ModelScore] = []
+    for label, items in groups.items():
+        provider, model = resolve_model(label, history)
+        entry = ModelScore(
+            label=f"{provider}/{model}" if model else label,
+            provider=provider,
+            model=model,
+            files=len(items),
+            mean_score=statistics.fmean(i.score for i in items),
+            pass_rate=sum(1 for i in items if i.score >= 1.0) / len(items),
+        )
+        samples = history.get(f"{provider}:{model}") or []
+        if samples:
+            entry.seconds = statistics.median(s["seconds"] for s in samples)
+            info = prices.get((provider or "", model or ""))
+            if info is not None:
+                input_tokens = int(statistics.median(s.get("input_chars", 0) for s in samples)) // CHARS_PER_TOKEN
+                output_tokens = int(statistics.median(s.get("output_chars", 0) for s in samples)) // CHARS_PER_TOKEN
+                entry.cost = info.estimate_cost(input_tokens, output_tokens)
+        board.append(entry)
+
+    board.sort(key=lambda e: (-e.mean_score, e.seconds if e.seconds is not None else float("inf")))
+    return board
@@ -0,0 +1,163 @@
+"""Cache por similaridade: reaproveita o MGR de um processo quase igual a um já gerado.
+
+Muitos processos repetem o OBJETO/ETP/TR de outro (outra unidade, outro ano) e só mudam
+metadados (nomes, matrículas, datas). Após cada geração, o texto limpo do ETP/TR vira uma
+assinatura MinHash (shingles de 3 termos, sem os termos dos metadados) guardada em
+`.automgr/similar/index.jsonl`, junto com os metadados e uma cópia do documento.
+
+Antes de gerar, `find` procura o processo anterior mais parecido (mesmo template e modelo);
+se a similaridade (Jaccard estimado) passa do limiar, o documento anterior é reaproveitado
+com os metadados trocados no texto (`incremental.apply_metadata`), sem chamada ao modelo:
+  - "draft": salvo como rascunho (`resultado_<provider>.rascunho.md`) para revisão;
+  - "reuse": salvo como o próprio resultado.
+Com "record", o índice só é alimentado.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from automgr import incremental
+from automgr.paths import default_state_dir, ensure_dir
+from automgr.prompt import split_sections, tokenize
+
+
+MODES = ("off", "record", "draft", "reuse")
+INDEX_DIRNAME = "similar"
+INDEX_FILENAME = "index.jsonl"
+DEFAULT_THRESHOLD = 0.9
+
+NUM_PERMUTATIONS = 128
+SHINGLE_SIZE = 3
+_PRIME = (1 << 61) - 1
+# Permutações fixas: assinaturas de execuções diferentes precisam ser comparáveis.
+_rng = random.Random(0x4D4752)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+
+@dataclass
+class Match:
+    similarity: float
+    provider: str
+    model: str
+    metadados: dict[str, str]
+    document_path: Path
+
+
+def _index_dir(state_dir: Path | None = None) -> Path:
+    return (state_dir or default_state_dir(Path.cwd())) / INDEX_DIRNAME
+
+
+def _metadados(dados: dict[str, Any]) -> dict[str, str]:
+    return {key: str(value) for key, value in dados.get("metadados", {}).items()}
+
+
+def content_terms(dados: dict[str, Any]) -> list[str]:
+    """Termos do ETP/TR limpos, sem os que vêm dos metadados (nomes, matrículas, datas)."""
+    ignored = {term for value in _metadados(dados).values() for term in tokenize(value)}
+    terms: list[str] = []
+    for section in split_sections(dados):
+        terms.extend(t for t in tokenize(f"{section.title} {section.text}") if t not in ignored)
+    return terms
+
+
+def signature(terms: list[str]) -> list[int]:
+    shingles = {" ".join(terms[i : i + SHINGLE_SIZE]) for i in range(max(1, len(terms) - SHINGLE_SIZE + 1))}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles
+    ]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(left: list[int], right: list[int]) -> float:
+    """Jaccard estimado entre duas assinaturas."""
+    if len(left) != len(right) or not left:
+        return 0.0
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+def _load_entries(state_dir: Path | None = None) -> list[dict[str, Any]]:
+    entries: list[dict[str, Any]] = []
+    try:
+        with (_index_dir(state_dir) / INDEX_FILENAME).open("r", encoding="utf-8") as f:
+            for raw in f:
+                try:
+                    entries.append(json.loads(raw))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        return []
+    return entries
+
+
+def find(
+    sig: list[int],
+    *,
+    fingerprint: str,
+    threshold: float = DEFAULT_THRESHOLD,
+    state_dir: Path | None = None,
+) -> Match | None:
+    """Processo anterior mais parecido (o mais recente, em caso de empate) acima do limiar."""
+    best: Match | None = None
+    directory = _index_dir(state_dir)
+    for entry in _load_entries(state_dir):
+        if entry.get("fingerprint") != fingerprint:
+            continue
+        score = similarity(sig, entry.get("signature") or [])
+        if score < threshold or (best is not None and score < best.similarity):
+            continue
+        document_path = directory / str(entry.get("document"))
+        if document_path.is_file():
+            best = Match(score, entry["provider"], entry["model"], entry.get("metadados", {}), document_path)
+    return best
+
+
+def adapt(match: Match, dados: dict[str, Any], template_text: str) -> str | None:
+    """Documento do processo parecido com os metadados do atual. None se algum não for localizável."""
+    document = match.document_path.read_text(encoding="utf-8")
+    return incremental.apply_metadata(document, match.metadados, _metadados(dados), template_text)
+
+
+def record(
+    provider: str,
+    model: str,
+    dados: dict[str, Any],
+    sig: list[int],
+    *,
+    fingerprint: str,
+    document: str,
+    state_dir: Path | None = None,
+) -> None:
+    """Guarda a assinatura e uma cópia do documento gerado (o resultado pode ser sobrescrito depois)."""
+    directory = _index_dir(state_dir)
+    ensure_dir(directory)
+    name = hashlib.sha256(document.encode("utf-8")).hexdigest()[:16] + ".md"
+    document_path = directory / name
+    if not document_path.exists():
+        tmp_path = document_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(document, encoding="utf-8")
+        os.replace(tmp_path, document_path)
+
+    entry = {
+        "ts": round(time.time(), 3),
+        "provider": provider,
+        "model": model,
+        "fingerprint": fingerprint,
+        "metadados": _metadados(dados),
+        "signature": sig,
+        "document": name,
+    }
+    line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+    # Uma única escrita em modo append: linhas de processos diferentes não se misturam.
+    fd = os.open(directory / INDEX_FILENAME, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
@@ -0,0 +1,284 @@
+"""Normalização dos streams dos SDKs (`StreamChunk`), timeouts por chunk e prazo global."""
+
+from __future__ import annotations
+
+import queue
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+
+@dataclass
+class StreamChunk:
+    text: str = ""
+    finish_reason: str | None = None
+    usage: dict[str, int] | None = None
+
+
+def _usage_from_openai(usage: Any) -> dict[str, int] | None:
+    if usage is None:
+        return None
+    return {
+        "input_tokens": int(getattr(usage, "prompt_tokens", 0) or 0),
+        "output_tokens": int(getattr(usage, "completion_tokens", 0) or 0),
+    }
+
+
+class Closers:
+    """
+    Como fechar os streams dos SDKs abertos pela thread auxiliar do `guard` (resposta HTTP/gRPC).
+    `close_all` pode ser chamado de outra thread para interromper o stream em andamento.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._items: list[Callable[[], Any]] = []
+        self._closed = False
+
+    def add(self, close: Callable[[], Any]) -> None:
+        with self._lock:
+            if not self._closed:
+                self._items.append(close)
+                return
+        # Stream aberto depois do cancelamento (ex.: continuação): fecha na hora.
+        _close_quietly(close)
+
+    def close_all(self) -> None:
+        with self._lock:
+            self._closed = True
+            items, self._items = self._items, []
+        for close in items:
+            _close_quietly(close)
+
+
+_local = threading.local()
+
+
+def _close_quietly(close: Callable[[], Any]) -> None:
+    try:
+        close()
+    except Exception:  # noqa: BLE001 (a conexão pode já estar fechada)
+        pass
+
+
+def _closer(stream: Any) -> Callable[[], Any] | None:
+    close = getattr(stream, "close", None) or getattr(stream, "cancel", None)
+    close = close if callable(close) else None
+    # SDKs sobre httpx (OpenAI, Groq): fechar a resposta não acorda uma leitura bloqueada em
+    # outra thread; o shutdown do socket sim.
+    extensions = getattr(getattr(stream, "response", None), "extensions", None) or {}
+    get_extra_info = getattr(extensions.get("network_stream"), "get_extra_info", None)
+    sock = get_extra_info("socket") if callable(get_extra_info) else None
+    if sock is None:
+        return close
+
+    def shutdown_and_close() -> None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        if close is not None:
+            close()
+
+    return shutdown_and_close
+
+
+def _register(stream: Any) -> None:
+    """Deixa o stream do SDK fechável pelo `guard` que o consome (se houver um)."""
+    closers: Closers | None = getattr(_local, "closers", None)
+    close = _closer(stream) if closers is not None else None
+    if close is not None:
+        closers.add(close)
+
+
+def openai_chunks(stream: Iterable[Any]) -> Iterator[StreamChunk]:
+    """Streams no formato OpenAI (OpenAI, Groq e OpenRouter)."""
+    _register(stream)
+    for chunk in stream:
+        usage = getattr(chunk, "usage", None)
+        x_groq = getattr(chunk, "x_groq", None)
+        if usage is None and x_groq is not None:
+            usage = getattr(x_groq, "usage", None)
+
+        choices = getattr(chunk, "choices", None) or []
+        if not choices:
+            if usage is not None:
+                yield StreamChunk(usage=_usage_from_openai(usage))
+            continue
+
+        choice = choices[0]
+        delta = getattr(choice, "delta", None)
+        yield StreamChunk(
+            text=(getattr(delta, "content", None) or "") if delta is not None else "",
+            finish_reason=getattr(choice, "finish_reason", None),
+            usage=_usage_from_openai(usage),
+        )
+
+
+def gemini_chunks(stream: Iterable[Any]) -> Iterator[StreamChunk]:
+    _register(stream)
+    for chunk in stream:
+        try:
+            text = chunk.text or ""
+        except ValueError:
+            # Chunk sem partes de texto (ex.: bloqueio de segurança ou chunk final).
+            text = ""
+
+        finish_reason = None
+        candidates = getattr(chunk, "candidates", None) or []
+        if candidates:
+            reason = getattr(candidates[0], "finish_reason", None)
+            name = getattr(reason, "name", None) or (str(reason) if reason else None)
+            if name and name not in {"FINISH_REASON_UNSPECIFIED", "0"}:
+                finish_reason = name.lower()
+
+        usage = None
+        metadata = getattr(chunk, "usage_metadata", None)
+        if metadata is not None and getattr(metadata, "candidates_token_count", None):
+            usage = {
+                "input_tokens": int(getattr(metadata, "prompt_token_count", 0) or 0),
+                "output_tokens": int(getattr(metadata, "candidates_token_count", 0) or 0),
+            }
+
+        yield StreamChunk(text=text, finish_reason=finish_reason, usage=usage)
+
+
+class StreamTimeoutError(TimeoutError):
+    pass
+
+
+class StreamStalledError(StreamTimeoutError):
+    pass
+
+
+class DeadlineExceededError(StreamTimeoutError):
+    pass
+
+
+class StreamCancelledError(RuntimeError):
+    pass
+
+
+_idle_timeout: float | None = None
+_deadline: float | None = None
+
+
+def configure(*, idle_timeout: float | None = None, deadline_seconds: float | None = None) -> None:
+    """
+    `idle_timeout`: tempo máximo sem receber chunks (inclui a espera pelo primeiro).
+    `deadline_seconds`: prazo global da execução, contado a partir desta chamada.
+    """
+    global _idle_timeout, _deadline
+    _idle_timeout = idle_timeout if idle_timeout and idle_timeout > 0 else None
+    _deadline = time.monotonic() + deadline_seconds if deadline_seconds and deadline_seconds > 0 else None
+
+
+def remaining() -> float | None:
+    if _deadline is None:
+        return None
+    return max(0.0, _deadline - time.monotonic())
+
+
+def deadline_expired() -> bool:
+    return _deadline is not None and time.monotonic() >= _deadline
+
+
+def request_timeout(default: float | None = None) -> float | None:
+    """Timeout (de leitura) a repassar ao SDK: o menor entre default, idle timeout e prazo restante."""
+    candidates = [t for t in (default, _idle_timeout, remaining()) if t is not None]
+    return max(1.0, min(candidates)) if candidates else None
+
+
+def timeout_kwargs() -> dict[str, float]:
+    timeout = request_timeout()
+    return {} if timeout is None else {"timeout": timeout}
+
+
+def deadline_kwargs() -> dict[str, float]:
+    """
+    Para SDKs em que o timeout vale para a chamada inteira (gRPC do Gemini), e não para cada
+    leitura: só o prazo global restante. O stream parado fica a cargo de `guard`.
+    """
+    left = remaining()
+    return {} if left is None else {"timeout": max(1.0, left)}
+
+
+def guard(
+    chunks: Iterator[StreamChunk],
+    *,
+    idle_timeout: float | None = None,
+    closers: Closers | None = None,
+) -> Iterator[StreamChunk]:
+    """
+    Consome `chunks` numa thread auxiliar e interrompe o stream se ficar parado por mais
+    de `idle_timeout` segundos ou se o prazo global acabar. O texto já recebido continua
+    com quem consumiu o stream. Ao interromper, a resposta do SDK é fechada (a leitura
+    bloqueada na thread auxiliar falha) e o gerador é encerrado, liberando conexão e slots.
+    Com `closers`, quem o criou pode cancelar o stream de outra thread (`closers.close_all()`).
+    """
+    idle = _idle_timeout if idle_timeout is None else idle_timeout
+    if idle is None and _deadline is None and closers is None:
+        yield from chunks
+        return
+
+    events: queue.Queue[tuple[str, Any]] = queue.Queue()
+    cancelled = threading.Event()
+    closers = closers or Closers()
+    # Cancelamento de fora (`closers.close_all()`) acorda o consumidor na hora.
+    closers.add(lambda: events.put(("cancelled", None)))
+
+    def pump() -> None:
+        _local.closers = closers
+        try:
+            for chunk in chunks:
+                if cancelled.is_set():
+                    return
+                events.put(("chunk", chunk))
+            events.put(("done", None))
+        except BaseException as exc:  # noqa: BLE001 (repassada ao consumidor)
+            events.put(("error", exc))
+        finally:
+            # Fechado daqui (a thread que o executa): roda os `finally` dos geradores encadeados.
+            close = getattr(chunks, "close", None)
+            if callable(close):
+                _close_quietly(close)
+            _local.closers = None
+
+    threading.Thread(target=pump, name="automgr-stream", daemon=True).start()
+
+    try:
+        while True:
+            left = remaining()
+            if left is not None and left <= 0:
+                raise DeadlineExceededError("Prazo global da execução esgotado.")
+            waits = [t for t in (idle, left) if t is not None]
+            try:
+                kind, value = events.get(timeout=min(waits) if waits else None)
+            except queue.Empty:
+                if idle is None or deadline_expired():
+                    raise DeadlineExceededError("Prazo global da execução esgotado.") from None
+                raise StreamStalledError(f"Stream parado: nenhum chunk em {idle:g}s.") from None
+
+            if kind == "done":
+                return
+            if kind == "cancelled":
+                raise StreamCancelledError("Stream cancelado.")
+            if kind == "error":
+                if "timeout" in type(value).__name__.lower():
+                    raise StreamStalledError(f"Stream interrompido por timeout: {value}") from value
+                raise value
+            yield value
+    finally:
+        cancelled.set()
+        closers.close_all()
+
+
+def save_partial(output_path: Path, text: str) -> Path | None:
+    if not text:
+        return None
+    partial_path = output_path.with_name(f"{output_path.stem}.parcial{output_path.suffix}")
+    partial_path.write_text(text, encoding="utf-8")
+    return partial_path
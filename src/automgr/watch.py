@@ -0,0 +1,186 @@
+"""Modo watch (`automgr watch`): regenera o MGR a cada edição do dados.json/template.
+
+- As entradas são verificadas por polling (mtime/tamanho), sem dependências extras;
+  uma rajada de salvamentos vira uma única regeneração (debounce).
+- `PromptBuilder` remonta só as partes do prompt que mudaram (template, ETP, TR);
+  as demais reaproveitam a serialização anterior.
+- `GenerationRunner` cancela a geração em andamento quando chega uma edição mais
+  nova e começa o novo stream imediatamente, sem esperar o anterior terminar.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from automgr import console, ledger
+from automgr.api import Generation
+from automgr.prompt import DEFAULT_SEPARATOR, fill_template, json_to_string, split_template
+
+
+DEFAULT_DEBOUNCE = 0.6
+DEFAULT_POLL = 0.25
+
+Snapshot = tuple[tuple[int, int] | None, ...]
+
+
+def snapshot(paths: list[Path]) -> Snapshot:
+    stamps: list[tuple[int, int] | None] = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            stamps.append(None)
+            continue
+        stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def wait_for_change(
+    paths: list[Path],
+    previous: Snapshot,
+    *,
+    poll: float = DEFAULT_POLL,
+    debounce: float = DEFAULT_DEBOUNCE,
+) -> Snapshot:
+    """Bloqueia até algum arquivo mudar e ficar `debounce` segundos sem novas mudanças."""
+    current = previous
+    while current == previous:
+        time.sleep(poll)
+        current = snapshot(paths)
+
+    settled_at = time.monotonic()
+    while time.monotonic() - settled_at < debounce:
+        time.sleep(poll)
+        latest = snapshot(paths)
+        if latest != current:
+            current = latest
+            settled_at = time.monotonic()
+    return current
+
+
+class PromptBuilder:
+    """Monta o prompt reaproveitando as partes (template, ETP, TR) iguais às da montagem anterior."""
+
+    def __init__(self, *, json_indent: int | None = 2, separator: str = DEFAULT_SEPARATOR) -> None:
+        self.json_indent = json_indent
+        self.separator = separator
+        self.rebuilt: list[str] = []
+        self._parts: dict[str, tuple[Any, Any]] = {}
+
+    def _part(self, name: str, source: Any, make: Callable[[], Any]) -> Any:
+        cached = self._parts.get(name)
+        if cached is not None and cached[0] == source:
+            return cached[1]
+        value = make()
+        self._parts[name] = (source, value)
+        self.rebuilt.append(name)
+        return value
+
+    def build(self, dados: dict[str, Any], template_text: str) -> tuple[str, str]:
+        self.rebuilt = []
+        etp = dados.get("etp_conteudo", "")
+        tr = dados.get("tr_conteudo", "")
+        metadados = dados.get("metadados", {})
+
+        system_txt, user_template = self._part(
+            "template",
+            template_text,
+            lambda: split_template(template_text, separator=self.separator),
+        )
+        etp_str = self._part("ETP", etp, lambda: json_to_string(etp, indent=self.json_indent))
+        tr_str = self._part("TR", tr, lambda: json_to_string(tr, indent=self.json_indent))
+        self._part("metadados", metadados, lambda: None)
+        return system_txt, fill_template(user_template, metadados, etp_str, tr_str)
+
+
+class GenerationRunner:
+    """Roda uma geração por vez numa thread; `start` cancela a anterior antes de começar a nova."""
+
+    def __init__(self, output_path: Path) -> None:
+        self.output_path = output_path
+        self._lock = threading.Lock()
+        self._cancel: threading.Event | None = None
+        self._generation: Generation | None = None
+        self._renderer: console.StreamRenderer | None = None
+        # Prompts da geração em andamento e da última salva com sucesso.
+        self._running: tuple[str, str] | None = None
+        self._saved: tuple[str, str] | None = None
+
+    def is_current(self, prompts: tuple[str, str]) -> bool:
+        """True se esses prompts já estão sendo gerados ou geraram o último resultado salvo."""
+        with self._lock:
+            return prompts == self._running or prompts == self._saved
+
+    def cancel(self) -> bool:
+        """Cancela a geração em andamento (se houver). O texto parcial é descartado."""
+        with self._lock:
+            cancel, renderer, generation = self._cancel, self._renderer, self._generation
+            self._cancel = self._renderer = self._running = self._generation = None
+        if cancel is None or cancel.is_set():
+            return False
+        cancel.set()
+        if generation is not None:
+            # Fecha o stream do SDK: a thread antiga sai já e libera conexão e slot (ex.: local).
+            generation.close()
+        if renderer is not None:
+            # Libera o terminal já, sem esperar a thread antiga terminar.
+            renderer.close()
+        return True
+
+    def start(self, generation: Generation) -> None:
+        if self.cancel():
+            print("⏹️  Geração anterior cancelada (entrada mais nova).")
+        cancel = threading.Event()
+        renderer = console.open_stream(f"{generation.provider}:{generation.model}").__enter__()
+        with self._lock:
+            self._cancel, self._renderer, self._generation = cancel, renderer, generation
+            self._running = (generation.system_prompt, generation.user_prompt)
+        threading.Thread(
+            target=self._run,
+            args=(generation, cancel, renderer),
+            name="automgr-watch",
+            daemon=True,
+        ).start()
+
+    def _run(self, generation: Generation, cancel: threading.Event, renderer: console.StreamRenderer) -> None:
+        try:
+            for chunk in generation:
+                if cancel.is_set():
+                    return
+                renderer.write(chunk.text)
+        except Exception as exc:  # noqa: BLE001
+            if not cancel.is_set():
+                renderer.close()
+                print(f"❌ Erro na geração: {exc}")
+            return
+        finally:
+            renderer.close()
+            with self._lock:
+                if self._cancel is cancel:
+                    self._cancel = self._renderer = self._running = self._generation = None
+
+        if cancel.is_set():
+            return
+        result = generation.result
+        # Uma thread por geração: a cancelada e a nova não podem dividir o temporário.
+        tmp_path = self.output_path.with_name(f".{self.output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(result.text, encoding="utf-8")
+        os.replace(tmp_path, self.output_path)
+        with self._lock:
+            # Só uma geração salva marca o prompt como atendido: depois de erro/cancelamento,
+            # salvar a mesma entrada de novo regenera.
+            self._saved = (generation.system_prompt, generation.user_prompt)
+        ledger.record(
+            generation.provider,
+            generation.model,
+            usage=result.usage,
+            system_prompt=generation.system_prompt,
+            user_prompt=generation.user_prompt,
+            output_text=result.text,
+            output=str(self.output_path),
+        )
+        print(f"✅ Salvo em '{self.output_path}' ({result.seconds:.1f}s). Aguardando alterações...")